@@ -0,0 +1,195 @@
+"""
+Offline benchmarks of the main client workloads against the bundled mock
+server (nexudus.mockserver).
+
+    python benchmarks/run.py
+    python benchmarks/run.py --latency 0.02 --bookings 50000 full_export
+
+The mock server runs in a child process so it does not compete with the
+client for the GIL or show up in its memory figures. Every run starts a
+fresh server, so the records one workload writes never reach another
+(or the same workload's next run). Each workload reports its
+throughput, the number of HTTP calls it made with their p50/p99 latency,
+and, from a second traced run, the peak Python memory it allocated
+(tracemalloc).
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from nexudus.metrics import Metrics  # noqa: E402
+from nexudus.mockserver import MockServer  # noqa: E402
+from nexudus.nexudus import Client  # noqa: E402
+
+
+def full_export(client, args):
+    """
+    Iterate every booking.
+    """
+    count = 0
+    for _ in client.bookings.iter_bookings(page_size=args.page_size,
+                                           prefetch=args.prefetch):
+        count += 1
+    return count
+
+
+def by_id_fanout(client, args):
+    """
+    Look up a random set of coworkers by id.
+    """
+    rng = random.Random(args.seed)
+    ids = [rng.randint(1, args.coworkers) for _ in range(args.ids)]
+    client.coworkers.get_coworkers_by_ids(ids,
+                                          concurrency=args.concurrency)
+    return len(ids)
+
+
+def bulk_writes(client, args):
+    """
+    Create bookings with bulk_create.
+    """
+    start = datetime(2025, 1, 1)
+    items = [{'ResourceId': index % 200 + 1,
+              'FromTime': (start + timedelta(hours=index)).isoformat(),
+              'ToTime': (start + timedelta(hours=index + 1)).isoformat()}
+             for index in range(args.writes)]
+    return sum(1 for result in client.bookings.bulk_create(
+        items, concurrency=args.concurrency) if result.ok)
+
+
+WORKLOADS = {
+    'full_export': full_export,
+    'by_id_fanout': by_id_fanout,
+    'bulk_writes': bulk_writes,
+}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def serve(connection, options):
+    server = MockServer(**options)
+    connection.send(server.url)
+    server.httpd.serve_forever()
+
+
+def start_server(options):
+    """
+    Start a MockServer in a child process and return (process, url).
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=serve, args=(child, options))
+    process.daemon = True
+    process.start()
+    return process, parent.recv()
+
+
+def stop_server(process):
+    process.terminate()
+    process.join()
+
+
+def run(name, options, args, trace=False):
+    """
+    Run one workload against a freshly started mock server.
+    """
+    process, url = start_server(options)
+    try:
+        return run_workload(name, url, args, trace)
+    finally:
+        stop_server(process)
+
+
+def run_workload(name, url, args, trace=False):
+    latencies = []
+    metrics = Metrics()
+    metrics.after_request.append(
+        lambda event: latencies.append(event.seconds))
+    client = Client('benchmark',
+                    'benchmark',
+                    pool_maxsize=max(args.concurrency, args.prefetch, 1),
+                    rate_limit=args.rate_limit,
+                    metrics=metrics,
+                    domain_url=url)
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        items = WORKLOADS[name](client, args)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    finally:
+        if trace:
+            tracemalloc.stop()
+        client.close()
+    return {
+        'workload': name,
+        'items': items,
+        'seconds': elapsed,
+        'items_per_second': items / elapsed if elapsed else 0.0,
+        'calls': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_mb': peak / 1024.0 / 1024.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n')[0])
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, out of %s (default: all)'
+                        % ', '.join(sorted(WORKLOADS)))
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--coworkers', type=int, default=20000)
+    parser.add_argument('--ids', type=int, default=2000)
+    parser.add_argument('--writes', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--prefetch', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='client rate limit, off by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            parser.error('unknown workload %r' % name)
+    options = {
+        'sizes': {'booking': args.bookings, 'coworker': args.coworkers},
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'seed': args.seed,
+    }
+    header = ('%-14s %8s %9s %10s %7s %9s %9s %9s' % (
+        'workload', 'items', 'seconds', 'items/s', 'calls', 'p50 ms',
+        'p99 ms', 'peak MB'))
+    print(header)
+    print('-' * len(header))
+    for name in args.workloads or sorted(WORKLOADS):
+        result = run(name, options, args)
+        # tracemalloc slows everything down, so memory gets its own run.
+        result['peak_mb'] = run(name, options, args, trace=True)['peak_mb']
+        print('%(workload)-14s %(items)8d %(seconds)9.2f '
+              '%(items_per_second)10.1f %(calls)7d %(p50_ms)9.2f '
+              '%(p99_ms)9.2f %(peak_mb)9.2f' % result)
+
+
+if __name__ == '__main__':
+    main()
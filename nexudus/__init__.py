@@ -0,0 +1,73 @@
+"""
+Python implementation of the Nexudus API.
+
+The public names below are importable from the package, e.g.
+``from nexudus import Client``. Submodules are only imported when one of
+their names is first looked up, so importing the package costs next to
+nothing and optional dependencies (aiohttp, numpy, pyarrow) stay unloaded
+unless used.
+"""
+
+import importlib
+
+EXPORTS = {
+    'AccessToken': 'nexudus',
+    'Booking': 'nexudus',
+    'BookingProduct': 'nexudus',
+    'CheckIn': 'nexudus',
+    'Client': 'nexudus',
+    'Coworker': 'nexudus',
+    'MissingRequiredArgumentException': 'nexudus',
+    'Nexudus': 'nexudus',
+    'PricePlanHistory': 'nexudus',
+    'Resource': 'nexudus',
+    'ResourceTimeSlot': 'nexudus',
+    'ENDPOINTS': 'endpoints',
+    'Endpoint': 'endpoints',
+    'NexudusSession': 'session',
+    'build_session': 'session',
+    'AsyncClient': 'aio',
+    'ResponseCache': 'cache',
+    'ValidatorStore': 'conditional',
+    'Decoder': 'decoding',
+    'Exporter': 'export',
+    'Metrics': 'metrics',
+    'StatsdExporter': 'metrics',
+    'MockServer': 'mockserver',
+    'as_records': 'models',
+    'Outbox': 'outbox',
+    'AdaptivePageSize': 'paging',
+    'RateLimiter': 'ratelimit',
+    'SharedRateLimiter': 'ratelimit',
+    'Replica': 'replica',
+    'Rollup': 'rollups',
+    'RetryPolicy': 'retry',
+    'SingleFlight': 'singleflight',
+    'Snapshot': 'snapshot',
+    'Checkpoint': 'sync',
+    'DeltaSync': 'sync',
+    'BULK': 'tenants',
+    'INTERACTIVE': 'tenants',
+    'FairScheduler': 'tenants',
+    'TenantManager': 'tenants',
+    'ChangeEvent': 'webhooks',
+    'WebhookReceiver': 'webhooks',
+    'WebhookServer': 'webhooks',
+    'send_event': 'webhooks',
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name):
+    module = EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (
+            __name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
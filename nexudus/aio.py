@@ -0,0 +1,516 @@
+"""
+Asyncio flavour of the Nexudus API, backed by aiohttp.
+
+Every resource class has an Async* counterpart whose get/create/update/
+delete methods are coroutines and whose iter_* methods are async
+generators. All resources of an AsyncClient share one aiohttp connection
+pool.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .nexudus import (BULK_CONCURRENCY, PAGE_SIZE, POOL_MAXSIZE,
+                      AccessToken, Booking, BookingProduct, BulkResult,
+                      CheckIn, Coworker, MissingRequiredArgumentException,
+                      Nexudus, PricePlanHistory, Resource, ResourceTimeSlot,
+                      has_next_page, id_ranges, parse_filters, project,
+                      validate_body)
+from .decoding import Decoder
+from .ratelimit import (RATE_LIMIT, RateLimiter, shared_rate_limiter,
+                        url_host)
+from .retry import RetryPolicy
+
+KEEPALIVE_TIMEOUT = 30
+
+
+def encode_pairs(mapping):
+    """
+    Flatten a params/payload dict into (key, str) pairs the way requests
+    does, repeating the key for list values and dropping None.
+    """
+    pairs = []
+    for key, value in (mapping or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            pairs.extend((key, str(item)) for item in value)
+        else:
+            pairs.append((key, str(value)))
+    return pairs
+
+
+class AsyncResponse(object):
+    """
+    Fully read response with the parts of the requests.Response API the
+    library relies on. request_info is aiohttp's, for the error
+    raise_for_status raises.
+    """
+
+    def __init__(self,
+                 url,
+                 status_code,
+                 headers,
+                 content,
+                 reason=None,
+                 request_info=None,
+                 history=()):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.reason = reason
+        self.request_info = request_info
+        self.history = history
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.ok:
+            return
+        request_info = self.request_info
+        if request_info is None:
+            import yarl
+            url = yarl.URL(self.url)
+            request_info = aiohttp.RequestInfo(url, 'GET', {}, url)
+        raise aiohttp.ClientResponseError(request_info,
+                                          self.history,
+                                          status=self.status_code,
+                                          message=self.reason or '',
+                                          headers=self.headers)
+
+
+class AsyncSession(object):
+    """
+    requests-style get/post/put/delete coroutines over a single
+    aiohttp.ClientSession. The aiohttp session is created on first use so
+    it binds to the running event loop. rate_limit is taken as by
+    build_session: a starting rate, a RateLimiter or None, and so is
+    retry_policy: None for RetryPolicy(), RetryPolicy(max_attempts=1) for
+    no retries.
+    """
+
+    def __init__(self,
+                 username,
+                 password,
+                 limit=POOL_MAXSIZE,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 rate_limit=RATE_LIMIT,
+                 retry_policy=None,
+                 metrics=None,
+                 domain_url=None):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for the asyncio client: "
+                "pip install nexudus[async]")
+        self.username = username
+        self.password = password
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.rate_limiter = None
+        if isinstance(rate_limit, RateLimiter):
+            self.rate_limiter = rate_limit
+        elif rate_limit is not None:
+            self.rate_limiter = shared_rate_limiter(
+                username, rate=rate_limit, host=url_host(domain_url))
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit,
+                keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.username, self.password),
+                connector=connector)
+        return self._session
+
+    async def request(self,
+                      method,
+                      url,
+                      params=None,
+                      data=None,
+                      retry=None):
+        policy = self.retry_policy
+        if not policy.allows(method, retry):
+            return await self._send(method, url, params, data)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = max(policy.remaining(started), 0.001)
+            if attempt > 1 and self.metrics is not None:
+                self.metrics.record_retry(method, url)
+            try:
+                response = await self._send(method, url, params, data,
+                                            timeout, attempt)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = policy.next_delay(attempt, started)
+                if delay is None:
+                    raise
+            else:
+                delay = policy.next_delay(attempt, started,
+                                          response.status_code,
+                                          response.headers)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+
+    async def _send(self,
+                    method,
+                    url,
+                    params,
+                    data,
+                    timeout=None,
+                    attempt=1):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        session = self._get_session()
+        if timeout is not None:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        metrics = self.metrics
+        if metrics is not None:
+            started = metrics.start(method, url, {'params': params,
+                                                  'data': data})
+        try:
+            async with session.request(method,
+                                       url,
+                                       params=encode_pairs(params),
+                                       data=encode_pairs(data) or None,
+                                       timeout=timeout) as resp:
+                if metrics is not None:
+                    first_byte = time.perf_counter() - started
+                content = await resp.read()
+                response = AsyncResponse(str(resp.url), resp.status,
+                                         resp.headers, content, resp.reason,
+                                         resp.request_info, resp.history)
+        except Exception as error:
+            if metrics is not None:
+                metrics.record(method, url, started, attempt=attempt,
+                               error=type(error).__name__)
+            raise
+        if metrics is not None:
+            metrics.record(method,
+                           url,
+                           started,
+                           status=response.status_code,
+                           first_byte=first_byte,
+                           request_bytes=len(
+                               urlencode(encode_pairs(data)).encode()),
+                           response_bytes=len(content),
+                           attempt=attempt)
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(response.status_code, response.headers)
+        return response
+
+    def get(self, url, params=None, retry=None):
+        return self.request('GET', url, params=params, retry=retry)
+
+    def post(self, url, data=None, retry=None):
+        return self.request('POST', url, data=data, retry=retry)
+
+    def put(self, url, data=None, retry=None):
+        return self.request('PUT', url, data=data, retry=retry)
+
+    def delete(self, url, retry=None):
+        return self.request('DELETE', url, retry=retry)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class AsyncNexudus(Nexudus):
+    """
+    Base class for the async resources. The inherited API methods return
+    coroutines because the session's verbs are coroutines.
+    """
+
+    def create_session(self):
+        return AsyncSession(self.username,
+                            self.password,
+                            rate_limit=self.rate_limit,
+                            retry_policy=self.retry_policy,
+                            metrics=self.metrics,
+                            domain_url=self.domain_url)
+
+    async def fetch_page(self, params, page):
+        """
+        API to get one page of a list endpoint as decoded JSON.
+        """
+        return (await self._fetch_page(params, page))[1]
+
+    async def _fetch_page(self, params, page):
+        response = await self.session.get(self.BASE_URL,
+                                          params=dict(params, page=page))
+        response.raise_for_status()
+        if self.metrics is None:
+            return response, self.decoder.decode(response)
+        started = time.perf_counter()
+        body = self.decoder.decode(response)
+        self.metrics.record_decode(self.BASE_URL,
+                                   time.perf_counter() - started)
+        return response, body
+
+    async def iter_records(self,
+                           list_method,
+                           filters,
+                           page_size=PAGE_SIZE,
+                           prefetch=0,
+                           fields=None):
+        """
+        Async generator over every record of a get_* list method.
+        With prefetch > 0 up to that many following pages are fetched
+        concurrently; records still come out in page order. fields keeps
+        only those keys of each record. page_size may be 'auto' or an
+        AdaptivePageSize as for Nexudus.iter_records.
+        """
+        params = parse_filters(list_method, filters)
+        sizer = self._sizer(page_size)
+        params['size'] = page_size if sizer is None else sizer.size
+        if sizer is not None and prefetch <= 0:
+            async for body in self._adaptive_pages(params, sizer):
+                records = body.get('Records') or []
+                if fields is not None:
+                    records = list(project(records, fields))
+                for record in records:
+                    yield record
+            return
+        page = 1
+        body = await self.fetch_page(params, page)
+        total_pages = body.get('TotalPages') or 0
+        pending = deque()
+        try:
+            while True:
+                while (len(pending) < prefetch
+                       and page + len(pending) < total_pages):
+                    pending.append(asyncio.ensure_future(
+                        self.fetch_page(params, page + len(pending) + 1)))
+                records = body.get('Records') or []
+                if fields is not None:
+                    records = list(project(records, fields))
+                for record in records:
+                    yield record
+                if not records or not has_next_page(body, page):
+                    return
+                page += 1
+                if pending:
+                    body = await pending.popleft()
+                else:
+                    body = await self.fetch_page(params, page)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _adaptive_pages(self, params, sizer):
+        offset = 0
+        while True:
+            size = sizer.next_size(offset)
+            page = offset // size + 1
+            started = time.perf_counter()
+            response, body = await self._fetch_page(dict(params, size=size),
+                                                    page)
+            records = body.get('Records') or []
+            sizer.observe(size, len(records), len(response.content),
+                          time.perf_counter() - started)
+            yield body
+            if not records or not has_next_page(body, page):
+                return
+            offset = page * size
+
+    async def get_records_by_ids(self,
+                                 ids,
+                                 span=PAGE_SIZE,
+                                 concurrency=BULK_CONCURRENCY):
+        """
+        Coroutine counterpart of Nexudus.get_records_by_ids.
+        """
+        runs, singles = id_ranges(ids, span)
+        semaphore = asyncio.Semaphore(concurrency)
+        records = {}
+
+        async def fetch_by_id(entity_id):
+            async with semaphore:
+                record = await self._fetch_by_id(entity_id)
+            if record is not None:
+                records[record['Id']] = record
+
+        async def fetch_run(run):
+            wanted = set(run)
+            async with semaphore:
+                async for record in self.iter_records(
+                        getattr(self, self.LIST_METHOD),
+                        self._id_range_filters(run),
+                        page_size=span):
+                    if record.get('Id') in wanted:
+                        records[record['Id']] = record
+            await asyncio.gather(*[fetch_by_id(entity_id)
+                                   for entity_id in run
+                                   if entity_id not in records])
+
+        await asyncio.gather(*([fetch_run(run) for run in runs]
+                               + [fetch_by_id(entity_id)
+                                  for entity_id in singles]))
+        return records
+
+    async def _fetch_by_id(self, entity_id):
+        response = await getattr(self, 'get_%s_by_id' % self.ENTITY)(
+            entity_id)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self.decoder.decode(response)
+
+    async def bulk_write(self, write_method, items, concurrency):
+        """
+        Async generator counterpart of Nexudus.bulk_write, keeping at most
+        concurrency writes in flight on the event loop.
+        """
+        pending = set()
+        try:
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    try:
+                        validate_body(write_method, item)
+                    except (TypeError,
+                            MissingRequiredArgumentException) as error:
+                        yield BulkResult(index, item, None, error)
+                        continue
+                pending.add(asyncio.ensure_future(
+                    self._bulk_call(write_method, index, item)))
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _bulk_call(write_method, index, item):
+        try:
+            if isinstance(item, dict):
+                response = await write_method(**item)
+            else:
+                response = await write_method(item)
+        except Exception as error:
+            return BulkResult(index, item, None, error)
+        return BulkResult(index, item, response, None)
+
+
+class AsyncAccessToken(AsyncNexudus, AccessToken):
+    pass
+
+
+class AsyncBooking(AsyncNexudus, Booking):
+    pass
+
+
+class AsyncBookingProduct(AsyncNexudus, BookingProduct):
+    pass
+
+
+class AsyncCheckIn(AsyncNexudus, CheckIn):
+    pass
+
+
+class AsyncCoworker(AsyncNexudus, Coworker):
+    pass
+
+
+class AsyncPricePlanHistory(AsyncNexudus, PricePlanHistory):
+    pass
+
+
+class AsyncResource(AsyncNexudus, Resource):
+    pass
+
+
+class AsyncResourceTimeSlot(AsyncNexudus, ResourceTimeSlot):
+    pass
+
+
+class AsyncClient(object):
+    """
+    Async counterpart of Client sharing one aiohttp connection pool.
+    """
+
+    def __init__(self,
+                 username,
+                 password,
+                 limit=POOL_MAXSIZE,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 rate_limit=RATE_LIMIT,
+                 retry_policy=None,
+                 decoder=None,
+                 metrics=None,
+                 domain_url=None):
+        self.username = username
+        self.password = password
+        self.metrics = metrics
+        self.domain_url = domain_url
+        if decoder is None:
+            decoder = Decoder()
+        self.decoder = decoder
+        self.session = AsyncSession(username,
+                                    password,
+                                    limit=limit,
+                                    keepalive_timeout=keepalive_timeout,
+                                    rate_limit=rate_limit,
+                                    retry_policy=retry_policy,
+                                    metrics=metrics,
+                                    domain_url=domain_url)
+        self.access_tokens = self._resource(AsyncAccessToken)
+        self.bookings = self._resource(AsyncBooking)
+        self.booking_products = self._resource(AsyncBookingProduct)
+        self.checkins = self._resource(AsyncCheckIn)
+        self.coworkers = self._resource(AsyncCoworker)
+        self.price_plan_histories = self._resource(AsyncPricePlanHistory)
+        self.resources = self._resource(AsyncResource)
+        self.resource_time_slots = self._resource(AsyncResourceTimeSlot)
+
+    def _resource(self, resource_class):
+        return resource_class(self.username,
+                              self.password,
+                              session=self.session,
+                              decoder=self.decoder,
+                              domain_url=self.domain_url)
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
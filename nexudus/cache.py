@@ -0,0 +1,219 @@
+"""
+Opt-in response cache for GET calls, with per-resource TTLs, LRU
+eviction bounded by entry count and bytes, and pluggable storage.
+
+By default only reference data is cached: by-id lookups of every
+resource but bookings, check-ins and access tokens, and the list pages
+of resources. Transactional reads (iter_*, DeltaSync, Replica) always
+reach the API unless a TTL opts them in.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, urlencode
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+MAXSIZE = 1024
+MAX_BYTES = 64 * 1024 * 1024
+MAX_ENTRY_SIZE = 1024 * 1024
+
+
+def frozen_size(frozen):
+    """
+    Bytes of a frozen response's body.
+    """
+    return len(frozen[2])
+
+
+class MemoryBackend(object):
+    """
+    In-process LRU store with per-entry expiry, holding at most maxsize
+    entries and max_bytes of response bodies.
+    Any object with the same get/set/delete/delete_prefix/clear methods
+    can be used instead, e.g. a wrapper around a shared Redis or
+    memcached; values are plain tuples so they pickle cleanly.
+    """
+
+    def __init__(self, maxsize=MAXSIZE, max_bytes=MAX_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= frozen_size(entry[1])
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.size += frozen_size(value)
+            while self.entries and (len(self.entries) > self.maxsize
+                                    or self.size > self.max_bytes):
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries
+                        if key.startswith(prefix)]:
+                self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def freeze_response(response):
+    return (response.status_code, dict(response.headers), response.content,
+            response.url, response.encoding)
+
+
+def thaw_response(frozen):
+    status_code, headers, content, url, encoding = frozen
+    response = Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.url = url
+    response.encoding = encoding
+    response.from_cache = True
+    return response
+
+
+class ResponseCache(object):
+    """
+    Caches successful GET responses keyed on URL plus params, prefixed
+    with the namespace of the session (its username), so one cache or
+    shared backend can serve several accounts without mixing their data.
+    Each resource registers its BASE_URL with its CACHE_TTL for by-id
+    lookups and its LIST_CACHE_TTL for list pages. ttls and list_ttls map
+    an entity name (Resource.ENTITY, ...) to a TTL in seconds overriding
+    those, and a TTL of 0 or None turns caching off. Writes through the
+    session invalidate the entity's by-id entry and its cached list
+    pages. The default backend holds at most maxsize entries and
+    max_bytes of bodies, each at most max_entry_size.
+    """
+
+    def __init__(self,
+                 backend=None,
+                 maxsize=MAXSIZE,
+                 ttls=None,
+                 max_entry_size=MAX_ENTRY_SIZE,
+                 list_ttls=None,
+                 max_bytes=MAX_BYTES):
+        if backend is None:
+            backend = MemoryBackend(maxsize, max_bytes)
+        self.backend = backend
+        self.ttls = dict(ttls or {})
+        self.list_ttls = dict(list_ttls or {})
+        self.max_entry_size = max_entry_size
+        self.base_ttls = {}
+        self.list_ttls_by_url = {}
+        self.entity_urls = {}
+        self.namespaces = set()
+
+    def register(self, base_url, entity, ttl, namespace=None,
+                 list_ttl=None):
+        self.base_ttls[base_url] = self.ttls.get(entity, ttl)
+        self.list_ttls_by_url[base_url] = self.list_ttls.get(entity,
+                                                             list_ttl)
+        self.entity_urls.setdefault(entity, set()).add(base_url)
+        self.namespaces.add(namespace)
+
+    def _base_url(self, url):
+        url = url.split('?', 1)[0]
+        if url in self.base_ttls:
+            return url
+        parent = url.rsplit('/', 1)[0]
+        if parent in self.base_ttls:
+            return parent
+        return None
+
+    @staticmethod
+    def key(url, params=None, namespace=None):
+        if params:
+            url = url + '?' + urlencode(sorted(params.items()), doseq=True)
+        if namespace is None:
+            return url
+        return '%s %s' % (quote(namespace, safe=''), url)
+
+    def get(self, url, params=None, namespace=None):
+        frozen = self.backend.get(self.key(url, params, namespace))
+        if frozen is None:
+            return None
+        return thaw_response(frozen)
+
+    def store(self, url, params, response, namespace=None):
+        base_url = self._base_url(url)
+        if base_url is None or response.status_code != 200:
+            return
+        if url.split('?', 1)[0] == base_url:
+            ttl = self.list_ttls_by_url[base_url]
+        else:
+            ttl = self.base_ttls[base_url]
+        if not ttl or len(response.content) > self.max_entry_size:
+            return
+        self.backend.set(self.key(url, params, namespace),
+                         freeze_response(response), ttl)
+
+    def invalidate(self, url, data=None, namespace=None):
+        """
+        Drop the entries a write to url can make stale: the by-id entry
+        (taken from the url or the payload's Id) and every list page.
+        """
+        base_url = self._base_url(url)
+        if base_url is None:
+            return
+        path = url.split('?', 1)[0]
+        if path != base_url:
+            item_url = path
+        elif isinstance(data, dict) and data.get('Id') is not None:
+            item_url = '%s/%s' % (base_url, data['Id'])
+        else:
+            item_url = None
+        if item_url is not None:
+            item_key = self.key(item_url, namespace=namespace)
+            self.backend.delete(item_key)
+            self.backend.delete_prefix(item_key + '?')
+        base_key = self.key(base_url, namespace=namespace)
+        self.backend.delete(base_key)
+        self.backend.delete_prefix(base_key + '?')
+
+    def on_event(self, event):
+        """
+        Webhook handler (see webhooks.WebhookReceiver) dropping what a
+        change pushed by the API makes stale, as invalidate() does for
+        the client's own writes, in every namespace.
+        """
+        for base_url in self.entity_urls.get(event.entity, ()):
+            url = base_url
+            if event.entity_id is not None:
+                url = '%s/%s' % (base_url, event.entity_id)
+            for namespace in list(self.namespaces):
+                self.invalidate(url, namespace=namespace)
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,95 @@
+"""
+Conditional GET support: remember validators per URL and params and let
+the server answer 304 when nothing changed.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from .cache import (MAX_ENTRY_SIZE, MAXSIZE, ResponseCache, freeze_response,
+                    thaw_response)
+
+Validators = namedtuple('Validators',
+                        ['etag', 'last_modified', 'digest', 'frozen'])
+
+
+class ValidatorStore(object):
+    """
+    Keeps the ETag/Last-Modified validators, a content digest and the body
+    of the last 200 response for up to maxsize URL+params keys.
+    The next GET for a key is sent with If-None-Match/If-Modified-Since and
+    a 304 is answered with the stored body. Servers that ignore validators
+    still send the full body, in which case the digest tells whether it
+    changed. Either way response.not_modified is True when the content is
+    the same as last time, so pollers can skip parsing it.
+    """
+
+    def __init__(self, maxsize=MAXSIZE, max_entry_size=MAX_ENTRY_SIZE):
+        self.maxsize = maxsize
+        self.max_entry_size = max_entry_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def conditional_headers(self, url, params, headers=None,
+                            namespace=None):
+        """
+        Return headers extended with the validators known for url+params.
+        namespace keeps the entries of different accounts apart.
+        """
+        entry = self._get(ResponseCache.key(url, params, namespace))
+        if entry is None:
+            return headers
+        headers = dict(headers or {})
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def resolve(self, url, params, response, namespace=None):
+        """
+        Turn a 304 into the stored response and flag unchanged content.
+        """
+        key = ResponseCache.key(url, params, namespace)
+        entry = self._get(key)
+        if (response.status_code == 304 and entry is not None
+                and entry.frozen is not None):
+            stored = thaw_response(entry.frozen)
+            stored.from_cache = False
+            stored.not_modified = True
+            return stored
+        response.not_modified = False
+        if response.status_code != 200:
+            return response
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if entry is not None and entry.digest == digest:
+            response.not_modified = True
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        frozen = None
+        if ((etag or last_modified)
+                and len(response.content) <= self.max_entry_size):
+            frozen = freeze_response(response)
+        else:
+            etag = last_modified = None
+        self._set(key, Validators(etag, last_modified, digest, frozen))
+        return response
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,45 @@
+"""
+Helpers for the date strings returned and accepted by the API.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+_DATETIME = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d{1,7}))?)?'
+    r'(Z|[+-]\d\d:?\d\d)?$')
+
+
+def parse_datetime(value):
+    """
+    Parse an ISO 8601 string such as '2020-01-31T09:30:00.123Z'.
+    Returns None for None and anything that is not a datetime string.
+    Naive values stay naive; a Z or offset suffix gives an aware datetime.
+    """
+    if not isinstance(value, str):
+        return value if isinstance(value, datetime) else None
+    match = _DATETIME.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    microsecond = int((fraction or '0').ljust(6, '0')[:6])
+    parsed = datetime(int(year), int(month), int(day), int(hour),
+                      int(minute), int(second or 0), microsecond)
+    if zone == 'Z':
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    elif zone:
+        offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[-2:]))
+        if zone[0] == '-':
+            offset = -offset
+        parsed = parsed.replace(tzinfo=timezone(offset))
+    return parsed
+
+
+def format_datetime(value):
+    """
+    Format a datetime the way the API expects it in filters.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return value.strftime('%Y-%m-%dT%H:%M:%S')
@@ -0,0 +1,151 @@
+"""
+Pluggable JSON decoding for API responses.
+
+Decoder picks the fastest installed backend (orjson, then ujson) and falls
+back to the standard library json module. In incremental mode list pages
+are parsed from the socket as they arrive, yielding one record of the
+Records array at a time instead of building the whole page first.
+"""
+
+import codecs
+import importlib
+import json
+
+BACKENDS = ('orjson', 'ujson', 'json')
+RECORDS_KEY = 'Records'
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = ' \t\n\r,:'
+
+
+def load_backend(name=None):
+    """
+    Return (name, loads) for the named backend, or for the first installed
+    one when name is None.
+    """
+    if name is not None:
+        return name, importlib.import_module(name).loads
+    for candidate in BACKENDS:
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            continue
+        return candidate, module.loads
+    return 'json', json.loads
+
+
+class RecordStream(object):
+    """
+    Incrementally parse a JSON object of the form
+    {..., "Records": [{...}, {...}], ...} from an iterable of byte chunks.
+    Iterating yields the records as soon as each one is complete, decoding
+    the complete records of every chunk with one loads call; once it is
+    exhausted, meta holds the other top-level keys (TotalPages,
+    HasNextPage, ...) with Records set to an empty list.
+    """
+
+    def __init__(self, chunks, key=RECORDS_KEY, loads=json.loads):
+        self.chunks = iter(chunks)
+        self.key = key
+        self.loads = loads
+        self.meta = None
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._scanner = json.JSONDecoder()
+
+    def _read(self):
+        for chunk in self.chunks:
+            if chunk:
+                return self._text.decode(chunk)
+        return None
+
+    def _more(self, buffer, position):
+        text = self._read()
+        if text is None:
+            raise ValueError("Truncated %s array." % self.key)
+        return buffer[position:] + text
+
+    def __iter__(self):
+        marker = '"%s"' % self.key
+        buffer = ''
+        # Find the opening bracket of the records array.
+        while True:
+            start = buffer.find(marker)
+            if start >= 0:
+                index = start + len(marker)
+                while index < len(buffer) and buffer[index] in SEPARATORS:
+                    index += 1
+                if index < len(buffer):
+                    if buffer[index] != '[':
+                        raise ValueError("%s is not an array." % self.key)
+                    head, buffer = buffer[:index], buffer[index + 1:]
+                    break
+            text = self._read()
+            if text is None:
+                # No records array at all, e.g. an error payload.
+                self.meta = self.loads(buffer)
+                return
+            buffer += text
+        position = 0
+        failed_size = None
+        while True:
+            while position < len(buffer) and buffer[position] in SEPARATORS:
+                position += 1
+            if position == len(buffer):
+                buffer, position = self._more(buffer, position), 0
+                continue
+            if buffer[position] == ']':
+                break
+            # Decode every complete record in the buffer in one call. If the
+            # last '}' closes a nested object or sits inside a string, the
+            # batch is not valid JSON and records are scanned one by one.
+            end = buffer.rfind('}', position)
+            if end > position and len(buffer) != failed_size:
+                try:
+                    records = self.loads('[' + buffer[position:end + 1] + ']')
+                except ValueError:
+                    failed_size = len(buffer)
+                else:
+                    for record in records:
+                        yield record
+                    position = end + 1
+                    continue
+            try:
+                record, end = self._scanner.raw_decode(buffer, position)
+            except ValueError:
+                # The record continues in the next chunk.
+                buffer, position = self._more(buffer, position), 0
+                continue
+            yield record
+            position = end
+        tail = [buffer[position + 1:]]
+        text = self._read()
+        while text is not None:
+            tail.append(text)
+            text = self._read()
+        self.meta = self.loads(head + '[]' + ''.join(tail))
+
+
+class Decoder(object):
+    """
+    Decodes response bodies with the configured backend.
+    backend names a module with a loads function ('orjson', 'ujson',
+    'json'); None picks the fastest one installed. With incremental=True
+    the list iterators stream each page instead of decoding it whole.
+    """
+
+    def __init__(self,
+                 backend=None,
+                 incremental=False,
+                 chunk_size=CHUNK_SIZE):
+        self.backend, self.loads = load_backend(backend)
+        self.incremental = incremental
+        self.chunk_size = chunk_size
+
+    def decode(self, response):
+        return self.loads(response.content)
+
+    def stream(self, response):
+        """
+        RecordStream over a response opened with stream=True.
+        """
+        return RecordStream(response.iter_content(self.chunk_size),
+                            loads=self.loads)
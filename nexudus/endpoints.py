@@ -0,0 +1,176 @@
+"""
+Declarative registry of the API endpoints.
+
+Each Endpoint names a resource's path, the filters its list call accepts
+and the body fields its create/update calls require. The resource classes
+in nexudus.nexudus and their get/iter/create/update/delete methods are
+generated from these entries, so adding an endpoint is adding an entry
+here. Field sets are computed once, when the registry is built, instead
+of on every call.
+"""
+
+# Filters every entity accepts besides its own, e.g. Booking_UpdatedOn.
+AUDIT_FIELDS = ('Id', 'CreatedOn', 'UpdatedOn')
+
+
+class Endpoint(object):
+    """
+    One API resource.
+    filters are the list filter names without the prefix, e.g. 'FromTime'
+    for Booking_FromTime; body the fields create_* requires, update_*
+    requiring Id as well. A field with a default in defaults may be left
+    out. Read-only endpoints have no body.
+    cache_ttl is the seconds a ResponseCache keeps by-id lookups (the
+    Nexudus.CACHE_TTL default when None, 0 for never) and list_cache_ttl
+    those of list pages, which are only cached when it is set.
+    """
+
+    def __init__(self,
+                 name,
+                 entity,
+                 plural,
+                 path,
+                 prefix,
+                 filters,
+                 body=(),
+                 defaults=None,
+                 cache_ttl=None,
+                 list_cache_ttl=None,
+                 list_method=None):
+        self.name = name
+        self.entity = entity
+        self.plural = plural
+        self.path = path
+        self.prefix = prefix
+        self.filters = tuple('%s_%s' % (prefix, field) for field in filters)
+        self.filter_fields = frozenset(self.filters)
+        self.list_fields = self.filter_fields | frozenset(
+            '%s_%s' % (prefix, field) for field in AUDIT_FIELDS)
+        self.id_arg = '%s_Id' % prefix
+        self.create_body = tuple(body)
+        self.update_body = ('Id',) + self.create_body if body else ()
+        self.defaults = dict(defaults or {})
+        self.cache_ttl = cache_ttl
+        self.list_cache_ttl = list_cache_ttl
+        self.list_method = list_method or 'get_%s' % plural
+
+    def __repr__(self):
+        return '<Endpoint %s %s>' % (self.name, self.path)
+
+
+ACCESS_TOKEN = Endpoint(
+    'AccessToken', 'access_token', 'access_tokens', '/spaces/accesstokens',
+    'AccessToken',
+    filters=('Id', 'Business', 'AccessCode', 'Description',
+             'MinutesIncluded', 'MacAddress', 'MinutesLeft', 'LastAccess'),
+    body=('BusinessId', 'AccessCode', 'MinutesIncluded', 'MinutesLeft'),
+    cache_ttl=0)
+
+BOOKING = Endpoint(
+    'Booking', 'booking', 'bookings', '/spaces/bookings', 'Booking',
+    filters=('Id', 'Resource', 'Coworker', 'ExtraService', 'FromTime',
+             'ToTime', 'Notes', 'InternalNotes', 'ChargeNow', 'InvoiceNow',
+             'DoNotUseBookingCredit', 'PurchaseOrder', 'DiscountCode',
+             'LastNotificationTime', 'GoogleCalendarId', 'GoogleEventId',
+             'Tentative', 'Online', 'TeamsAtTheTimeOfBooking',
+             'TariffAtTheTimeOfBooking', 'RepeatSeriesUniqueId',
+             'RepeatBooking', 'Repeats', 'WhichBookingsToUpdate',
+             'RepeatEvery', 'RepeatUntil', 'RepeatOnMondays',
+             'RepeatOnTuesdays', 'RepeatOnWednesdays', 'RepeatOnThursdays',
+             'RepeatOnFridays', 'RepeatOnSaturdays', 'RepeatOnSundays',
+             'Reminded', 'MrmReminded', 'Invoiced', 'InvoiceDate',
+             'KisiKeyId', 'StartScheduledJobId', 'EndScheduledJobId',
+             'Billed', 'FromTimeLocal', 'ToTimeLocal', 'InvoiceDateLocal',
+             'Resource_Name', 'Coworker_FullName', 'ExtraService_Name'),
+    body=('ResourceId', 'FromTime', 'ToTime'),
+    cache_ttl=0)
+
+BOOKING_PRODUCT = Endpoint(
+    'BookingProduct', 'booking_product', 'booking_products',
+    '/spaces/bookingproducts', 'BookingProduct',
+    filters=('Id', 'Booking', 'Product', 'InvoiceInMinutes', 'Quantity',
+             'Product_Name'),
+    body=('BookingId', 'ProductId', 'Quantity'))
+
+CHECKIN = Endpoint(
+    'CheckIn', 'checkin', 'checkins', '/spaces/checkins', 'Checkin',
+    filters=('Id', 'Coworker', 'Business', 'FromTime', 'ToTime',
+             'CountsTowardsPlanLimits', 'CoworkerTimePassGuid',
+             'AutoCheckout', 'LastActivity', 'MacAddresses',
+             'TeamsAtTheTimeOfCheckin', 'TariffAtTheTimeOfCheckin',
+             'Coworker_FullName', 'Business_Name'),
+    body=('BusinessId', 'FromTime'),
+    cache_ttl=0)
+
+COWORKER = Endpoint(
+    'Coworker', 'coworker', 'coworkers', '/spaces/coworkers', 'Coworker',
+    filters=('Id', 'Tariff', 'NextTariff', 'FullName', 'Salutation',
+             'Gender', 'Email', 'CreateUser', 'Address', 'PostCode',
+             'CityName', 'State', 'Country', 'SimpleTimeZone', 'MobilePhone',
+             'LandLine', 'DateOfBirth', 'NickName', 'BusinessArea',
+             'CompanyName', 'ProfileWebsite', 'ProfileTags',
+             'ProfileSummary', 'Twitter', 'Facebook', 'Linkedin', 'Skype',
+             'ProfileIsPublic', 'InvoicingBusiness', 'BillingEmail',
+             'BillingName', 'BillingAddress', 'BillingPostCode',
+             'BillingCityName', 'BillingState', 'BillingCountry',
+             'BillingSimpleTimeZone', 'TaxRate', 'TaxIDNumber', 'BankName',
+             'BankAccount', 'NotifyOnNewInvoice', 'EnableGoCardlessPayments',
+             'GoCardlessContractNumber', 'LastOverDueInvoiceReminder',
+             'LastLowCreditReminder', 'RegularPaymentProvider',
+             'RegularPaymentContractNumber', 'CardNumber',
+             'DoNotProcessInvoicesAutomatically', 'AllowNetworkCheckin',
+             'CheckinSinceLastRenewal', 'MinutesSinceLastRenewal',
+             'AccessCardId', 'EzeepUserId', 'EzeepFreePrinting',
+             'PaperCutPayAsYouPrint', 'PaperCutFreePrinting', 'Tag', 'Notes',
+             'User', 'Active', 'BillingDay', 'NextInvoice',
+             'IncludeSignupFee', 'ApplyProRating', 'NextAutoInvoice',
+             'RegistrationDate', 'CancellationDate', 'GeneralTermsAccepted',
+             'PricePlanTermsAccepted', 'LastRenewal', 'LastInvoiceAttempt')
+    + tuple('Custom%d' % number for number in range(1, 31))
+    + ('Tariff_Name', 'Businesses', 'Teams'),
+    body=('FullName', 'Email', 'CountryId', 'SimpleTimeZoneId',
+          'CheckinSinceLastRenewal', 'MinutesSinceLastRenewal', 'BillingDay',
+          'AddedBusinesses', 'AddedTeams'),
+    defaults={'AddedBusinesses': (), 'AddedTeams': ()},
+    # The list call has always been named get_checkins here.
+    list_method='get_checkins')
+
+PRICE_PLAN_HISTORY = Endpoint(
+    'PricePlanHistory', 'price_plan_history', 'price_plan_histories',
+    '/spaces/coworkerpriceplanhistories', 'CoworkerPricePlanHistory',
+    filters=('Id', 'Coworker', 'OldTariffName', 'NewTariffName',
+             'OldTariffUniqueId', 'NewTariffUniqueId', 'IsUpgrade', 'Notes',
+             'OldValue', 'NewValue', 'OldQuantity', 'NewQuantity',
+             'CreatedOnLocal'),
+    cache_ttl=300)
+
+RESOURCE = Endpoint(
+    'Resource', 'resource', 'resources', '/spaces/resources', 'Resource',
+    filters=('Id', 'Business', 'Name', 'ResourceType', 'Description',
+             'Visible', 'DisplayOrder', 'GroupName', 'Projector', 'Internet',
+             'ConferencePhone', 'StandardPhone', 'WhiteBoard',
+             'LargeDisplay', 'Catering', 'TeaAndCoffee', 'Drinks',
+             'SecurityLock', 'CCTV', 'VoiceRecorder', 'AirConditioning',
+             'Heating', 'NaturalLight', 'AllowMultipleBookings',
+             'Allocation', 'BookInAdvanceLimit', 'LateBookingLimit',
+             'LateCancellationLimit', 'IntervalLimit', 'NoReturnPolicy',
+             'NoReturnPolicyAllResources', 'NoReturnPolicyAllUsers',
+             'MaxBookingLength', 'MinBookingLength', 'Shifts',
+             'GoogleCalendarId', 'KisiGroupId', 'AccessControlGroupId',
+             'Longitude', 'Latitude', 'ResourceType_Name', 'Tariffs',
+             'LinkedResources'),
+    body=('BusinessId', 'Name', 'ResourceTypeId', 'DisplayOrder',
+          'AddedTariffs', 'AddedLinkedResources'),
+    defaults={'AddedTariffs': (), 'AddedLinkedResources': ()},
+    cache_ttl=300,
+    list_cache_ttl=300)
+
+RESOURCE_TIME_SLOT = Endpoint(
+    'ResourceTimeSlot', 'resource_time_slot', 'resource_time_slots',
+    '/spaces/resourcetimeslots', 'ResourceTimeSlot',
+    filters=('Id', 'Resource', 'FromTime', 'ToTime', 'DayOfWeek'),
+    body=('ResourceId', 'FromTime', 'ToTime'),
+    cache_ttl=300)
+
+ENDPOINTS = (ACCESS_TOKEN, BOOKING, BOOKING_PRODUCT, CHECKIN, COWORKER,
+             PRICE_PLAN_HISTORY, RESOURCE, RESOURCE_TIME_SLOT)
@@ -0,0 +1,297 @@
+"""
+Columnar export of list endpoints to numpy, Apache Arrow, CSV and Parquet.
+
+Records are decoded straight into typed column batches of batch_size rows,
+so an export never builds a list of dicts for the whole entity. Column
+types come from the record schema in models: ids and counts are int64,
+rates and coordinates float64, flags bool, dates millisecond timestamps
+and everything else strings.
+
+numpy and pyarrow are optional (pip install nexudus[export]); CSV output
+only needs the standard library.
+"""
+
+import csv
+import re
+from datetime import timezone
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+from .dates import parse_datetime
+from .models import RECORD_CLASSES, field_type
+from .nexudus import PAGE_SIZE
+
+BATCH_SIZE = 10000
+TRUE_STRINGS = frozenset(['true', 'True', '1'])
+FALSE_STRINGS = frozenset(['false', 'False', '0'])
+OFFSET = re.compile(r'[T ].*[+-]\d\d:?\d\d$')
+
+
+def _require(module, name):
+    if module is None:
+        raise ImportError("%s is required for this export, install it with "
+                          "'pip install nexudus[export]'." % name)
+
+
+def to_int(value):
+    if isinstance(value, bool):
+        return int(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in TRUE_STRINGS:
+        return True
+    if value in FALSE_STRINGS:
+        return False
+    return None
+
+
+def to_timestamp(value):
+    return value if isinstance(value, str) else None
+
+
+def to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+CONVERTERS = {
+    'int': to_int,
+    'float': to_float,
+    'bool': to_bool,
+    'timestamp': to_timestamp,
+    'string': to_string,
+}
+
+
+def schema(resource, fields=None):
+    """
+    List of (column, type) pairs for the entity of resource, restricted to
+    fields when given.
+    """
+    names = RECORD_CLASSES[resource.ENTITY].FIELDS
+    if fields is not None:
+        unknown = set(fields) - set(names)
+        if unknown:
+            raise ValueError("Unknown %s fields: %s" % (
+                resource.ENTITY, ', '.join(sorted(unknown))))
+        names = [name for name in names if name in set(fields)]
+    return [(name, field_type(name)) for name in names]
+
+
+def timestamp_array(values):
+    """
+    datetime64[ms] array for API date strings, NaT for missing values.
+    UTC (Z) and naive strings are parsed in one vectorized call; strings
+    with an offset fall back to parse_datetime and are converted to UTC.
+    """
+    stripped = [value[:-1] if value and value[-1] == 'Z' else value
+                for value in values]
+    if not any(value and OFFSET.search(value) for value in stripped):
+        try:
+            return numpy.array(stripped, dtype='datetime64[ms]')
+        except ValueError:
+            pass
+    converted = []
+    for value in values:
+        parsed = parse_datetime(value)
+        if parsed is not None and parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        converted.append(parsed)
+    return numpy.array(converted, dtype='datetime64[ms]')
+
+
+def numpy_column(kind, values):
+    """
+    numpy array for a converted column: masked int64/float64/bool arrays,
+    datetime64[ms] with NaT, or an object array of strings.
+    """
+    if kind == 'timestamp':
+        return timestamp_array(values)
+    if kind == 'string':
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    dtype = {'int': numpy.int64, 'float': numpy.float64,
+             'bool': numpy.bool_}[kind]
+    mask = numpy.fromiter((value is None for value in values),
+                          dtype=numpy.bool_, count=len(values))
+    filled = 0 if kind != 'bool' else False
+    data = numpy.fromiter((filled if value is None else value
+                           for value in values),
+                          dtype=dtype, count=len(values))
+    return numpy.ma.MaskedArray(data, mask=mask)
+
+
+def arrow_type(kind):
+    return {'int': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'bool': pyarrow.bool_(),
+            'timestamp': pyarrow.timestamp('ms'),
+            'string': pyarrow.string()}[kind]
+
+
+def arrow_schema(columns):
+    return pyarrow.schema([(name, arrow_type(kind))
+                           for name, kind in columns])
+
+
+class Exporter(object):
+    """
+    Streams every record of a resource's list endpoint into column
+    batches of batch_size rows. Filters are the ones accepted by the
+    resource's get_* list method; page_size and prefetch are passed on to
+    iter_records. fields limits the export to some columns.
+    """
+
+    def __init__(self,
+                 resource,
+                 fields=None,
+                 batch_size=BATCH_SIZE,
+                 page_size=PAGE_SIZE,
+                 prefetch=0):
+        self.resource = resource
+        self.columns = schema(resource, fields)
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.prefetch = prefetch
+
+    def records(self, **filters):
+        list_method = getattr(self.resource, self.resource.LIST_METHOD)
+        return self.resource.iter_records(list_method,
+                                          filters,
+                                          page_size=self.page_size,
+                                          prefetch=self.prefetch)
+
+    def column_batches(self, **filters):
+        """
+        Yield dicts of column name -> list of converted values.
+        """
+        record_class = RECORD_CLASSES[self.resource.ENTITY]
+        keys = dict(record_class.ALIASES, **record_class.KEYS)
+        wanted = dict(self.columns)
+        converters = dict((name, CONVERTERS[kind])
+                          for name, kind in self.columns)
+        batch = None
+        size = 0
+        for record in self.records(**filters):
+            if batch is None:
+                batch = dict((name, [None] * self.batch_size)
+                             for name in wanted)
+            for key, value in record.items():
+                slot = keys.get(key)
+                if slot is None or value is None:
+                    continue
+                name = slot[1:]
+                if name in wanted:
+                    batch[name][size] = converters[name](value)
+            size += 1
+            if size == self.batch_size:
+                yield batch
+                batch = None
+                size = 0
+        if size:
+            yield dict((name, values[:size])
+                       for name, values in batch.items())
+
+    def numpy_batches(self, **filters):
+        """
+        Yield dicts of column name -> numpy array, see numpy_column.
+        """
+        _require(numpy, 'numpy')
+        for batch in self.column_batches(**filters):
+            yield dict((name, numpy_column(kind, batch[name]))
+                       for name, kind in self.columns)
+
+    def arrow_schema(self):
+        _require(pyarrow, 'pyarrow')
+        return arrow_schema(self.columns)
+
+    def arrow_batches(self, **filters):
+        """
+        Yield pyarrow.RecordBatch objects. Timestamps are naive UTC.
+        """
+        _require(numpy, 'numpy')
+        target = self.arrow_schema()
+        for batch in self.numpy_batches(**filters):
+            arrays = []
+            for name, kind in self.columns:
+                column = batch[name]
+                if kind == 'timestamp':
+                    array = pyarrow.array(column, mask=numpy.isnat(column),
+                                          type=arrow_type(kind))
+                elif kind == 'string':
+                    array = pyarrow.array(column, type=arrow_type(kind))
+                else:
+                    array = pyarrow.array(column.data,
+                                          mask=numpy.ma.getmaskarray(column),
+                                          type=arrow_type(kind))
+                arrays.append(array)
+            yield pyarrow.RecordBatch.from_arrays(arrays, schema=target)
+
+    def to_arrow(self, **filters):
+        """
+        Whole export as one pyarrow.Table.
+        """
+        return pyarrow.Table.from_batches(list(self.arrow_batches(**filters)),
+                                          schema=self.arrow_schema())
+
+    def to_parquet(self, path, compression='snappy', **filters):
+        """
+        Write the export to a Parquet file, one row group per batch.
+        Returns the number of rows written.
+        """
+        rows = 0
+        writer = pyarrow.parquet.ParquetWriter(path, self.arrow_schema(),
+                                               compression=compression)
+        try:
+            for batch in self.arrow_batches(**filters):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        finally:
+            writer.close()
+        return rows
+
+    def to_csv(self, path_or_file, **filters):
+        """
+        Write the export as CSV with a header row. Dates are written as
+        returned by the API and missing values as empty cells. Returns the
+        number of rows written.
+        """
+        if hasattr(path_or_file, 'write'):
+            return self._write_csv(path_or_file, filters)
+        with open(path_or_file, 'w', newline='') as csv_file:
+            return self._write_csv(csv_file, filters)
+
+    def _write_csv(self, csv_file, filters):
+        names = [name for name, _ in self.columns]
+        writer = csv.writer(csv_file)
+        writer.writerow(names)
+        rows = 0
+        for batch in self.column_batches(**filters):
+            writer.writerows(zip(*[batch[name] for name in names]))
+            rows += len(batch[names[0]]) if names else 0
+        return rows
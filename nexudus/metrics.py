@@ -0,0 +1,318 @@
+"""
+Request instrumentation: latency histograms, byte, retry and error
+counters and connection pool reuse, per endpoint.
+
+A Metrics object is handed to the session (build_session, Client or a
+resource's metrics argument) and sees every HTTP attempt. Its figures can
+be scraped as Prometheus text, pushed to StatsD with StatsdExporter, or
+consumed one request at a time by after_request hooks. Without a Metrics
+object the session skips all of this.
+"""
+
+import bisect
+import re
+import socket
+import threading
+import time
+import weakref
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+PREFIX = 'nexudus'
+
+RequestEvent = namedtuple('RequestEvent', [
+    'method', 'endpoint', 'status', 'seconds', 'first_byte',
+    'request_bytes', 'response_bytes', 'attempt', 'error'])
+
+_endpoints = {}
+
+
+def endpoint_name(url):
+    """
+    URL path with numeric ids folded, e.g. '/api/spaces/coworkers/{id}'.
+    """
+    name = _endpoints.get(url)
+    if name is None:
+        name = ID_SEGMENT.sub('/{id}', urlsplit(url).path)
+        if len(_endpoints) < 10000:
+            _endpoints[url] = name
+    return name
+
+
+def body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+class Histogram(object):
+    """
+    Cumulative-bucket histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        (upper bound, count) pairs, ending with '+Inf'.
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('"', "'"))
+                             for name, value in sorted(labels.items()))
+
+
+class Metrics(object):
+    """
+    Collects per-endpoint request figures.
+    before_request hooks are called as hook(method, url, kwargs) before
+    each attempt, after_request hooks as hook(event) with a RequestEvent
+    after it. Latency is the whole attempt including the download;
+    first_byte is the time until the response headers arrived (DNS,
+    connect, TLS and server time), so the gap between the two is the
+    download. Sessions are tracked weakly for their pool statistics.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.before_request = []
+        self.after_request = []
+        self.lock = threading.Lock()
+        self.sessions = weakref.WeakSet()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latency = {}
+            self.first_byte = {}
+            self.decode = {}
+            self.requests = {}
+            self.errors = {}
+            self.request_bytes = {}
+            self.response_bytes = {}
+            self.retries = {}
+
+    def track(self, session):
+        self.sessions.add(session)
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    @staticmethod
+    def _count(table, key, amount=1):
+        table[key] = table.get(key, 0) + amount
+
+    def start(self, method, url, kwargs):
+        for hook in self.before_request:
+            hook(method, url, kwargs)
+        return time.perf_counter()
+
+    def record(self,
+               method,
+               url,
+               started,
+               status=None,
+               first_byte=None,
+               request_bytes=0,
+               response_bytes=0,
+               attempt=1,
+               error=None):
+        """
+        Record one attempt started at started (a perf_counter value).
+        """
+        seconds = time.perf_counter() - started
+        endpoint = endpoint_name(url)
+        key = (method, endpoint)
+        with self.lock:
+            self._histogram(self.latency, key).observe(seconds)
+            if first_byte is not None:
+                self._histogram(self.first_byte, key).observe(first_byte)
+            if error is None:
+                self._count(self.requests, key + (status,))
+            else:
+                self._count(self.errors, key + (error,))
+            self._count(self.request_bytes, key, request_bytes)
+            self._count(self.response_bytes, key, response_bytes)
+        if self.after_request:
+            event = RequestEvent(method, endpoint, status, seconds,
+                                 first_byte, request_bytes, response_bytes,
+                                 attempt, error)
+            for hook in self.after_request:
+                hook(event)
+
+    def record_response(self, method, url, started, response, attempt=1):
+        """
+        record() for a requests.Response.
+        """
+        elapsed = getattr(response, 'elapsed', None)
+        request = getattr(response, 'request', None)
+        self.record(method,
+                    url,
+                    started,
+                    status=response.status_code,
+                    first_byte=(elapsed.total_seconds()
+                                if elapsed is not None else None),
+                    request_bytes=body_size(getattr(request, 'body', None)),
+                    response_bytes=len(response.content),
+                    attempt=attempt)
+
+    def record_retry(self, method, url):
+        with self.lock:
+            self._count(self.retries, (method, endpoint_name(url)))
+
+    def record_decode(self, url, seconds):
+        with self.lock:
+            self._histogram(self.decode, endpoint_name(url)).observe(seconds)
+
+    def pool_stats(self):
+        """
+        {host: (connections opened, requests sent)} over the urllib3 pools
+        of the tracked sessions. 1 - opened / sent is the share of
+        requests that reused a kept-alive connection.
+        """
+        stats = {}
+        for session in list(self.sessions):
+            for adapter in set(session.adapters.values()):
+                pools = getattr(getattr(adapter, 'poolmanager', None),
+                                'pools', None)
+                if pools is None:
+                    continue
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened, sent = stats.get(pool.host, (0, 0))
+                    stats[pool.host] = (opened + pool.num_connections,
+                                        sent + pool.num_requests)
+        return stats
+
+    def prometheus(self, prefix=PREFIX):
+        """
+        All figures in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, table, help_text in (
+                    ('request_duration_seconds', self.latency,
+                     'Duration of HTTP attempts.'),
+                    ('time_to_first_byte_seconds', self.first_byte,
+                     'Time until response headers arrived.')):
+                lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+                lines.append('# TYPE %s_%s histogram' % (prefix, name))
+                for (method, endpoint), histogram in sorted(table.items()):
+                    self._histogram_lines(lines, '%s_%s' % (prefix, name),
+                                          histogram, method=method,
+                                          endpoint=endpoint)
+            name = '%s_decode_seconds' % prefix
+            lines.append('# HELP %s Time spent decoding JSON pages.' % name)
+            lines.append('# TYPE %s histogram' % name)
+            for endpoint, histogram in sorted(self.decode.items()):
+                self._histogram_lines(lines, name, histogram,
+                                      endpoint=endpoint)
+            for name, table, fields, help_text in (
+                    ('requests_total', self.requests,
+                     ('method', 'endpoint', 'status'),
+                     'HTTP attempts by status code.'),
+                    ('errors_total', self.errors,
+                     ('method', 'endpoint', 'error'),
+                     'HTTP attempts that raised.'),
+                    ('retries_total', self.retries, ('method', 'endpoint'),
+                     'Attempts repeated by the retry policy.'),
+                    ('request_bytes_total', self.request_bytes,
+                     ('method', 'endpoint'), 'Request body bytes sent.'),
+                    ('response_bytes_total', self.response_bytes,
+                     ('method', 'endpoint'), 'Response body bytes read.')):
+                lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+                lines.append('# TYPE %s_%s counter' % (prefix, name))
+                for key, value in sorted(table.items(), key=str):
+                    lines.append('%s_%s%s %s' % (
+                        prefix, name, _labels(**dict(zip(fields, key))),
+                        value))
+        for name, index, help_text in (
+                ('pool_connections', 0, 'Connections opened per host.'),
+                ('pool_requests', 1, 'Requests sent per host.')):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s gauge' % (prefix, name))
+            for host, values in sorted(self.pool_stats().items()):
+                lines.append('%s_%s%s %s' % (prefix, name,
+                                             _labels(host=host),
+                                             values[index]))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(lines, name, histogram, **labels):
+        for bound, total in histogram.cumulative():
+            lines.append('%s_bucket%s %s' % (
+                name, _labels(le=bound, **labels), total))
+        lines.append('%s_sum%s %r' % (name, _labels(**labels),
+                                      histogram.sum))
+        lines.append('%s_count%s %s' % (name, _labels(**labels),
+                                        histogram.count))
+
+
+class StatsdExporter(object):
+    """
+    after_request hook sending each attempt to a StatsD daemon over UDP:
+    a timer for the latency and counters for the status and bytes.
+    Send errors are ignored, as usual for StatsD.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix=PREFIX):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def metric_name(self, event):
+        endpoint = event.endpoint.strip('/').replace('{id}', 'id')
+        if endpoint.startswith('api/'):
+            endpoint = endpoint[4:]
+        return '%s.%s.%s' % (self.prefix, endpoint.replace('/', '.'),
+                             event.method.lower())
+
+    def __call__(self, event):
+        name = self.metric_name(event)
+        lines = ['%s.latency:%.3f|ms' % (name, event.seconds * 1000)]
+        if event.error is None:
+            lines.append('%s.status.%s:1|c' % (name, event.status))
+        else:
+            lines.append('%s.error.%s:1|c' % (name, event.error))
+        if event.response_bytes:
+            lines.append('%s.response_bytes:%d|c' % (name,
+                                                     event.response_bytes))
+        if event.request_bytes:
+            lines.append('%s.request_bytes:%d|c' % (name,
+                                                    event.request_bytes))
+        try:
+            self.socket.sendto('\n'.join(lines).encode('ascii'),
+                               self.address)
+        except OSError:
+            pass
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,563 @@
+"""
+Local stand-in for the /api/spaces/* endpoints, for benchmarks and
+offline development.
+
+MockServer serves synthetic records for every resource class with the
+list, by-id, create, update and delete calls the client makes: paging
+with page/size, field filters, from_/to_ ranges and orderBy/dir. Latency
+and errors can be injected. Point a client at it with domain_url:
+
+    with MockServer(sizes={'booking': 20000}, latency=0.02) as server:
+        client = Client('user', 'pass', domain_url=server.url)
+
+Run python -m nexudus.mockserver to serve it standalone.
+"""
+
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .models import RECORD_CLASSES, field_type
+from .nexudus import (DOMAIN_URL, AccessToken, Booking, BookingProduct,
+                      CheckIn, Coworker, PricePlanHistory, Resource,
+                      ResourceTimeSlot, filter_prefix)
+from .webhooks import send_event
+
+RESOURCE_CLASSES = (AccessToken, Booking, BookingProduct, CheckIn, Coworker,
+                    PricePlanHistory, Resource, ResourceTimeSlot)
+SIZES = {
+    'access_token': 500,
+    'booking': 10000,
+    'booking_product': 2000,
+    'checkin': 10000,
+    'coworker': 2000,
+    'price_plan_history': 2000,
+    'resource': 200,
+    'resource_time_slot': 1400,
+}
+# Reference fields, sent as <Field>Id, and the entity they point to.
+REFERENCES = {
+    'Booking': 'booking',
+    'Business': None,
+    'BillingCountry': None,
+    'BillingSimpleTimeZone': None,
+    'Country': None,
+    'Coworker': 'coworker',
+    'ExtraService': None,
+    'InvoicingBusiness': None,
+    'NextTariff': None,
+    'Product': None,
+    'Resource': 'resource',
+    'ResourceType': None,
+    'SimpleTimeZone': None,
+    'Tariff': None,
+    'User': None,
+}
+# Distinct record bodies generated per entity; the rest are copies with
+# their own ids, references and times.
+TEMPLATES = 256
+VARYING_TIMES = frozenset(['FromTime', 'ToTime', 'CreatedOn', 'UpdatedOn'])
+EPOCH = datetime(2024, 1, 1)
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+WORDS = ('desk', 'room', 'meeting', 'studio', 'office', 'member', 'north',
+         'south', 'hot', 'fixed', 'day', 'pass', 'team', 'flex', 'suite')
+
+
+def now():
+    return datetime.now(timezone.utc).strftime(DATE_FORMAT)
+
+
+class Collection(object):
+    """
+    Synthetic records of one entity, kept in Id order.
+    """
+
+    def __init__(self, resource_class, size, sizes, seed):
+        self.entity = resource_class.ENTITY
+        self.prefix = filter_prefix(getattr(resource_class,
+                                            resource_class.LIST_METHOD))
+        self.fields = RECORD_CLASSES[self.entity].FIELDS
+        self.keys = dict((field, field + 'Id' if field in REFERENCES
+                          else field) for field in self.fields)
+        self.kinds = [(field, self.keys[field], field_type(field))
+                      for field in self.fields]
+        self.varying = [(field, self.keys[field]) for field in self.fields
+                        if field in REFERENCES or field in VARYING_TIMES]
+        self.random = random.Random('%s-%s' % (seed, self.entity))
+        self.sizes = sizes
+        self.records = {}
+        self.next_id = 1
+        # Selections by query, dropped on every write, and the JSON of
+        # each record, dropped when it changes.
+        self.selections = {}
+        self.encoded = {}
+        templates = [self.generate() for _ in range(min(size, TEMPLATES))]
+        for _ in range(size):
+            record = dict(self.random.choice(templates))
+            self.vary(record)
+            self.add(record)
+
+    def add(self, record):
+        record['Id'] = self.next_id
+        self.records[self.next_id] = record
+        self.next_id += 1
+        self.selections.clear()
+        return record
+
+    def remove(self, entity_id):
+        self.selections.clear()
+        self.encoded.pop(entity_id, None)
+        return self.records.pop(entity_id, None)
+
+    def update(self, record, values):
+        self.selections.clear()
+        self.encoded.pop(record['Id'], None)
+        record.update(values)
+        record['UpdatedOn'] = now()
+
+    def encode(self, record):
+        data = self.encoded.get(record['Id'])
+        if data is None:
+            data = self.encoded[record['Id']] = json.dumps(record).encode(
+                'utf-8')
+        return data
+
+    def vary(self, record):
+        """
+        Give record its own references, times and UniqueId.
+        """
+        rng = self.random
+        start = EPOCH + timedelta(minutes=15 * rng.randrange(35040))
+        for field, key in self.varying:
+            if field in REFERENCES:
+                target = REFERENCES[field]
+                record[key] = rng.randint(1, self.sizes.get(target) or 50)
+            elif field == 'FromTime':
+                record[key] = start.strftime(DATE_FORMAT)
+            elif field == 'ToTime':
+                record[key] = (start + timedelta(
+                    minutes=30 * rng.randint(1, 8))).strftime(DATE_FORMAT)
+            elif field in ('CreatedOn', 'UpdatedOn'):
+                record[key] = (start - timedelta(
+                    days=rng.randint(0, 60))).strftime(DATE_FORMAT)
+        if 'CreatedOn' in record and 'UpdatedOn' in record:
+            record['UpdatedOn'] = max(record['CreatedOn'],
+                                      record['UpdatedOn'])
+        record['UniqueId'] = '%08x-mock' % rng.getrandbits(32)
+
+    def generate(self):
+        rng = self.random
+        record = {}
+        start = EPOCH + timedelta(minutes=15 * rng.randrange(35040))
+        for field, key, kind in self.kinds:
+            if field in REFERENCES or field in VARYING_TIMES:
+                # Set per record by vary().
+                value = None
+            elif field == 'DayOfWeek':
+                value = rng.randrange(7)
+            elif kind == 'int':
+                value = rng.randrange(100)
+            elif kind == 'float':
+                value = round(rng.uniform(0, 100), 4)
+            elif kind == 'bool':
+                value = rng.random() < 0.5
+            elif kind == 'timestamp':
+                value = None
+                if rng.random() < 0.6:
+                    value = (start + timedelta(days=rng.randint(-365, 365))
+                             ).strftime(DATE_FORMAT)
+            elif field == 'Email':
+                value = 'member%d@example.com' % rng.randrange(10 ** 6)
+            elif rng.random() < 0.3:
+                value = None
+            else:
+                value = ' '.join(rng.choice(WORDS)
+                                 for _ in range(rng.randint(1, 4)))
+            record[key] = value
+        return record
+
+    def key(self, name):
+        """
+        Record key filtered by a query parameter, or None.
+        """
+        if not name.startswith(self.prefix + '_'):
+            return None
+        field = ''.join(name.split('_')[1:])
+        return self.keys.get(field, field)
+
+    def select(self, query):
+        """
+        Records matching the filters of a parsed query string, in order.
+        Results are kept until the next write, so paging through a
+        selection filters only once.
+        """
+        key = tuple(sorted((name, tuple(values))
+                           for name, values in query.items()
+                           if name not in ('page', 'size')))
+        records = self.selections.get(key)
+        if records is None:
+            if len(self.selections) >= 64:
+                self.selections.clear()
+            records = self.selections[key] = self._select(query)
+        return records
+
+    def _select(self, query):
+        bounds = {}
+        equals = []
+        for name, values in query.items():
+            if name.startswith('from_'):
+                key = self.key(name[5:])
+                if key is not None:
+                    bounds.setdefault(key, [None, None])[0] = values[0]
+            elif name.startswith('to_'):
+                key = self.key(name[3:])
+                if key is not None:
+                    bounds.setdefault(key, [None, None])[1] = values[0]
+            else:
+                key = self.key(name)
+                if key is not None:
+                    equals.append((key, set(values)))
+        ranges = [(key, low, high) for key, (low, high) in bounds.items()]
+        records = self.records.values()
+        if not equals and list(bounds) == ['Id']:
+            # Id ranges, as sent by get_*_by_ids, are dict lookups.
+            _, low, high = ranges[0]
+            low = int(float(low)) if low is not None else 1
+            high = int(float(high)) if high is not None else self.next_id
+            records = [self.records[entity_id]
+                       for entity_id in range(max(low, 1),
+                                              min(high, self.next_id) + 1)
+                       if entity_id in self.records]
+        elif ranges or equals:
+            records = [record for record in records
+                       if self._matches(record, ranges, equals)]
+        order_by = (query.get('orderBy') or [None])[0]
+        descending = (query.get('dir') or [''])[0].lower() == 'descending'
+        if order_by:
+            key = self.keys.get(order_by, order_by)
+            records = sorted(records,
+                             key=lambda record: _sort_key(record.get(key)),
+                             reverse=descending)
+        elif descending:
+            records = list(records)[::-1]
+        return list(records)
+
+    @staticmethod
+    def _matches(record, ranges, equals):
+        for key, values in equals:
+            if _query_value(record.get(key)) not in values:
+                return False
+        for key, low, high in ranges:
+            value = record.get(key)
+            if value is None:
+                return False
+            if isinstance(value, (int, float)) and not isinstance(value,
+                                                                  bool):
+                if low is not None and value < float(low):
+                    return False
+                if high is not None and value > float(high):
+                    return False
+            else:
+                if low is not None and value < low:
+                    return False
+                if high is not None and value > high:
+                    return False
+        return True
+
+
+def _query_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _sort_key(value):
+    return (value is None, value if value is not None else 0)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'NexudusMock/0.1'
+    mock = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        if isinstance(body, bytes):
+            payload = body
+        elif body is None:
+            payload = b''
+        else:
+            payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self):
+        """
+        (collection, id or None, query) for the request path.
+        """
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip('/')
+        collection = self.mock.routes.get(path)
+        entity_id = None
+        if collection is None:
+            base, _, tail = path.rpartition('/')
+            collection = self.mock.routes.get(base)
+            entity_id = int(tail) if tail.isdigit() else -1
+        return collection, entity_id, parse_qs(parts.query)
+
+    def _form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        return dict((key, values[0] if len(values) == 1 else values)
+                    for key, values in parse_qs(body).items())
+
+    def _injected(self):
+        """
+        Apply injected latency and maybe answer with an injected error.
+        """
+        mock = self.mock
+        with mock.lock:
+            mock.request_count += 1
+            failing = mock.random.random() < mock.error_rate
+            delay = mock.latency + mock.random.uniform(0, mock.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if failing:
+            headers = None
+            if mock.error_status == 429:
+                headers = {'Retry-After': '1'}
+            self._reply(mock.error_status, {'Message': 'Injected error'},
+                        headers)
+        return failing
+
+    def do_GET(self):
+        collection, entity_id, query = self._route()
+        if self._injected():
+            return
+        if collection is None:
+            return self._reply(404, {'Message': 'Not found'})
+        with self.mock.lock:
+            if entity_id is not None:
+                record = collection.records.get(entity_id)
+                if record is None:
+                    return self._reply(404, {'Message': 'Not found'})
+                return self._reply(200, collection.encode(record))
+            try:
+                page = max(int((query.get('page') or ['1'])[0]), 1)
+                size = max(int((query.get('size') or ['25'])[0]), 1)
+            except ValueError:
+                return self._reply(400, {'Message': 'page and size must be '
+                                                    'integers'})
+            records = collection.select(query)
+            encoded = [collection.encode(record)
+                       for record in records[(page - 1) * size:page * size]]
+        total_pages = (len(records) + size - 1) // size
+        meta = json.dumps({
+            'CurrentPage': page,
+            'CurrentPageSize': size,
+            'TotalItems': len(records),
+            'TotalPages': total_pages,
+            'HasNextPage': page < total_pages,
+            'HasPreviousPage': page > 1,
+        }).encode('utf-8')
+        # Records are spliced in as pre-encoded JSON.
+        self._reply(200, b''.join([b'{"Records": [', b', '.join(encoded),
+                                   b'], ', meta[1:]]))
+
+    def _write_result(self, record):
+        self._reply(200, {'Status': 200,
+                          'Message': 'Record saved.',
+                          'Value': {'Id': record['Id']},
+                          'WasSuccessful': True,
+                          'Errors': None})
+
+    def do_POST(self):
+        collection, entity_id, _ = self._route()
+        form = self._form()
+        if self._injected():
+            return
+        if collection is None or entity_id is not None:
+            return self._reply(404, {'Message': 'Not found'})
+        with self.mock.lock:
+            record = collection.add(dict(form, CreatedOn=now(),
+                                         UpdatedOn=now()))
+            self.mock.notify(collection, 'Create', record)
+        self._write_result(record)
+
+    def do_PUT(self):
+        collection, _, _ = self._route()
+        form = self._form()
+        if self._injected():
+            return
+        entity_id = form.get('Id')
+        with self.mock.lock:
+            record = None
+            if collection is not None and str(entity_id).isdigit():
+                record = collection.records.get(int(entity_id))
+            if record is None:
+                return self._reply(404, {'Message': 'Not found'})
+            form.pop('Id')
+            collection.update(record, form)
+            self.mock.notify(collection, 'Update', record)
+        self._write_result(record)
+
+    def do_DELETE(self):
+        collection, entity_id, _ = self._route()
+        if self._injected():
+            return
+        with self.mock.lock:
+            record = None
+            if collection is not None and entity_id is not None:
+                record = collection.remove(entity_id)
+            if record is None:
+                return self._reply(404, {'Message': 'Not found'})
+            self.mock.notify(collection, 'Delete', record)
+        self._write_result(record)
+
+
+class MockServer(object):
+    """
+    Threaded HTTP server holding sizes[entity] synthetic records per
+    entity (SIZES by default). Every request waits latency plus up to
+    jitter seconds, and error_rate of them fail with error_status.
+    url is the domain_url to give the client.
+    With webhook_url set, every accepted write is announced there in the
+    background with webhooks.send_event, e.g. as 'BookingUpdate',
+    signed with webhook_secret and carrying webhook_token.
+    """
+
+    def __init__(self,
+                 sizes=None,
+                 latency=0.0,
+                 jitter=0.0,
+                 error_rate=0.0,
+                 error_status=503,
+                 seed=0,
+                 host='127.0.0.1',
+                 port=0,
+                 webhook_url=None,
+                 webhook_token=None,
+                 webhook_secret=None):
+        self.sizes = dict(SIZES, **(sizes or {}))
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.collections = {}
+        self.routes = {}
+        for resource_class in RESOURCE_CLASSES:
+            collection = Collection(resource_class,
+                                    self.sizes.get(resource_class.ENTITY, 0),
+                                    self.sizes, seed)
+            self.collections[resource_class.ENTITY] = collection
+            path = '/api' + resource_class.BASE_URL[len(DOMAIN_URL):]
+            self.routes[path] = collection
+        handler = type('Handler', (MockHandler,), {'mock': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+        self.webhook_url = webhook_url
+        self.webhook_token = webhook_token
+        self.webhook_secret = webhook_secret
+        self.notifications = queue.Queue()
+        self._notifier = None
+
+    def notify(self, collection, kind, record):
+        if self.webhook_url is not None:
+            self.notifications.put((collection.prefix + kind, dict(record)))
+
+    def _send_notifications(self):
+        while True:
+            item = self.notifications.get()
+            if item is None:
+                return
+            action, record = item
+            try:
+                send_event(self.webhook_url, action, [record],
+                           token=self.webhook_token,
+                           secret=self.webhook_secret)
+            except OSError:
+                # Receiver unreachable; like Nexudus, move on.
+                continue
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/api' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name='nexudus-mock')
+        self._thread.daemon = True
+        self._thread.start()
+        if self.webhook_url is not None:
+            self._notifier = threading.Thread(
+                target=self._send_notifications, name='nexudus-mock-hooks')
+            self._notifier.daemon = True
+            self._notifier.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._notifier is not None:
+            self.notifications.put(None)
+            self._notifier.join()
+            self._notifier = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve a mock Nexudus API with synthetic data.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    server = MockServer(latency=args.latency,
+                        jitter=args.jitter,
+                        error_rate=args.error_rate,
+                        error_status=args.error_status,
+                        seed=args.seed,
+                        host=args.host,
+                        port=args.port)
+    print('Serving mock Nexudus API at %s' % server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Compact __slots__ record classes for the API entities.
+
+The classes are generated from the filter fields the get_* list methods
+already name: Booking_FromTime becomes BookingRecord.FromTime and
+Booking_Resource_Name becomes BookingRecord.ResourceName. Date fields are
+kept as the raw string until first accessed, and the decoded datetime
+then replaces the string in the slot.
+"""
+
+import re
+import sys
+
+from .dates import parse_datetime
+from .nexudus import (AccessToken, Booking, BookingProduct, CheckIn, Coworker,
+                      PricePlanHistory, Resource, ResourceTimeSlot,
+                      list_fields)
+
+DATE_FIELD = re.compile(
+    r'(Time|Date|On|Until|Birth|Access|Activity|Reminder)(Local)?$')
+NAME_FIELD = re.compile(r'Name$')
+
+INT_FIELDS = frozenset([
+    'Id', 'Business', 'Booking', 'Coworker', 'Resource', 'ResourceType',
+    'Product', 'ExtraService', 'Tariff', 'NextTariff', 'InvoicingBusiness',
+    'Country', 'BillingCountry', 'SimpleTimeZone', 'BillingSimpleTimeZone',
+    'User', 'Quantity', 'NewQuantity', 'OldQuantity', 'DisplayOrder',
+    'MinutesIncluded', 'MinutesLeft', 'BookInAdvanceLimit',
+    'LateBookingLimit', 'LateCancellationLimit', 'IntervalLimit',
+    'MaxBookingLength', 'MinBookingLength', 'Allocation', 'RepeatEvery',
+    'Repeats', 'WhichBookingsToUpdate', 'DayOfWeek', 'BillingDay', 'Gender',
+    'CheckinSinceLastRenewal', 'MinutesSinceLastRenewal'])
+FLOAT_FIELDS = frozenset([
+    'TaxRate', 'Latitude', 'Longitude', 'NewValue', 'OldValue'])
+BOOL_FIELDS = frozenset([
+    'IsNew', 'IsUpgrade', 'Active', 'Billed', 'Invoiced', 'InvoiceNow',
+    'ChargeNow', 'DoNotUseBookingCredit', 'Online', 'Tentative', 'Reminded',
+    'MrmReminded', 'RepeatBooking', 'RepeatOnMondays', 'RepeatOnTuesdays',
+    'RepeatOnWednesdays', 'RepeatOnThursdays', 'RepeatOnFridays',
+    'RepeatOnSaturdays', 'RepeatOnSundays', 'InvoiceInMinutes',
+    'AutoCheckout', 'CountsTowardsPlanLimits', 'AllowNetworkCheckin',
+    'ApplyProRating', 'CreateUser', 'DoNotProcessInvoicesAutomatically',
+    'EnableGoCardlessPayments', 'EzeepFreePrinting', 'GeneralTermsAccepted',
+    'IncludeSignupFee', 'NotifyOnNewInvoice', 'PaperCutFreePrinting',
+    'PaperCutPayAsYouPrint', 'PricePlanTermsAccepted', 'ProfileIsPublic',
+    'Visible', 'AllowMultipleBookings', 'NoReturnPolicy',
+    'NoReturnPolicyAllResources', 'NoReturnPolicyAllUsers', 'Projector',
+    'Internet', 'ConferencePhone', 'StandardPhone', 'WhiteBoard',
+    'LargeDisplay', 'Catering', 'TeaAndCoffee', 'Drinks', 'SecurityLock',
+    'CCTV', 'VoiceRecorder', 'AirConditioning', 'Heating', 'NaturalLight'])
+TIMESTAMP_FIELDS = frozenset([
+    'LastRenewal', 'NextInvoice', 'NextAutoInvoice', 'LastInvoiceAttempt'])
+
+# Fields referencing another entity, sent in payloads as <Field>Id.
+REFERENCE_FIELDS = frozenset([
+    'Booking', 'Business', 'BillingCountry', 'BillingSimpleTimeZone',
+    'Country', 'Coworker', 'ExtraService', 'InvoicingBusiness',
+    'NextTariff', 'Product', 'Resource', 'ResourceType', 'SimpleTimeZone',
+    'Tariff', 'User'])
+
+# Keys every entity payload carries besides its own fields.
+COMMON_FIELDS = ('UniqueId', 'UpdatedBy', 'IsNew', 'SystemId',
+                 'ToStringText')
+
+_MISSING = object()
+
+
+def field_type(attribute):
+    """
+    Value type of a record attribute: 'int', 'float', 'bool', 'timestamp'
+    or 'string'.
+    """
+    if attribute in INT_FIELDS:
+        return 'int'
+    if attribute in FLOAT_FIELDS:
+        return 'float'
+    if attribute in BOOL_FIELDS:
+        return 'bool'
+    if attribute in TIMESTAMP_FIELDS or DATE_FIELD.search(attribute):
+        return 'timestamp'
+    return 'string'
+
+
+def attribute_name(field):
+    """
+    Record attribute for a filter field, e.g. 'Booking_Resource_Name' ->
+    'ResourceName'.
+    """
+    return ''.join(field.split('_')[1:])
+
+
+class LazyField(object):
+    """
+    Descriptor exposing a raw slot. Dates are decoded on first access
+    into a slot of their own, decoded, so the raw slot keeps the payload
+    value for to_dict and comparisons.
+    """
+    __slots__ = ('name', 'raw', 'decoded')
+
+    def __init__(self, name, raw, decoded=None):
+        self.name = name
+        self.raw = raw
+        self.decoded = decoded
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+        try:
+            value = self.raw.__get__(record, owner)
+        except AttributeError:
+            return None
+        if self.decoded is None or not isinstance(value, str):
+            return value
+        try:
+            return self.decoded.__get__(record, owner)
+        except AttributeError:
+            pass
+        decoded = parse_datetime(value)
+        if decoded is None:
+            return value
+        self.decoded.__set__(record, decoded)
+        return decoded
+
+    def __set__(self, record, value):
+        self.raw.__set__(record, value)
+        if self.decoded is not None:
+            try:
+                self.decoded.__delete__(record)
+            except AttributeError:
+                pass
+
+
+class Record(object):
+    """
+    Base class of the generated records.
+    Keys of the API payload outside FIELDS are kept in extra, which stays
+    None for the common case of a payload matching the schema. A field
+    given under its other name (Resource rather than ResourceId) is
+    noted in renamed, so to_dict gives back the keys it was built from.
+    """
+    __slots__ = ('extra', 'renamed')
+    FIELDS = ()
+    KEYS = {}
+    ALIASES = {}
+    PAYLOAD_KEYS = ()
+    NAME_SLOTS = frozenset()
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        extra = None
+        renamed = None
+        keys = cls.KEYS
+        for key, value in data.items():
+            slot = keys.get(key)
+            if slot is None:
+                slot = cls.ALIASES.get(key)
+                if slot is None:
+                    if extra is None:
+                        extra = {}
+                    extra[key] = value
+                    continue
+                if renamed is None:
+                    renamed = {}
+                renamed[slot[1:]] = key
+            if value is None:
+                continue
+            if isinstance(value, str) and slot in cls.NAME_SLOTS:
+                value = sys.intern(value)
+            setattr(record, slot, value)
+        record.extra = extra
+        record.renamed = renamed
+        return record
+
+    def get(self, name, default=None):
+        """
+        Value of a field given by attribute name or payload key, e.g.
+        Resource or ResourceId, as the attribute gives it.
+        """
+        slot = self.KEYS.get(name) or self.ALIASES.get(name)
+        value = getattr(self, name if slot is None else slot[1:], _MISSING)
+        if value is _MISSING or value is None:
+            if self.extra is not None and name in self.extra:
+                return self.extra[name]
+            return default
+        return value
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def to_dict(self):
+        """
+        Plain dict of the set fields under their payload keys, with the
+        values as received (dates stay strings even once decoded).
+        """
+        data = {}
+        renamed = self.renamed
+        for name, key in self.PAYLOAD_KEYS:
+            value = getattr(self, '_' + name, None)
+            if value is not None:
+                if renamed is not None:
+                    key = renamed.get(name, key)
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<%s Id=%r>' % (self.__class__.__name__, self.get('Id'))
+
+
+def make_record_class(name, fields):
+    """
+    Build a Record subclass with one slot per field, plus one per date
+    field for its decoded value.
+    A payload key maps to a field by name or, for references such as
+    Booking_Resource, by name plus 'Id' (ResourceId); the other form is
+    accepted as an alias.
+    """
+    names = []
+    attributes = [attribute_name(field) for field in fields]
+    for attribute in attributes + list(COMMON_FIELDS):
+        if attribute and attribute not in names:
+            names.append(attribute)
+    dates = [attribute for attribute in names
+             if field_type(attribute) == 'timestamp']
+    payload_keys = tuple(
+        (attribute, attribute + 'Id' if attribute in REFERENCE_FIELDS
+         else attribute) for attribute in names)
+    keys = dict((key, '_' + attribute) for attribute, key in payload_keys)
+    aliases = {}
+    for attribute, key in payload_keys:
+        alias = attribute if key != attribute else attribute + 'Id'
+        if alias not in keys:
+            aliases.setdefault(alias, '_' + attribute)
+    namespace = {
+        '__slots__': tuple('_' + attribute for attribute in names)
+        + tuple('_%s_date' % attribute for attribute in dates),
+        'FIELDS': tuple(names),
+        'KEYS': keys,
+        'ALIASES': aliases,
+        'PAYLOAD_KEYS': payload_keys,
+        'NAME_SLOTS': frozenset('_' + attribute for attribute in names
+                                if NAME_FIELD.search(attribute)),
+    }
+    record_class = type(name, (Record,), namespace)
+    for attribute in names:
+        decoded = None
+        if attribute in dates:
+            decoded = getattr(record_class, '_%s_date' % attribute)
+        setattr(record_class, attribute, LazyField(
+            attribute, getattr(record_class, '_' + attribute), decoded))
+    return record_class
+
+
+def record_class_for(resource_class):
+    list_method = getattr(resource_class, resource_class.LIST_METHOD)
+    return make_record_class(resource_class.__name__ + 'Record',
+                             sorted(list_fields(list_method)))
+
+
+AccessTokenRecord = record_class_for(AccessToken)
+BookingRecord = record_class_for(Booking)
+BookingProductRecord = record_class_for(BookingProduct)
+CheckInRecord = record_class_for(CheckIn)
+CoworkerRecord = record_class_for(Coworker)
+PricePlanHistoryRecord = record_class_for(PricePlanHistory)
+ResourceRecord = record_class_for(Resource)
+ResourceTimeSlotRecord = record_class_for(ResourceTimeSlot)
+
+RECORD_CLASSES = {
+    AccessToken.ENTITY: AccessTokenRecord,
+    Booking.ENTITY: BookingRecord,
+    BookingProduct.ENTITY: BookingProductRecord,
+    CheckIn.ENTITY: CheckInRecord,
+    Coworker.ENTITY: CoworkerRecord,
+    PricePlanHistory.ENTITY: PricePlanHistoryRecord,
+    Resource.ENTITY: ResourceRecord,
+    ResourceTimeSlot.ENTITY: ResourceTimeSlotRecord,
+}
+
+
+def as_records(resource, records):
+    """
+    Wrap an iterable of payload dicts, e.g. resource.iter_*(), into the
+    record class of resource's entity, one record at a time.
+    """
+    from_dict = RECORD_CLASSES[resource.ENTITY].from_dict
+    for record in records:
+        yield from_dict(record)
@@ -1,14 +1,30 @@
 """
 API Implementation to connect to Nexudus Application.
+
+The resource classes and their API methods are generated from the
+endpoint registry in nexudus.endpoints. requests is only imported once a
+session is built (see nexudus.session).
 """
 
-import json
+import time
+from collections import deque, namedtuple
 
-import requests
-from requests.auth import HTTPBasicAuth
+from . import endpoints
+from .decoding import Decoder
+from .ratelimit import RATE_LIMIT
 
 DOMAIN_URL = 'https://spaces.nexudus.com/api'
 
+POOL_CONNECTIONS = 2
+POOL_MAXSIZE = 10
+
+PAGE_SIZE = 100
+# page_size value asking iter_* calls to tune the size, see
+# paging.AdaptivePageSize.
+AUTO_PAGE_SIZE = 'auto'
+
+BULK_CONCURRENCY = 4
+
 
 class MissingRequiredArgumentException(Exception):
     def __init__(self, message):
@@ -38,611 +54,771 @@ def parse_body(local_arg_dict):
     return payload
 
 
-class Nexudus(object):
-    def __init__(self, username, password):
-        self.username = username
-        self.password = password
-        self.session = self.create_session()
-
-    def create_session(self):
-        session = requests.Session()
-        session.auth = HTTPBasicAuth(self.username, self.password)
-        return session
-
-
-class AccessToken(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/accesstokens'
-
-    def get_access_tokens(self,
-                          AccessToken_Id=None,
-                          AccessToken_Business=None,
-                          AccessToken_AccessCode=None,
-                          AccessToken_Description=None,
-                          AccessToken_MinutesIncluded=None,
-                          AccessToken_MacAddress=None,
-                          AccessToken_MinutesLeft=None,
-                          AccessToken_LastAccess=None):
-        """
-        API to get all access tokens.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_access_token_by_id(self, AccessToken_Id):
-        """
-        API to get access token by access token id.
-        """
-        return self.session.get(self.BASE_URL + '/{}'.format(AccessToken_Id))
-
-    def create_access_token(self,
-                            BusinessId=None,
-                            AccessCode=None,
-                            MinutesIncluded=None,
-                            MinutesLeft=None):
-        """
-        API to create an access token.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_access_token(self, AccessToken_Id):
-        """
-        API to delete access token by access token id.
-        """
-        return self.session.delete(
-            self.BASE_URL + '/{}'.format(AccessToken_Id))
-
-    def update_access_token(self,
-                            Id=None,
-                            BusinessId=None,
-                            AccessCode=None,
-                            MinutesIncluded=None,
-                            MinutesLeft=None):
-        """
-        API to update an access token.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
-
-class Booking(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/bookings'
-
-    def get_bookings(self,
-                     Booking_Id=None,
-                     Booking_Resource=None,
-                     Booking_Coworker=None,
-                     Booking_ExtraService=None,
-                     Booking_FromTime=None,
-                     Booking_ToTime=None,
-                     Booking_Notes=None,
-                     Booking_InternalNotes=None,
-                     Booking_ChargeNow=None,
-                     Booking_InvoiceNow=None,
-                     Booking_DoNotUseBookingCredit=None,
-                     Booking_PurchaseOrder=None,
-                     Booking_DiscountCode=None,
-                     Booking_LastNotificationTime=None,
-                     Booking_GoogleCalendarId=None,
-                     Booking_GoogleEventId=None,
-                     Booking_Tentative=None,
-                     Booking_Online=None,
-                     Booking_TeamsAtTheTimeOfBooking=None,
-                     Booking_TariffAtTheTimeOfBooking=None,
-                     Booking_RepeatSeriesUniqueId=None,
-                     Booking_RepeatBooking=None,
-                     Booking_Repeats=None,
-                     Booking_WhichBookingsToUpdate=None,
-                     Booking_RepeatEvery=None,
-                     Booking_RepeatUntil=None,
-                     Booking_RepeatOnMondays=None,
-                     Booking_RepeatOnTuesdays=None,
-                     Booking_RepeatOnWednesdays=None,
-                     Booking_RepeatOnThursdays=None,
-                     Booking_RepeatOnFridays=None,
-                     Booking_RepeatOnSaturdays=None,
-                     Booking_RepeatOnSundays=None,
-                     Booking_Reminded=None,
-                     Booking_MrmReminded=None,
-                     Booking_Invoiced=None,
-                     Booking_InvoiceDate=None,
-                     Booking_KisiKeyId=None,
-                     Booking_StartScheduledJobId=None,
-                     Booking_EndScheduledJobId=None,
-                     Booking_Billed=None,
-                     Booking_FromTimeLocal=None,
-                     Booking_ToTimeLocal=None,
-                     Booking_InvoiceDateLocal=None,
-                     Booking_Resource_Name=None,
-                     Booking_Coworker_FullName=None,
-                     Booking_ExtraService_Name=None):
-        """
-        API to get all bookings.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_booking_by_id(self, Booking_Id):
-        """
-        API to get booking by booking id.
-        """
-        return self.session.get(self.BASE_URL + '/{}'.format(Booking_Id))
-
-    def create_booking(self, ResourceId=None, FromTime=None, ToTime=None):
-        """
-        API to create a booking.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_booking(self, Booking_Id):
-        """
-        API to delete booking by booking id.
-        """
-        return self.session.delete(self.BASE_URL + '/{}'.format(Booking_Id))
-
-    def update_booking(self,
-                       Id=None,
-                       ResourceId=None,
-                       FromTime=None,
-                       ToTime=None):
-        """
-        API to update a booking.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
-
-class BookingProduct(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/bookingproducts'
-
-    def get_booking_products(self,
-                             BookingProduct_Id=None,
-                             BookingProduct_Booking=None,
-                             BookingProduct_Product=None,
-                             BookingProduct_InvoiceInMinutes=None,
-                             BookingProduct_Quantity=None,
-                             BookingProduct_Product_Name=None):
-        """
-        API to get all booking products.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_booking_product_by_id(self, BookingProduct_Id):
-        """
-        API to get booking product by booking product id.
-        """
-        return self.session.get(
-            self.BASE_URL + '/{}'.format(BookingProduct_Id))
-
-    def create_booking_product(self,
-                               BookingId=None,
-                               ProductId=None,
-                               Quantity=None):
-        """
-        API to create a booking product.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_booking_product(self, BookingProduct_Id):
-        """
-        API to delete booking product by booking product id.
-        """
-        return self.session.delete(
-            self.BASE_URL + '/{}'.format(BookingProduct_Id))
-
-    def update_booking_product(self,
-                               Id=None,
-                               BookingId=None,
-                               ProductId=None,
-                               Quantity=None):
-        """
-        API to update a booking product.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
-
-class CheckIn(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/checkins'
-
-    def get_checkins(self,
-                     Checkin_Id=None,
-                     Checkin_Coworker=None,
-                     Checkin_Business=None,
-                     Checkin_FromTime=None,
-                     Checkin_ToTime=None,
-                     Checkin_CountsTowardsPlanLimits=None,
-                     Checkin_CoworkerTimePassGuid=None,
-                     Checkin_AutoCheckout=None,
-                     Checkin_LastActivity=None,
-                     Checkin_MacAddresses=None,
-                     Checkin_TeamsAtTheTimeOfCheckin=None,
-                     Checkin_TariffAtTheTimeOfCheckin=None,
-                     Checkin_Coworker_FullName=None,
-                     Checkin_Business_Name=None):
-        """
-        API to get all checkins.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_checkin_by_id(self, Checkin_Id):
-        """
-        API to get checkin by checkin id.
-        """
-        return self.session.get(self.BASE_URL + '/{}'.format(Checkin_Id))
-
-    def create_checkin(self, BusinessId=None, FromTime=None):
-        """
-        API to create a checkin.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_checkin(self, Checkin_Id):
-        """
-        API to delete checkin by checkin id.
-        """
-        return self.session.delete(self.BASE_URL + '/{}'.format(Checkin_Id))
-
-    def update_checkin(self, Id=None, BusinessId=None, FromTime=None):
-        """
-        API to update a checkin.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
-
-class Coworker(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/coworkers'
-
-    def get_checkins(self,
-                     Coworker_Id=None,
-                     Coworker_Tariff=None,
-                     Coworker_NextTariff=None,
-                     Coworker_FullName=None,
-                     Coworker_Salutation=None,
-                     Coworker_Gender=None,
-                     Coworker_Email=None,
-                     Coworker_CreateUser=None,
-                     Coworker_Address=None,
-                     Coworker_PostCode=None,
-                     Coworker_CityName=None,
-                     Coworker_State=None,
-                     Coworker_Country=None,
-                     Coworker_SimpleTimeZone=None,
-                     Coworker_MobilePhone=None,
-                     Coworker_LandLine=None,
-                     Coworker_DateOfBirth=None,
-                     Coworker_NickName=None,
-                     Coworker_BusinessArea=None,
-                     Coworker_CompanyName=None,
-                     Coworker_ProfileWebsite=None,
-                     Coworker_ProfileTags=None,
-                     Coworker_ProfileSummary=None,
-                     Coworker_Twitter=None,
-                     Coworker_Facebook=None,
-                     Coworker_Linkedin=None,
-                     Coworker_Skype=None,
-                     Coworker_ProfileIsPublic=None,
-                     Coworker_InvoicingBusiness=None,
-                     Coworker_BillingEmail=None,
-                     Coworker_BillingName=None,
-                     Coworker_BillingAddress=None,
-                     Coworker_BillingPostCode=None,
-                     Coworker_BillingCityName=None,
-                     Coworker_BillingState=None,
-                     Coworker_BillingCountry=None,
-                     Coworker_BillingSimpleTimeZone=None,
-                     Coworker_TaxRate=None,
-                     Coworker_TaxIDNumber=None,
-                     Coworker_BankName=None,
-                     Coworker_BankAccount=None,
-                     Coworker_NotifyOnNewInvoice=None,
-                     Coworker_EnableGoCardlessPayments=None,
-                     Coworker_GoCardlessContractNumber=None,
-                     Coworker_LastOverDueInvoiceReminder=None,
-                     Coworker_LastLowCreditReminder=None,
-                     Coworker_RegularPaymentProvider=None,
-                     Coworker_RegularPaymentContractNumber=None,
-                     Coworker_CardNumber=None,
-                     Coworker_DoNotProcessInvoicesAutomatically=None,
-                     Coworker_AllowNetworkCheckin=None,
-                     Coworker_CheckinSinceLastRenewal=None,
-                     Coworker_MinutesSinceLastRenewal=None,
-                     Coworker_AccessCardId=None,
-                     Coworker_EzeepUserId=None,
-                     Coworker_EzeepFreePrinting=None,
-                     Coworker_PaperCutPayAsYouPrint=None,
-                     Coworker_PaperCutFreePrinting=None,
-                     Coworker_Tag=None,
-                     Coworker_Notes=None,
-                     Coworker_User=None,
-                     Coworker_Active=None,
-                     Coworker_BillingDay=None,
-                     Coworker_NextInvoice=None,
-                     Coworker_IncludeSignupFee=None,
-                     Coworker_ApplyProRating=None,
-                     Coworker_NextAutoInvoice=None,
-                     Coworker_RegistrationDate=None,
-                     Coworker_CancellationDate=None,
-                     Coworker_GeneralTermsAccepted=None,
-                     Coworker_PricePlanTermsAccepted=None,
-                     Coworker_LastRenewal=None,
-                     Coworker_LastInvoiceAttempt=None,
-                     Coworker_Custom1=None,
-                     Coworker_Custom2=None,
-                     Coworker_Custom3=None,
-                     Coworker_Custom4=None,
-                     Coworker_Custom5=None,
-                     Coworker_Custom6=None,
-                     Coworker_Custom7=None,
-                     Coworker_Custom8=None,
-                     Coworker_Custom9=None,
-                     Coworker_Custom10=None,
-                     Coworker_Custom11=None,
-                     Coworker_Custom12=None,
-                     Coworker_Custom13=None,
-                     Coworker_Custom14=None,
-                     Coworker_Custom15=None,
-                     Coworker_Custom16=None,
-                     Coworker_Custom17=None,
-                     Coworker_Custom18=None,
-                     Coworker_Custom19=None,
-                     Coworker_Custom20=None,
-                     Coworker_Custom21=None,
-                     Coworker_Custom22=None,
-                     Coworker_Custom23=None,
-                     Coworker_Custom24=None,
-                     Coworker_Custom25=None,
-                     Coworker_Custom26=None,
-                     Coworker_Custom27=None,
-                     Coworker_Custom28=None,
-                     Coworker_Custom29=None,
-                     Coworker_Custom30=None,
-                     Coworker_Tariff_Name=None,
-                     Coworker_Businesses=None,
-                     Coworker_Teams=None):
-        """
-        API to get all coworkers.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_coworker_by_id(self, Coworker_Id):
-        """
-        API to get coworker by coworker id.
-        """
-        return self.session.get(self.BASE_URL + '/{}'.format(Coworker_Id))
-
-    def create_coworker(self,
-                        FullName=None,
-                        Email=None,
-                        CountryId=None,
-                        SimpleTimeZoneId=None,
-                        CheckinSinceLastRenewal=None,
-                        MinutesSinceLastRenewal=None,
-                        BillingDay=None,
-                        AddedBusinesses=[],
-                        AddedTeams=[]):
-        """
-        API to create a coworker.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_coworker(self, Coworker_Id):
-        """
-        API to delete coworker by coworker id.
-        """
-        return self.session.delete(self.BASE_URL + '/{}'.format(Coworker_Id))
-
-    def update_coworker(self,
-                        Id=None,
-                        FullName=None,
-                        Email=None,
-                        CountryId=None,
-                        SimpleTimeZoneId=None,
-                        CheckinSinceLastRenewal=None,
-                        MinutesSinceLastRenewal=None,
-                        BillingDay=None,
-                        AddedBusinesses=[],
-                        AddedTeams=[]):
-        """
-        API to update a coworker.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
-
-class PricePlanHistory(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/coworkerpriceplanhistories'
-
-    def get_price_plan_histories(
-            self,
-            CoworkerPricePlanHistory_Id=None,
-            CoworkerPricePlanHistory_Coworker=None,
-            CoworkerPricePlanHistory_OldTariffName=None,
-            CoworkerPricePlanHistory_NewTariffName=None,
-            CoworkerPricePlanHistory_OldTariffUniqueId=None,
-            CoworkerPricePlanHistory_NewTariffUniqueId=None,
-            CoworkerPricePlanHistory_IsUpgrade=None,
-            CoworkerPricePlanHistory_Notes=None,
-            CoworkerPricePlanHistory_OldValue=None,
-            CoworkerPricePlanHistory_NewValue=None,
-            CoworkerPricePlanHistory_OldQuantity=None,
-            CoworkerPricePlanHistory_NewQuantity=None,
-            CoworkerPricePlanHistory_CreatedOnLocal=None):
-        """
-        API to get all price_plan_histories.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_price_plan_history_by_id(self, CoworkerPricePlanHistory_Id):
-        """
-        API to get price_plan_history by price_plan_history id.
-        """
-        return self.session.get(
-            self.BASE_URL + '/{}'.format(CoworkerPricePlanHistory_Id))
-
-
-class Resource(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/resources'
-
-    def get_resources(self,
-                      Resource_Id=None,
-                      Resource_Business=None,
-                      Resource_Name=None,
-                      Resource_ResourceType=None,
-                      Resource_Description=None,
-                      Resource_Visible=None,
-                      Resource_DisplayOrder=None,
-                      Resource_GroupName=None,
-                      Resource_Projector=None,
-                      Resource_Internet=None,
-                      Resource_ConferencePhone=None,
-                      Resource_StandardPhone=None,
-                      Resource_WhiteBoard=None,
-                      Resource_LargeDisplay=None,
-                      Resource_Catering=None,
-                      Resource_TeaAndCoffee=None,
-                      Resource_Drinks=None,
-                      Resource_SecurityLock=None,
-                      Resource_CCTV=None,
-                      Resource_VoiceRecorder=None,
-                      Resource_AirConditioning=None,
-                      Resource_Heating=None,
-                      Resource_NaturalLight=None,
-                      Resource_AllowMultipleBookings=None,
-                      Resource_Allocation=None,
-                      Resource_BookInAdvanceLimit=None,
-                      Resource_LateBookingLimit=None,
-                      Resource_LateCancellationLimit=None,
-                      Resource_IntervalLimit=None,
-                      Resource_NoReturnPolicy=None,
-                      Resource_NoReturnPolicyAllResources=None,
-                      Resource_NoReturnPolicyAllUsers=None,
-                      Resource_MaxBookingLength=None,
-                      Resource_MinBookingLength=None,
-                      Resource_Shifts=None,
-                      Resource_GoogleCalendarId=None,
-                      Resource_KisiGroupId=None,
-                      Resource_AccessControlGroupId=None,
-                      Resource_Longitude=None,
-                      Resource_Latitude=None,
-                      Resource_ResourceType_Name=None,
-                      Resource_Tariffs=None,
-                      Resource_LinkedResources=None):
-        """
-        API to get all resources.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
-
-    def get_resource_by_id(self, Resource_Id):
-        """
-        API to get resource by resource id.
-        """
-        return self.session.get(self.BASE_URL + '/{}'.format(Resource_Id))
-
-    def create_resource(self,
-                        BusinessId=None,
-                        Name=None,
-                        ResourceTypeId=None,
-                        DisplayOrder=None,
-                        AddedTariffs=[],
-                        AddedLinkedResources=[]):
-        """
-        API to create a resource.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
-
-    def delete_resource(self, Resource_Id):
-        """
-        API to delete resource by resource id.
-        """
-        return self.session.delete(self.BASE_URL + '/{}'.format(Resource_Id))
-
-    def update_resource(self,
-                        Id=None,
-                        BusinessId=None,
-                        Name=None,
-                        ResourceTypeId=None,
-                        DisplayOrder=None,
-                        AddedTariffs=[],
-                        AddedLinkedResources=[]):
-        """
-        API to update a resource.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
-
+def bind_arguments(function_name, names, args, kwargs):
+    """
+    Merge positional args into kwargs in the order of names, the way a
+    signature listing names would.
+    """
+    if len(args) > len(names):
+        raise TypeError("%s() takes at most %d positional arguments "
+                        "(%d given)" % (function_name, len(names),
+                                        len(args)))
+    kwargs = dict(kwargs)
+    for name, value in zip(names, args):
+        if name in kwargs:
+            raise TypeError("%s() got multiple values for argument '%s'" % (
+                function_name, name))
+        kwargs[name] = value
+    return kwargs
+
+
+def check_arguments(function_name, fields, kwargs):
+    """
+    Reject names outside the precomputed fields of an API method.
+    """
+    if not fields.issuperset(kwargs):
+        raise TypeError("%s() got unexpected argument(s): %s" % (
+            function_name, ', '.join(sorted(set(kwargs) - fields))))
+
+
+def build_body(function_name, body, fields, defaults, kwargs):
+    """
+    Payload of a generated create_*/update_* call: every body field in
+    order, defaults filled in, MissingRequiredArgumentException for a
+    field left out or None.
+    """
+    check_arguments(function_name, fields, kwargs)
+    payload = {}
+    for field in body:
+        value = kwargs.get(field, defaults.get(field))
+        if value is None:
+            raise MissingRequiredArgumentException(
+                "%s arg is required." % field)
+        payload[field] = value
+    return payload
 
-class ResourceTimeSlot(Nexudus):
-    BASE_URL = DOMAIN_URL + '/spaces/resourcetimeslots'
 
-    def get_resource_time_slots(self,
-                                ResourceTimeSlot_Id=None,
-                                ResourceTimeSlot_Resource=None,
-                                ResourceTimeSlot_FromTime=None,
-                                ResourceTimeSlot_ToTime=None,
-                                ResourceTimeSlot_DayOfWeek=None):
-        """
-        API to get all resource_time_slots.
-        """
-        params = parse_params(locals())
-        return self.session.get(self.BASE_URL, params=params)
+RANGE_PREFIXES = ('from_', 'to_')
+QUERY_OPTIONS = frozenset(['orderBy', 'dir'])
+
+
+def list_fields(list_method):
+    """
+    Filter names accepted by a get_* list method: its filters plus the
+    entity's audit fields (e.g. Booking_UpdatedOn).
+    """
+    return getattr(list_method, '__func__', list_method).endpoint.list_fields
+
+
+def filter_prefix(list_method):
+    """
+    Entity prefix of a list method's filters, e.g. 'Booking'.
+    """
+    return getattr(list_method, '__func__', list_method).endpoint.prefix
+
+
+def parse_filters(list_method, filters):
+    """
+    Validate filters against the fields of a get_* list method.
+    Besides plain fields, from_<field>/to_<field> range filters and the
+    orderBy/dir sort options are accepted.
+    """
+    fields = list_fields(list_method)
+    if fields.issuperset(filters):
+        return parse_params(filters)
+    unknown = []
+    for name in filters:
+        field = name
+        for prefix in RANGE_PREFIXES:
+            if name.startswith(prefix):
+                field = name[len(prefix):]
+                break
+        if field not in fields and name not in QUERY_OPTIONS:
+            unknown.append(name)
+    if unknown:
+        function = getattr(list_method, '__func__', list_method)
+        raise TypeError("%s() got unexpected filter(s): %s" % (
+            function.__name__, ', '.join(sorted(unknown))))
+    return parse_params(filters)
+
+
+def validate_body(write_method, item):
+    """
+    Check a write payload against a create_*/update_* method, without
+    sending anything.
+    """
+    function = getattr(write_method, '__func__', write_method)
+    return build_body(function.__name__, function.body,
+                      function.body_fields, function.defaults, item)
+
+
+class BulkResult(namedtuple('BulkResult',
+                            ['index', 'item', 'response', 'error'])):
+    """
+    Outcome of one item of a bulk call. error holds the exception raised
+    while validating or sending the item, response the API response.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None and self.response.ok
+
+
+def project(records, fields):
+    """
+    Yield records keeping only the given keys.
+    """
+    fields = tuple(fields)
+    for record in records:
+        yield dict((key, record[key]) for key in fields if key in record)
+
+
+def has_next_page(body, page):
+    if 'HasNextPage' in body:
+        return bool(body['HasNextPage'])
+    return page < body.get('TotalPages', 0)
+
+
+def id_ranges(ids, span):
+    """
+    Dedupe ids and split them into runs whose ids lie within span of the
+    run's first id. Returns (runs, singles): the runs of two or more ids,
+    each readable with one from_/to_ id range query, and the ids left on
+    their own.
+    """
+    numeric = set()
+    singles = []
+    for entity_id in ids:
+        try:
+            numeric.add(int(entity_id))
+        except (TypeError, ValueError):
+            if entity_id not in singles:
+                singles.append(entity_id)
+    runs = []
+    run = []
+    for entity_id in sorted(numeric):
+        if run and entity_id - run[0] >= span:
+            runs.append(run)
+            run = []
+        run.append(entity_id)
+    if run:
+        runs.append(run)
+    singles.extend(run[0] for run in runs if len(run) == 1)
+    return [run for run in runs if len(run) > 1], singles
 
-    def get_resource_time_slot_by_id(self, ResourceTimeSlot_Id):
-        """
-        API to get resource_time_slot by resource_time_slot id.
-        """
-        return self.session.get(
-            self.BASE_URL + '/{}'.format(ResourceTimeSlot_Id))
 
-    def create_resource_time_slot(self,
-                                  ResourceId=None,
-                                  FromTime=None,
-                                  ToTime=None):
-        """
-        API to create a resource_time_slot.
-        All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.post(self.BASE_URL, data=payload)
+class Nexudus(object):
+    # Seconds a ResponseCache keeps by-id lookups and list pages; list
+    # pages only when a resource opts in.
+    CACHE_TTL = 60
+    LIST_CACHE_TTL = None
+
+    def __init__(self,
+                 username,
+                 password,
+                 session=None,
+                 rate_limit=RATE_LIMIT,
+                 retry_policy=None,
+                 cache=None,
+                 validators=None,
+                 decoder=None,
+                 single_flight=None,
+                 metrics=None,
+                 domain_url=None):
+        self.username = username
+        self.password = password
+        self.domain_url = domain_url
+        if domain_url is not None:
+            # Same endpoint on another host, e.g. a local mock server.
+            self.BASE_URL = (domain_url.rstrip('/')
+                             + self.BASE_URL[len(DOMAIN_URL):])
+        self.rate_limit = rate_limit
+        self.retry_policy = retry_policy
+        self.cache = cache
+        self.validators = validators
+        self.single_flight = single_flight
+        self.metrics = metrics
+        if decoder is None:
+            decoder = Decoder()
+        self.decoder = decoder
+        if session is None:
+            session = self.create_session()
+        self.session = session
+        # Hooks and figures of a shared session's Metrics, if any.
+        self.metrics = getattr(session, 'metrics', None)
+        self._page_sizer = None
+        session_cache = getattr(session, 'cache', None)
+        if session_cache is not None:
+            session_cache.register(self.BASE_URL, self.ENTITY,
+                                   self.CACHE_TTL,
+                                   getattr(session, 'namespace', None),
+                                   self.LIST_CACHE_TTL)
 
-    def delete_resource_time_slot(self, ResourceTimeSlot_Id):
-        """
-        API to delete resource_time_slot by resource_time_slot id.
-        """
-        return self.session.delete(
-            self.BASE_URL + '/{}'.format(ResourceTimeSlot_Id))
-
-    def update_resource_time_slot(self,
-                                  Id=None,
-                                  ResourceId=None,
-                                  FromTime=None,
-                                  ToTime=None):
-        """
-        API to update a resource_time_slot.
+    def create_session(self):
+        from .session import build_session
+        return build_session(self.username,
+                             self.password,
+                             rate_limit=self.rate_limit,
+                             retry_policy=self.retry_policy,
+                             cache=self.cache,
+                             validators=self.validators,
+                             single_flight=self.single_flight,
+                             metrics=self.metrics,
+                             domain_url=self.domain_url)
+
+    def fetch_page(self, params, page):
+        """
+        API to get one page of a list endpoint as decoded JSON.
+        """
+        return self._fetch_page(params, page)[1]
+
+    def _fetch_page(self, params, page):
+        response = self.session.get(self.BASE_URL,
+                                    params=dict(params, page=page))
+        response.raise_for_status()
+        if self.metrics is None:
+            return response, self.decoder.decode(response)
+        started = time.perf_counter()
+        body = self.decoder.decode(response)
+        self.metrics.record_decode(self.BASE_URL,
+                                   time.perf_counter() - started)
+        return response, body
+
+    def page_sizer(self):
+        """
+        The AdaptivePageSize of this resource, created on first use and
+        kept so every iteration starts at the size learned so far.
+        """
+        if self._page_sizer is None:
+            from .paging import AdaptivePageSize
+            self._page_sizer = AdaptivePageSize()
+        return self._page_sizer
+
+    def _sizer(self, page_size):
+        """
+        The AdaptivePageSize a page_size argument asks for, if any.
+        """
+        if page_size == AUTO_PAGE_SIZE:
+            return self.page_sizer()
+        if isinstance(page_size, int):
+            return None
+        if not hasattr(page_size, 'next_size'):
+            raise TypeError("page_size must be an int, %r or an "
+                            "AdaptivePageSize, not %r." % (AUTO_PAGE_SIZE,
+                                                           page_size))
+        return page_size
+
+    def iter_records(self,
+                     list_method,
+                     filters,
+                     page_size=PAGE_SIZE,
+                     prefetch=0,
+                     fields=None):
+        """
+        Walk every page of a get_* list method lazily, yielding one
+        record at a time. Only the current page is held in memory and no
+        further page is requested once the consumer stops iterating.
+        With prefetch > 0 up to that many following pages are fetched in
+        a thread pool while the current one is consumed; records still
+        come out in page order. Keep prefetch at or below the session's
+        pool_maxsize so every worker gets a pooled connection.
+        Without prefetch, an incremental decoder parses each page as it
+        arrives from the socket instead of buffering it whole.
+        page_size=AUTO_PAGE_SIZE tunes the size from each page's latency
+        and payload (see page_sizer), as does passing an AdaptivePageSize;
+        with prefetch the size learned so far is used as is.
+        fields (e.g. ['Id', 'FromTime']) keeps only those keys of each
+        record. The API has no projection parameter, so this saves the
+        memory and handling of unused fields, not transfer.
+        """
+        params = parse_filters(list_method, filters)
+        sizer = self._sizer(page_size)
+        params['size'] = page_size if sizer is None else sizer.size
+        if prefetch > 0:
+            pages = self._prefetch_pages(params, prefetch)
+        elif sizer is not None:
+            pages = self._adaptive_pages(params, sizer)
+        elif self.decoder.incremental:
+            records = self._stream_records(params)
+            return records if fields is None else project(records, fields)
+        else:
+            pages = self._walk_pages(params)
+        records = self._page_records(pages)
+        return records if fields is None else project(records, fields)
+
+    @staticmethod
+    def _page_records(pages):
+        for body in pages:
+            for record in body.get('Records') or []:
+                yield record
+
+    def _stream_records(self, params):
+        page = 1
+        while True:
+            response = self.session.get(self.BASE_URL,
+                                        params=dict(params, page=page),
+                                        stream=True)
+            try:
+                response.raise_for_status()
+                records = self.decoder.stream(response)
+                for record in records:
+                    yield record
+            finally:
+                response.close()
+            if records.meta is None or not has_next_page(records.meta, page):
+                return
+            page += 1
+
+    def _walk_pages(self, params, page=1):
+        while True:
+            body = self.fetch_page(params, page)
+            yield body
+            if not body.get('Records') or not has_next_page(body, page):
+                return
+            page += 1
+
+    def _adaptive_pages(self, params, sizer):
+        offset = 0
+        while True:
+            size = sizer.next_size(offset)
+            page = offset // size + 1
+            started = time.perf_counter()
+            response, body = self._fetch_page(dict(params, size=size), page)
+            records = body.get('Records') or []
+            sizer.observe(size, len(records), len(response.content),
+                          time.perf_counter() - started)
+            yield body
+            if not records or not has_next_page(body, page):
+                return
+            offset = page * size
+
+    def _prefetch_pages(self, params, prefetch):
+        body = self.fetch_page(params, 1)
+        total_pages = body.get('TotalPages')
+        if not total_pages:
+            # Page count unknown, nothing to schedule ahead of time.
+            yield body
+            if body.get('Records') and has_next_page(body, 1):
+                for body in self._walk_pages(params, page=2):
+                    yield body
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        pending = deque()
+        next_page = 2
+        try:
+            while next_page <= total_pages and len(pending) < prefetch:
+                pending.append(
+                    executor.submit(self.fetch_page, params, next_page))
+                next_page += 1
+            while True:
+                yield body
+                if not body.get('Records') or not pending:
+                    return
+                body = pending.popleft().result()
+                if next_page <= total_pages:
+                    pending.append(
+                        executor.submit(self.fetch_page, params, next_page))
+                    next_page += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def get_records_by_ids(self,
+                           ids,
+                           span=PAGE_SIZE,
+                           concurrency=BULK_CONCURRENCY):
+        """
+        Fetch many entities by id in as few calls as possible. Ids close
+        together are read with one from_/to_<Entity>_Id list query per
+        run of at most span ids; isolated ids, and ids a run did not
+        return, go through get_*_by_id with concurrency calls in flight.
+        Returns a dict of id -> record; ids that do not exist are left
+        out.
+        """
+        from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor,
+                                        wait)
+        runs, singles = id_ranges(ids, span)
+        records = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            pending = set(executor.submit(self._fetch_id_range, run, span)
+                          for run in runs)
+            pending.update(executor.submit(self._fetch_by_id, entity_id)
+                           for entity_id in singles)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if isinstance(result, tuple):
+                        found, missing = result
+                        records.update(found)
+                        pending.update(
+                            executor.submit(self._fetch_by_id, entity_id)
+                            for entity_id in missing)
+                    elif result is not None:
+                        records[result['Id']] = result
+        finally:
+            executor.shutdown(wait=False)
+        return records
+
+    def _id_range_filters(self, run):
+        field = '%s_Id' % filter_prefix(getattr(self, self.LIST_METHOD))
+        return {'from_' + field: run[0], 'to_' + field: run[-1]}
+
+    def _fetch_id_range(self, run, span):
+        wanted = set(run)
+        found = {}
+        for record in self.iter_records(getattr(self, self.LIST_METHOD),
+                                        self._id_range_filters(run),
+                                        page_size=span):
+            if record.get('Id') in wanted:
+                found[record['Id']] = record
+        return found, [entity_id for entity_id in run
+                       if entity_id not in found]
+
+    def _fetch_by_id(self, entity_id):
+        response = getattr(self, 'get_%s_by_id' % self.ENTITY)(entity_id)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self.decoder.decode(response)
+
+    def bulk_create(self, items, concurrency=BULK_CONCURRENCY):
+        """
+        API to create many entities, one dict of create_* args per item.
+        Yields a BulkResult per item as soon as it completes.
+        """
+        return self.bulk_write(getattr(self, 'create_' + self.ENTITY),
+                               items, concurrency)
+
+    def bulk_update(self, items, concurrency=BULK_CONCURRENCY):
+        """
+        API to update many entities, one dict of update_* args per item.
+        Yields a BulkResult per item as soon as it completes.
+        """
+        return self.bulk_write(getattr(self, 'update_' + self.ENTITY),
+                               items, concurrency)
+
+    def bulk_delete(self, ids, concurrency=BULK_CONCURRENCY):
+        """
+        API to delete many entities by id.
+        Yields a BulkResult per id as soon as it completes.
+        """
+        return self.bulk_write(getattr(self, 'delete_' + self.ENTITY),
+                               ids, concurrency)
+
+    def bulk_write(self, write_method, items, concurrency):
+        """
+        Send write_method once per item over the shared session with at
+        most concurrency requests in flight. Payloads are validated with
+        validate_body before being queued, and a failing item is reported in
+        its BulkResult without stopping the rest of the batch. Results are
+        yielded in completion order; BulkResult.index gives the position
+        of the item in the input.
+        """
+        from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor,
+                                        wait)
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        pending = set()
+        try:
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    try:
+                        validate_body(write_method, item)
+                    except (TypeError,
+                            MissingRequiredArgumentException) as error:
+                        yield BulkResult(index, item, None, error)
+                        continue
+                pending.add(executor.submit(self._bulk_call, write_method,
+                                            index, item))
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending,
+                                         return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _bulk_call(write_method, index, item):
+        try:
+            if isinstance(item, dict):
+                response = write_method(**item)
+            else:
+                response = write_method(item)
+        except Exception as error:
+            return BulkResult(index, item, None, error)
+        return BulkResult(index, item, response, None)
+
+
+def single_argument(function_name, name, args, kwargs):
+    """
+    The one argument of a by-id method, given by position or as name.
+    """
+    if len(args) == 1 and not kwargs:
+        return args[0]
+    if not args and len(kwargs) == 1 and name in kwargs:
+        return kwargs[name]
+    raise TypeError("%s() takes exactly one argument (%s)" % (
+        function_name, name))
+
+
+class LazySignature(object):
+    """
+    Signature of a generated API method, built on first use so that
+    importing the module does not import inspect. Set as the method's
+    __wrapped__: inspect.signature (and so help()) unwraps to it and
+    reads __signature__. names are the positional parameters, required
+    unless they have a value in defaults; keywords are keyword-only
+    filters and var_keyword allows more keywords than listed.
+    """
+
+    def __init__(self, names, defaults=None, keywords=(),
+                 var_keyword=False):
+        self.names = names
+        self.defaults = defaults or {}
+        self.keywords = keywords
+        self.var_keyword = var_keyword
+        self._signature = None
+
+    @property
+    def __signature__(self):
+        if self._signature is None:
+            from inspect import Parameter, Signature
+            empty = Parameter.empty
+            parameters = [Parameter('self', Parameter.POSITIONAL_OR_KEYWORD)]
+            parameters.extend(
+                Parameter(name, Parameter.POSITIONAL_OR_KEYWORD,
+                          default=self.defaults.get(name, empty))
+                for name in self.names)
+            parameters.extend(
+                Parameter(name, Parameter.KEYWORD_ONLY, default=None)
+                for name in self.keywords)
+            if self.var_keyword:
+                parameters.append(Parameter('filters',
+                                            Parameter.VAR_KEYWORD))
+            self._signature = Signature(parameters)
+        return self._signature
+
+
+def _api_method(function, endpoint, name, doc, signature=None):
+    function.__name__ = name
+    function.__qualname__ = '%s.%s' % (endpoint.name, name)
+    function.__doc__ = doc
+    function.endpoint = endpoint
+    if signature is not None:
+        function.__wrapped__ = signature
+    return function
+
+
+def list_method(endpoint):
+    name = endpoint.list_method
+    names = endpoint.filters
+    fields = endpoint.filter_fields
+
+    def get(self, *args, **filters):
+        if args:
+            filters = bind_arguments(name, names, args, filters)
+        check_arguments(name, fields, filters)
+        return self.session.get(self.BASE_URL, params=parse_params(filters))
+
+    return _api_method(get, endpoint, name, """
+        API to get all %s.
+        Filters: %s.
+        """ % (endpoint.plural.replace('_', ' '), ', '.join(names)),
+        LazySignature(names, dict.fromkeys(names)))
+
+
+def iter_method(endpoint):
+    list_name = endpoint.list_method
+
+    def iterate(self, page_size=PAGE_SIZE, prefetch=0, fields=None,
+                **filters):
+        return self.iter_records(getattr(self, list_name),
+                                 filters,
+                                 page_size=page_size,
+                                 prefetch=prefetch,
+                                 fields=fields)
+
+    return _api_method(iterate, endpoint, 'iter_%s' % endpoint.plural, """
+        API to iterate over all %s, page by page.
+        Accepts the same filters as %s; page_size may be 'auto' and
+        fields projects records, see iter_records.
+        """ % (endpoint.plural.replace('_', ' '), list_name),
+        LazySignature(('page_size', 'prefetch', 'fields'),
+                      {'page_size': PAGE_SIZE, 'prefetch': 0,
+                       'fields': None},
+                      endpoint.filters, var_keyword=True))
+
+
+def by_id_method(endpoint, action):
+    name = '%s_%s%s' % (action, endpoint.entity,
+                        '_by_id' if action == 'get' else '')
+    id_arg = endpoint.id_arg
+    label = endpoint.entity.replace('_', ' ')
+
+    def call(self, *args, **kwargs):
+        entity_id = single_argument(name, id_arg, args, kwargs)
+        return getattr(self.session, action)(
+            self.BASE_URL + '/{}'.format(entity_id))
+
+    return _api_method(call, endpoint, name, """
+        API to %s %s by %s id.
+        """ % (action, label, label), LazySignature((id_arg,)))
+
+
+def by_ids_method(endpoint):
+
+    def get_by_ids(self, ids, span=PAGE_SIZE, concurrency=BULK_CONCURRENCY):
+        return self.get_records_by_ids(ids,
+                                       span=span,
+                                       concurrency=concurrency)
+
+    return _api_method(
+        get_by_ids, endpoint, 'get_%s_by_ids' % endpoint.plural, """
+        API to get many %s by id in as few calls as possible.
+        Returns a dict of id -> %s, see get_records_by_ids.
+        """ % (endpoint.plural.replace('_', ' '),
+               endpoint.entity.replace('_', ' ')))
+
+
+def write_method(endpoint, action):
+    name = '%s_%s' % (action, endpoint.entity)
+    body = endpoint.create_body if action == 'create' else endpoint.update_body
+    fields = frozenset(body)
+    defaults = endpoint.defaults
+    http_method = 'post' if action == 'create' else 'put'
+
+    def write(self, *args, **kwargs):
+        if args:
+            kwargs = bind_arguments(name, body, args, kwargs)
+        payload = build_body(name, body, fields, defaults, kwargs)
+        return getattr(self.session, http_method)(self.BASE_URL,
+                                                  data=payload)
+
+    write.body = body
+    write.body_fields = fields
+    write.defaults = defaults
+    return _api_method(write, endpoint, name, """
+        API to %s a %s.
+        Params: %s.
         All params are required.
-        """
-        payload = parse_body(locals())
-        return self.session.put(self.BASE_URL, data=payload)
\ No newline at end of file
+        """ % (action, endpoint.entity.replace('_', ' '), ', '.join(body)),
+        LazySignature(body, defaults))
+
+
+def resource_class(endpoint):
+    """
+    Nexudus subclass with the API methods of endpoint.
+    """
+    namespace = {
+        '__module__': __name__,
+        '__doc__': 'API of %s.' % endpoint.path,
+        'ENDPOINT': endpoint,
+        'BASE_URL': DOMAIN_URL + endpoint.path,
+        'ENTITY': endpoint.entity,
+        'LIST_METHOD': endpoint.list_method,
+    }
+    if endpoint.cache_ttl is not None:
+        namespace['CACHE_TTL'] = endpoint.cache_ttl
+    if endpoint.list_cache_ttl is not None:
+        namespace['LIST_CACHE_TTL'] = endpoint.list_cache_ttl
+    methods = [list_method(endpoint),
+               iter_method(endpoint),
+               by_id_method(endpoint, 'get'),
+               by_ids_method(endpoint)]
+    if endpoint.create_body:
+        methods.extend([write_method(endpoint, 'create'),
+                        by_id_method(endpoint, 'delete'),
+                        write_method(endpoint, 'update')])
+    for method in methods:
+        namespace[method.__name__] = method
+    return type(endpoint.name, (Nexudus,), namespace)
+
+
+AccessToken = resource_class(endpoints.ACCESS_TOKEN)
+Booking = resource_class(endpoints.BOOKING)
+BookingProduct = resource_class(endpoints.BOOKING_PRODUCT)
+CheckIn = resource_class(endpoints.CHECKIN)
+Coworker = resource_class(endpoints.COWORKER)
+PricePlanHistory = resource_class(endpoints.PRICE_PLAN_HISTORY)
+Resource = resource_class(endpoints.RESOURCE)
+ResourceTimeSlot = resource_class(endpoints.RESOURCE_TIME_SLOT)
+
+
+class Client(object):
+    """
+    Single entry point to the API.
+    Owns one connection pool and hands out every resource API as an
+    attribute, so all resources reuse the same keep-alive connections.
+    """
+
+    def __init__(self,
+                 username,
+                 password,
+                 pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE,
+                 pool_block=False,
+                 keep_alive=True,
+                 rate_limit=RATE_LIMIT,
+                 retry_policy=None,
+                 cache=None,
+                 validators=None,
+                 decoder=None,
+                 single_flight=None,
+                 metrics=None,
+                 domain_url=None):
+        self.username = username
+        self.password = password
+        self.metrics = metrics
+        self.domain_url = domain_url
+        if decoder is None:
+            decoder = Decoder()
+        self.decoder = decoder
+        from .session import build_session
+        self.session = build_session(username,
+                                     password,
+                                     pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize,
+                                     pool_block=pool_block,
+                                     keep_alive=keep_alive,
+                                     rate_limit=rate_limit,
+                                     retry_policy=retry_policy,
+                                     cache=cache,
+                                     validators=validators,
+                                     single_flight=single_flight,
+                                     metrics=metrics,
+                                     domain_url=domain_url)
+        self.access_tokens = self._resource(AccessToken)
+        self.bookings = self._resource(Booking)
+        self.booking_products = self._resource(BookingProduct)
+        self.checkins = self._resource(CheckIn)
+        self.coworkers = self._resource(Coworker)
+        self.price_plan_histories = self._resource(PricePlanHistory)
+        self.resources = self._resource(Resource)
+        self.resource_time_slots = self._resource(ResourceTimeSlot)
+
+    def _resource(self, resource_class):
+        return resource_class(self.username,
+                              self.password,
+                              session=self.session,
+                              decoder=self.decoder,
+                              domain_url=self.domain_url)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
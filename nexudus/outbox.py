@@ -0,0 +1,422 @@
+"""
+Durable write-behind outbox.
+
+Writes are validated and appended to a local SQLite file, which takes
+tens of microseconds, and a background flusher sends them to the API
+concurrently. A row is only deleted once the API accepted it, so writes
+survive an API outage or a restart of the process and are replayed
+afterwards. A write accepted by the API just before a crash or a lost
+response is sent again. Updates replay harmlessly, and a replayed
+delete answered with 404 counts as done; a create that was attempted
+before is only resent once a list query on its dedupe fields (e.g.
+Checkin_Business and Checkin_FromTime) found no record created by the
+earlier attempt.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import RequestException
+
+from .nexudus import parse_filters, validate_body
+from .retry import BACKOFF, BACKOFF_CAP, RETRY_STATUSES
+
+WORKERS = 4
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.05
+
+# Create fields identifying a record. Counters the API changes after
+# the create (MinutesLeft, Quantity, ...) are left out, or a replay would
+# miss the record it already created. Entities not listed use every
+# create field their list call can filter on.
+DEDUPE = {
+    'access_token': ('BusinessId', 'AccessCode'),
+    'booking': ('ResourceId', 'FromTime', 'ToTime'),
+    'booking_product': ('BookingId', 'ProductId'),
+    'checkin': ('BusinessId', 'FromTime'),
+    'coworker': ('Email',),
+    'resource': ('BusinessId', 'Name'),
+    'resource_time_slot': ('ResourceId', 'FromTime', 'ToTime'),
+}
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS outbox ('
+    ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' entity TEXT NOT NULL,'
+    ' action TEXT NOT NULL,'
+    ' key TEXT,'
+    ' payload TEXT NOT NULL,'
+    ' status TEXT NOT NULL,'
+    ' attempts INTEGER NOT NULL DEFAULT 0,'
+    ' next_attempt REAL NOT NULL DEFAULT 0,'
+    ' error TEXT,'
+    ' created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, seq)',
+)
+COLUMNS = ('seq', 'entity', 'action', 'key', 'payload', 'status',
+           'attempts', 'next_attempt', 'error', 'created')
+
+
+class Outbox(object):
+    """
+    Queue of create/update/delete calls for the given resources (e.g.
+    [client.checkins, client.access_tokens]), persisted in the SQLite
+    database at path.
+    Writes sharing a key are sent one at a time in the order they were
+    queued; update and delete use the entity Id as key, creates take an
+    optional key and are otherwise unordered. Connection errors and
+    429/5xx responses are retried with capped, jittered exponential
+    backoff (forever unless max_attempts is set); other failures, errors
+    in the call itself included, mark the row failed, see failed() and
+    retry_failed().
+    dedupe maps an entity to the create fields identifying a record,
+    overriding DEDUPE, e.g. {'checkin': ('BusinessId', 'FromTime')};
+    each must be a field the entity's list call filters on. Before a
+    create is retried, a record matching them means the earlier attempt
+    went through, and the row is done without sending it again.
+    synchronous is SQLite's: NORMAL survives a crash of the process,
+    FULL also a power cut, at some cost per write.
+    """
+
+    def __init__(self,
+                 path,
+                 resources,
+                 workers=WORKERS,
+                 batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL,
+                 max_attempts=None,
+                 synchronous='NORMAL',
+                 dedupe=None):
+        self.path = path
+        self.resources = dict((resource.ENTITY, resource)
+                              for resource in resources)
+        self.dedupe = dict((entity, DEDUPE.get(entity)
+                            or dedupe_fields(resource))
+                           for entity, resource in self.resources.items())
+        self.dedupe.update(dedupe or {})
+        for entity, fields in self.dedupe.items():
+            resource = self.resources.get(entity)
+            if resource is None:
+                raise ValueError("%s is not an entity of this outbox." % (
+                    entity,))
+            unknown = [field for field in fields
+                       if filter_name(resource, field) is None]
+            if unknown:
+                raise ValueError(
+                    "%s cannot be filtered on %s to dedupe creates." % (
+                        resource.LIST_METHOD, ', '.join(unknown)))
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(path, check_same_thread=False,
+                                  isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=%s' % synchronous)
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.wakeup = threading.Event()
+        self.in_flight = {}
+        self.executor = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def write(self, resource, action, key=None, **fields):
+        """
+        Validate and queue resource's <action>_<entity>(**fields) call,
+        e.g. write(client.checkins, 'create', BusinessId=1, FromTime=...).
+        Returns the row's sequence number.
+        """
+        entity = resource.ENTITY
+        if self.resources.get(entity) is not resource:
+            raise ValueError("%s is not a resource of this outbox." % (
+                resource.__class__.__name__,))
+        if action == 'delete':
+            if set(fields) != set(['Id']):
+                raise TypeError("delete takes exactly one argument (Id)")
+        else:
+            fields = validate_body(
+                getattr(resource, '%s_%s' % (action, entity)), fields)
+        if key is None and action != 'create':
+            key = fields['Id']
+        payload = json.dumps(fields, separators=(',', ':'))
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO outbox (entity, action, key, payload, status,'
+                ' created) VALUES (?, ?, ?, ?, ?, ?)',
+                (entity, action, None if key is None else str(key),
+                 payload, PENDING, time.time()))
+        self.wakeup.set()
+        return cursor.lastrowid
+
+    def create(self, resource, key=None, **fields):
+        return self.write(resource, 'create', key=key, **fields)
+
+    def update(self, resource, **fields):
+        return self.write(resource, 'update', **fields)
+
+    def delete(self, resource, entity_id):
+        return self.write(resource, 'delete', Id=entity_id)
+
+    def start(self):
+        """
+        Start the flusher thread; queued rows, including those left by a
+        previous run, are sent from now on.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._thread = threading.Thread(target=self._run,
+                                        name='nexudus-outbox')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the flusher after the calls in flight. Rows not sent yet
+        stay queued for the next start().
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self.wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+    def close(self):
+        self.stop()
+        self.db.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def pending(self):
+        with self.lock:
+            return self.db.execute(
+                'SELECT COUNT(*) FROM outbox WHERE status = ?',
+                (PENDING,)).fetchone()[0]
+
+    def failed(self):
+        """
+        Rows given up on, as dicts, oldest first.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT * FROM outbox WHERE status = ? ORDER BY seq',
+                (FAILED,)).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def retry_failed(self, seqs=None):
+        """
+        Queue failed rows (all, or those in seqs) again.
+        """
+        query = ('UPDATE outbox SET status = ?, attempts = 0,'
+                 ' next_attempt = 0 WHERE status = ?')
+        arguments = [PENDING, FAILED]
+        if seqs is not None:
+            seqs = list(seqs)
+            query += ' AND seq IN (%s)' % ','.join('?' * len(seqs))
+            arguments.extend(seqs)
+        with self.lock:
+            count = self.db.execute(query, arguments).rowcount
+        self.wakeup.set()
+        return count
+
+    def flush(self, timeout=None):
+        """
+        Wait until no row is pending. Returns False on timeout. Without a
+        flusher running (see start()) the rows are sent from the calling
+        thread, one at a time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._thread is None:
+            return self._drain(deadline)
+        with self.changed:
+            while self.db.execute(
+                    'SELECT 1 FROM outbox WHERE status = ? LIMIT 1',
+                    (PENDING,)).fetchone() is not None:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self.changed.wait(remaining)
+        return True
+
+    def _drain(self, deadline):
+        while True:
+            rows = self._claim()
+            for row in rows:
+                self._deliver(row)
+            if rows:
+                continue
+            with self.lock:
+                due = self.db.execute(
+                    'SELECT MIN(next_attempt) FROM outbox WHERE status = ?',
+                    (PENDING,)).fetchone()[0]
+            if due is None:
+                return True
+            wait = max(due - time.time(), 0.0)
+            if deadline is not None and (
+                    time.monotonic() + wait > deadline):
+                return False
+            time.sleep(wait)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.wakeup.clear()
+            for row in self._claim():
+                self.executor.submit(self._deliver, row)
+            self.wakeup.wait(self.flush_interval)
+        with self.changed:
+            while self.in_flight:
+                self.changed.wait()
+
+    def _claim(self):
+        """
+        Due rows that may be sent now: for each key only its oldest
+        pending row, and only while that key has nothing in flight.
+        Claimed rows get their attempt counted before they are sent.
+        """
+        capacity = self.workers * 2
+        now = time.time()
+        with self.lock:
+            if len(self.in_flight) >= capacity:
+                return []
+            rows = self.db.execute(
+                'SELECT seq, entity, action, key, payload, attempts,'
+                ' next_attempt FROM outbox WHERE status = ?'
+                ' ORDER BY seq LIMIT ?',
+                (PENDING, self.batch_size)).fetchall()
+            busy = set(self.in_flight.values())
+            claimed = []
+            for row in rows:
+                seq, entity, _, key, _, _, next_attempt = row
+                ordering = (entity, key) if key is not None else None
+                if seq in self.in_flight or ordering in busy:
+                    continue
+                if ordering is not None:
+                    # Later writes of this key wait for this one.
+                    busy.add(ordering)
+                if next_attempt > now:
+                    continue
+                claimed.append(row)
+                self.in_flight[seq] = ordering
+                if len(self.in_flight) >= capacity:
+                    break
+            if claimed:
+                self.db.execute(
+                    'UPDATE outbox SET attempts = attempts + 1'
+                    ' WHERE seq IN (%s)' % ','.join('?' * len(claimed)),
+                    [row[0] for row in claimed])
+        return claimed
+
+    def _deliver(self, row):
+        seq, entity, action, _, payload, attempts, _ = row
+        attempts += 1
+        try:
+            retry, error = self._send(entity, action, json.loads(payload),
+                                      attempts)
+        except Exception as unexpected:
+            retry, error = False, repr(unexpected)
+        with self.changed:
+            if error is None:
+                self.db.execute('DELETE FROM outbox WHERE seq = ?', (seq,))
+            elif retry and (self.max_attempts is None
+                            or attempts < self.max_attempts):
+                delay = random.uniform(
+                    0, min(BACKOFF_CAP, BACKOFF * 2 ** attempts))
+                self.db.execute(
+                    'UPDATE outbox SET next_attempt = ?, error = ?'
+                    ' WHERE seq = ?', (time.time() + delay, error, seq))
+            else:
+                self.db.execute(
+                    'UPDATE outbox SET status = ?, error = ? WHERE seq = ?',
+                    (FAILED, error, seq))
+            del self.in_flight[seq]
+            self.changed.notify_all()
+        self.wakeup.set()
+
+    def _send(self, entity, action, fields, attempts=1):
+        """
+        Send one row. Returns (retry, error), error None on success.
+        Only connection errors and 429/5xx responses are retried; any
+        other exception propagates and fails the row.
+        """
+        method = getattr(self.resources[entity],
+                         '%s_%s' % (action, entity))
+        try:
+            if action == 'create' and attempts > 1:
+                if self._created(entity, fields):
+                    return False, None
+            if action == 'delete':
+                response = method(fields['Id'])
+            else:
+                response = method(**fields)
+        except RequestException as error:
+            return True, repr(error)
+        if response.ok:
+            return False, None
+        if (action == 'delete' and attempts > 1
+                and response.status_code == 404):
+            # An earlier attempt deleted it.
+            return False, None
+        error = 'HTTP %s: %s' % (response.status_code, response.text[:200])
+        return response.status_code in RETRY_STATUSES, error
+
+    def _created(self, entity, fields):
+        """
+        Whether a record matching the dedupe fields of a create exists.
+        """
+        resource = self.resources[entity]
+        list_method = getattr(resource, resource.LIST_METHOD)
+        filters = {}
+        for field in self.dedupe.get(entity) or ():
+            value = fields.get(field)
+            if value is None or isinstance(value, (list, tuple)):
+                continue
+            filters[filter_name(resource, field)] = value
+        if not filters:
+            return False
+        params = parse_filters(list_method, filters)
+        params['size'] = 1
+        return bool(resource.fetch_page(params, 1).get('Records'))
+
+
+def filter_name(resource, field):
+    """
+    List filter matching a create field, e.g. Checkin_Business for
+    BusinessId; None if the list call cannot filter on it.
+    """
+    endpoint = resource.ENDPOINT
+    names = ['%s_%s' % (endpoint.prefix, field)]
+    if field.endswith('Id'):
+        names.insert(0, '%s_%s' % (endpoint.prefix, field[:-2]))
+    for name in names:
+        if name in endpoint.filter_fields:
+            return name
+    return None
+
+
+def dedupe_fields(resource):
+    """
+    Create fields of resource that its list call can filter on.
+    """
+    return tuple(field for field in resource.ENDPOINT.create_body
+                 if filter_name(resource, field) is not None)
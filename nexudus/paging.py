@@ -0,0 +1,102 @@
+"""
+Adaptive page size for list iteration.
+
+A bigger page means fewer round trips, but past some size a page takes
+long enough to time out, or is so large that memory and retries get
+expensive, and the server may spend more per record on it. AdaptivePageSize
+climbs towards the size with the best records/second seen, within a
+latency and a payload budget per page.
+
+Sizes are min_size times a power of two. Pages are addressed by number,
+so a new size is only used at an offset it divides; growing may wait one
+page, shrinking never has to.
+"""
+
+import threading
+
+from .nexudus import PAGE_SIZE
+
+MIN_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 1000
+TARGET_SECONDS = 2.0
+MAX_PAGE_BYTES = 4 * 1024 * 1024
+# A bigger page must beat the current rate by this much to be kept.
+TOLERANCE = 0.05
+SMOOTHING = 0.3
+
+
+class AdaptivePageSize(object):
+    """
+    Page size tuned from the latency and payload of the pages read.
+    After each full page the size doubles while a page stays under half
+    of target_seconds and max_bytes and a bigger size has not proven
+    slower per record, and halves once a page exceeds either budget or a
+    smaller size was faster. max_size is the largest size the API is
+    asked for. One instance may be shared by threads; resources keep one
+    each (see Nexudus.page_sizer) so every iteration starts at the size
+    learned so far.
+    """
+
+    def __init__(self,
+                 initial=PAGE_SIZE,
+                 min_size=MIN_PAGE_SIZE,
+                 max_size=MAX_PAGE_SIZE,
+                 target_seconds=TARGET_SECONDS,
+                 max_bytes=MAX_PAGE_BYTES):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.size = self.valid_size(initial)
+        # Smoothed records/second per page size.
+        self.rates = {}
+        self.lock = threading.Lock()
+
+    def valid_size(self, size):
+        """
+        Largest min_size * 2**k not above size and max_size.
+        """
+        valid = self.min_size
+        while valid * 2 <= min(size, self.max_size):
+            valid *= 2
+        return valid
+
+    def next_size(self, offset):
+        """
+        Size to read the page starting at record offset with.
+        """
+        size = self.size
+        while offset % size:
+            size //= 2
+        return size
+
+    def observe(self, size, records, payload_bytes, seconds):
+        """
+        Learn from a page of size that returned records records in
+        payload_bytes bytes after seconds.
+        """
+        if records < size:
+            # The last page says nothing about throughput.
+            return
+        rate = records / max(seconds, 1e-6)
+        with self.lock:
+            previous = self.rates.get(size)
+            if previous is not None:
+                rate = previous + SMOOTHING * (rate - previous)
+            self.rates[size] = rate
+            if (seconds > self.target_seconds
+                    or payload_bytes > self.max_bytes):
+                self.size = max(self.min_size, size // 2)
+                return
+            smaller = self.rates.get(size // 2)
+            if smaller is not None and smaller > rate * (1 + TOLERANCE):
+                self.size = max(self.min_size, size // 2)
+                return
+            bigger = self.rates.get(size * 2)
+            if (size * 2 <= self.max_size
+                    and seconds * 2 <= self.target_seconds
+                    and payload_bytes * 2 <= self.max_bytes
+                    and (bigger is None or bigger > rate * (1 + TOLERANCE))):
+                self.size = size * 2
+            else:
+                self.size = size
@@ -0,0 +1,205 @@
+"""
+Client-side rate limiting shared by every resource using the same
+credentials against the same host.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+RATE_LIMIT = 10.0
+MIN_RATE = 0.5
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 1.0
+SLOW_START_STEP = 0.25
+API_HOST = 'spaces.nexudus.com'
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def parse_retry_after(value, now=None):
+    """
+    Seconds to wait according to a Retry-After header, which is either a
+    number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, email.utils.mktime_tz(parsed) - now)
+
+
+def _header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+class RateLimiter(object):
+    """
+    Adaptive token bucket.
+    Requests reserve a token before they are sent. After every response
+    the bucket adapts: a 429 halves the rate and pauses until Retry-After,
+    X-RateLimit-Remaining/Reset headers pace the remaining budget over the
+    window, and otherwise the rate grows: exponentially until the first
+    429, then by about INCREASE_STEP per second, capped by max_rate.
+    """
+
+    def __init__(self,
+                 rate=RATE_LIMIT,
+                 burst=None,
+                 min_rate=MIN_RATE,
+                 max_rate=None):
+        self.rate = float(rate)
+        # Starting rate asked for, see shared_rate_limiter.
+        self.initial = self.rate
+        self.burst = float(burst or max(1.0, rate))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_until = 0.0
+        self.throttled = False
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token and return how many seconds the caller must wait
+        before sending its request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def observe(self, status_code, headers):
+        """
+        Adjust the rate from a response's status and rate headers.
+        """
+        with self.lock:
+            if status_code == 429:
+                self._throttled(headers)
+                return
+            remaining = _header(headers, 'X-RateLimit-Remaining',
+                                'RateLimit-Remaining')
+            reset = _header(headers, 'X-RateLimit-Reset', 'RateLimit-Reset')
+            if remaining is not None and reset is not None:
+                try:
+                    remaining, reset = float(remaining), float(reset)
+                except ValueError:
+                    pass
+                else:
+                    if reset > 1e9:
+                        reset -= time.time()
+                    self._set_rate(remaining / max(reset, 1.0))
+                    return
+            if self.throttled:
+                self._set_rate(self.rate + INCREASE_STEP / self.rate)
+            else:
+                self._set_rate(self.rate + SLOW_START_STEP)
+
+    def _throttled(self, headers):
+        now = time.monotonic()
+        self.throttled = True
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        # Requests already in flight when the limit was hit come back as
+        # 429s too; only the first of them lowers the rate.
+        if now >= self.decreased_until:
+            self._set_rate(self.rate * DECREASE_FACTOR)
+            self.decreased_until = now + max(retry_after or 0.0, 1.0)
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        self.tokens = min(self.tokens, 0.0)
+
+    def _set_rate(self, rate):
+        if self.max_rate is not None:
+            rate = min(rate, self.max_rate)
+        self.rate = max(self.min_rate, rate)
+
+
+def _shared_field(index):
+    def get(self):
+        return self.state[index]
+
+    def set(self, value):
+        self.state[index] = value
+    return property(get, set)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose state lives in shared memory, so every process it
+    is handed to at start-up (e.g. as a pool initializer argument) draws
+    from one budget and backs off together after a 429.
+    """
+
+    STATE = ('rate', 'tokens', 'updated', 'paused_until', 'decreased_until',
+             'throttled')
+
+    def __init__(self,
+                 rate=RATE_LIMIT,
+                 burst=None,
+                 min_rate=MIN_RATE,
+                 max_rate=None,
+                 context=None):
+        if context is None:
+            import multiprocessing as context
+        self.state = context.RawArray('d', len(self.STATE))
+        super(SharedRateLimiter, self).__init__(rate=rate,
+                                                burst=burst,
+                                                min_rate=min_rate,
+                                                max_rate=max_rate)
+        self.lock = context.Lock()
+
+
+for _index, _name in enumerate(SharedRateLimiter.STATE):
+    setattr(SharedRateLimiter, _name, _shared_field(_index))
+del _index, _name
+
+
+def url_host(url):
+    """
+    Host of url, API_HOST for None.
+    """
+    if url is None:
+        return API_HOST
+    return urlsplit(url).netloc.lower() or API_HOST
+
+
+def shared_rate_limiter(username, rate=RATE_LIMIT, host=API_HOST):
+    """
+    Return the limiter shared by every session using these credentials
+    against host, creating it on first use. Asking for a starting rate
+    other than the last one asked for resets the limiter to it.
+    """
+    key = (username, host.lower())
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(rate=rate)
+        elif float(rate) != limiter.initial:
+            with limiter.lock:
+                limiter.initial = float(rate)
+                limiter._set_rate(limiter.initial)
+        return limiter
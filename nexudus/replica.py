@@ -0,0 +1,414 @@
+"""
+In-memory replica of bookings and resource time slots for answering
+availability questions without calling the API.
+
+The replica loads every booking once, then keeps itself fresh with delta
+refreshes (see sync.DeltaSync) and with the writes the client sends
+itself: create_booking, update_booking and delete_booking calls through
+the same session update it as soon as the API accepts them. Registered
+with a webhooks.WebhookReceiver, on_event applies everybody else's
+changes as they are pushed, and refreshes become a reconciliation that
+can run rarely.
+"""
+
+import bisect
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .dates import parse_datetime
+from .nexudus import PAGE_SIZE
+from .sync import Checkpoint, DeltaSync
+
+REFRESH_INTERVAL = 60
+RELOAD_EVERY = 60
+DAY = timedelta(days=1)
+# Intervals longer than this are kept apart by IntervalIndex.
+LONG_INTERVAL = DAY
+
+
+def to_instant(value):
+    """
+    Naive UTC datetime for an API date string or a datetime, None for
+    anything else. Naive values are taken to be UTC already, as the API's
+    FromTime/ToTime are.
+    """
+    value = parse_datetime(value)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def time_of_day(value):
+    """
+    Offset from midnight of the time part of a time slot bound.
+    """
+    value = to_instant(value)
+    if value is None:
+        return None
+    return timedelta(hours=value.hour, minutes=value.minute,
+                     seconds=value.second)
+
+
+def reference(record, field):
+    """
+    Id of a referenced entity, given either as <field>Id or <field>.
+    """
+    value = record.get(field + 'Id')
+    if value is None:
+        value = record.get(field)
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    return value
+
+
+class IntervalIndex(object):
+    """
+    Intervals kept sorted by start, together with the longest interval
+    length seen. All intervals overlapping [start, end) start within
+    [start - longest, end), so a query is two bisections plus a scan of
+    that window. Intervals longer than long_interval, e.g. month-long
+    bookings, are kept in a separate list scanned in full, so they never
+    widen the window; they are few.
+    """
+
+    def __init__(self, long_interval=LONG_INTERVAL):
+        self.long_interval = long_interval
+        self.starts = []
+        self.entries = []
+        self.long = {}
+        self.intervals = {}
+        self.longest = timedelta(0)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, key):
+        return key in self.intervals
+
+    def add(self, key, start, end):
+        if key in self.intervals:
+            self.remove(key)
+        self.intervals[key] = (start, end)
+        if end - start > self.long_interval:
+            self.long[key] = (start, end, key)
+            return
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.entries.insert(index, (start, end, key))
+        if end - start > self.longest:
+            self.longest = end - start
+
+    def remove(self, key):
+        interval = self.intervals.pop(key, None)
+        if interval is None:
+            return False
+        if self.long.pop(key, None) is not None:
+            return True
+        start, end = interval
+        index = bisect.bisect_left(self.starts, start)
+        while self.entries[index][2] != key:
+            index += 1
+        del self.starts[index]
+        del self.entries[index]
+        return True
+
+    def overlapping(self, start, end):
+        """
+        (start, end, key) of every interval overlapping [start, end),
+        ordered by start.
+        """
+        low = bisect.bisect_left(self.starts, start - self.longest)
+        high = bisect.bisect_left(self.starts, end)
+        found = [entry for entry in self.entries[low:high]
+                 if entry[1] > start]
+        if self.long:
+            found.extend(entry for entry in self.long.values()
+                         if entry[0] < end and entry[1] > start)
+            found.sort(key=lambda entry: entry[0])
+        return found
+
+
+class Replica(object):
+    """
+    Local copy of the bookings of a Booking resource and, optionally, the
+    opening hours given by a ResourceTimeSlot resource, indexed per
+    resource id.
+    Call load() once (or start() to also refresh in the background every
+    refresh_interval seconds). Refreshes are deltas on UpdatedOn; as
+    deltas cannot see bookings deleted by other clients, every
+    reload_every-th refresh reloads everything.
+    Query times are datetimes or API date strings and are compared in
+    UTC; time slot hours are applied to those UTC times as well.
+    """
+
+    def __init__(self,
+                 bookings,
+                 time_slots=None,
+                 refresh_interval=REFRESH_INTERVAL,
+                 reload_every=RELOAD_EVERY,
+                 page_size=PAGE_SIZE):
+        self.bookings = bookings
+        self.time_slots = time_slots
+        self.refresh_interval = refresh_interval
+        self.reload_every = reload_every
+        self.page_size = page_size
+        self.lock = threading.RLock()
+        self.indexes = {}
+        self.records = {}
+        self.slots = {}
+        self.slot_records = {}
+        self.sync = None
+        self.refreshes = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        for resource in (bookings, time_slots):
+            if resource is not None:
+                resource.session.add_write_listener(self.on_write)
+
+    def close(self):
+        self.stop()
+        for resource in (self.bookings, self.time_slots):
+            if resource is not None:
+                resource.session.remove_write_listener(self.on_write)
+
+    def load(self):
+        """
+        Replace the replica with a full read of bookings and time slots.
+        """
+        sync = DeltaSync(Checkpoint(None), page_size=self.page_size)
+        records = list(sync.changes(self.bookings))
+        slot_records = []
+        if self.time_slots is not None:
+            slot_records = list(self.time_slots.iter_resource_time_slots(
+                page_size=self.page_size))
+        with self.lock:
+            self.indexes = {}
+            self.records = {}
+            for record in records:
+                self._put_booking(record)
+            self.slots = {}
+            self.slot_records = {}
+            for record in slot_records:
+                self._put_slot(record)
+            self.sync = sync
+            self.refreshes = 0
+
+    def refresh(self):
+        """
+        Apply the bookings changed since the last load or refresh, or do a
+        full load when due. Returns the number of changed bookings.
+        """
+        if self.sync is None or (self.reload_every
+                                 and self.refreshes >= self.reload_every):
+            self.load()
+            return len(self.records)
+        changed = 0
+        for record in self.sync.changes(self.bookings):
+            with self.lock:
+                self._put_booking(record)
+            changed += 1
+        self.refreshes += 1
+        return changed
+
+    def start(self):
+        """
+        Load now and refresh every refresh_interval seconds in a daemon
+        thread until stop().
+        """
+        self.load()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='nexudus-replica')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the last good state until the next round.
+                continue
+
+    def _put_booking(self, record):
+        booking_id = record.get('Id')
+        if booking_id is None:
+            return
+        self._drop_booking(booking_id)
+        resource_id = reference(record, 'Resource')
+        start = to_instant(record.get('FromTime'))
+        end = to_instant(record.get('ToTime'))
+        if resource_id is None or start is None or end is None:
+            return
+        index = self.indexes.get(resource_id)
+        if index is None:
+            index = self.indexes[resource_id] = IntervalIndex()
+        index.add(booking_id, start, end)
+        self.records[booking_id] = record
+
+    def _drop_booking(self, booking_id):
+        record = self.records.pop(booking_id, None)
+        if record is not None:
+            self.indexes[reference(record, 'Resource')].remove(booking_id)
+
+    def _put_slot(self, record):
+        slot_id = record.get('Id')
+        if slot_id is None:
+            return
+        self._drop_slot(slot_id)
+        resource_id = reference(record, 'Resource')
+        start = time_of_day(record.get('FromTime'))
+        end = time_of_day(record.get('ToTime'))
+        day = record.get('DayOfWeek')
+        if resource_id is None or start is None or end is None or day is None:
+            return
+        if end <= start:
+            end = DAY
+        slots = self.slots.setdefault(resource_id, {})
+        bisect.insort(slots.setdefault(int(day), []), (start, end, slot_id))
+        self.slot_records[slot_id] = record
+
+    def _drop_slot(self, slot_id):
+        record = self.slot_records.pop(slot_id, None)
+        if record is None:
+            return
+        days = self.slots.get(reference(record, 'Resource'), {})
+        for slots in days.values():
+            for slot in slots:
+                if slot[2] == slot_id:
+                    slots.remove(slot)
+                    return
+
+    def on_write(self, method, url, data, response):
+        """
+        Write listener applying the client's own booking and time slot
+        writes to the replica. Updates are merged into the known record,
+        keeping the fields the update did not send.
+        """
+        for resource, put, drop, records in (
+                (self.bookings, self._put_booking, self._drop_booking,
+                 self.records),
+                (self.time_slots, self._put_slot, self._drop_slot,
+                 self.slot_records)):
+            if resource is None or not url.startswith(resource.BASE_URL):
+                continue
+            with self.lock:
+                if method == 'DELETE':
+                    key = url[len(resource.BASE_URL):].strip('/')
+                    drop(int(key) if key.isdigit() else key)
+                elif method in ('POST', 'PUT'):
+                    record = dict(data or {})
+                    record.update(self._created(response))
+                    if method == 'PUT':
+                        known = records.get(record.get('Id'))
+                        record = dict(known or {}, **record)
+                    put(record)
+            return
+
+    def on_event(self, event):
+        """
+        Webhook handler (see webhooks.WebhookReceiver) applying booking
+        and time slot changes pushed by the API. Changes are merged into
+        the known record, so partial payloads are fine.
+        """
+        if event.entity == self.bookings.ENTITY:
+            put, drop, records = (self._put_booking, self._drop_booking,
+                                  self.records)
+        elif (self.time_slots is not None
+              and event.entity == self.time_slots.ENTITY):
+            put, drop, records = (self._put_slot, self._drop_slot,
+                                  self.slot_records)
+        else:
+            return
+        with self.lock:
+            if event.kind == 'delete':
+                drop(event.entity_id)
+            else:
+                record = dict(records.get(event.entity_id) or {})
+                record.update(event.record)
+                put(record)
+
+    @staticmethod
+    def _created(response):
+        try:
+            body = response.json()
+        except ValueError:
+            return {}
+        value = body.get('Value') if isinstance(body, dict) else None
+        return value if isinstance(value, dict) else {}
+
+    def conflicts(self, resource_id, start, end, exclude=None):
+        """
+        Bookings of resource_id overlapping [start, end), ordered by start.
+        exclude skips one booking id, e.g. the one being moved.
+        """
+        start, end = to_instant(start), to_instant(end)
+        with self.lock:
+            index = self.indexes.get(resource_id)
+            if index is None:
+                return []
+            return [self.records[key]
+                    for _, _, key in index.overlapping(start, end)
+                    if key != exclude]
+
+    def busy(self, resource_id, start, end):
+        """
+        Merged (start, end) busy periods of resource_id within
+        [start, end).
+        """
+        start, end = to_instant(start), to_instant(end)
+        periods = []
+        with self.lock:
+            index = self.indexes.get(resource_id)
+            entries = index.overlapping(start, end) if index else []
+        for busy_start, busy_end, _ in entries:
+            busy_start, busy_end = max(busy_start, start), min(busy_end, end)
+            if periods and busy_start <= periods[-1][1]:
+                if busy_end > periods[-1][1]:
+                    periods[-1] = (periods[-1][0], busy_end)
+            else:
+                periods.append((busy_start, busy_end))
+        return periods
+
+    def is_open(self, resource_id, start, end):
+        """
+        Whether [start, end) lies within the time slots of resource_id.
+        Resources without time slots are always open.
+        """
+        start, end = to_instant(start), to_instant(end)
+        with self.lock:
+            days = self.slots.get(resource_id)
+            if not days:
+                return True
+            day_start = datetime(start.year, start.month, start.day)
+            while day_start < end:
+                # .NET DayOfWeek numbering, Sunday is 0.
+                day = (day_start.weekday() + 1) % 7
+                needed_from = max(start, day_start) - day_start
+                needed_to = min(end, day_start + DAY) - day_start
+                for slot_start, slot_end, _ in days.get(day, ()):
+                    if slot_start > needed_from:
+                        break
+                    if slot_end > needed_from:
+                        needed_from = slot_end
+                    if needed_from >= needed_to:
+                        break
+                if needed_from < needed_to:
+                    return False
+                day_start += DAY
+            return True
+
+    def is_free(self, resource_id, start, end, exclude=None):
+        """
+        Whether resource_id is open and has no booking in [start, end).
+        """
+        start, end = to_instant(start), to_instant(end)
+        return (self.is_open(resource_id, start, end)
+                and not self.conflicts(resource_id, start, end,
+                                       exclude=exclude))
@@ -0,0 +1,79 @@
+"""
+Retry policy with capped exponential backoff and full jitter.
+"""
+
+import random
+import time
+
+from .ratelimit import parse_retry_after
+
+MAX_ATTEMPTS = 4
+BACKOFF = 0.5
+BACKOFF_CAP = 10.0
+DEADLINE = 30.0
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when a failed call is sent again.
+    Idempotent methods are retried by default; POST only when retry_post
+    is set or the call passes retry=True. Sleeps are drawn uniformly from
+    [0, min(backoff_cap, backoff * 2 ** attempt)] so clients recovering
+    from the same incident spread out, and no retry is scheduled past the
+    deadline, counted in seconds from the first attempt.
+    max_attempts=1 disables retries; sessions given no policy use
+    RetryPolicy().
+    """
+
+    def __init__(self,
+                 max_attempts=MAX_ATTEMPTS,
+                 backoff=BACKOFF,
+                 backoff_cap=BACKOFF_CAP,
+                 deadline=DEADLINE,
+                 retry_post=False,
+                 statuses=RETRY_STATUSES):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.deadline = deadline
+        self.retry_post = retry_post
+        self.statuses = frozenset(statuses)
+
+    def allows(self, method, retry=None):
+        """
+        Whether calls with this HTTP method may be retried. An explicit
+        retry=True/False from the caller wins over the policy.
+        """
+        if retry is not None:
+            return retry and self.max_attempts > 1
+        if self.max_attempts <= 1:
+            return False
+        method = method.upper()
+        return method in IDEMPOTENT_METHODS or (
+            self.retry_post and method == 'POST')
+
+    def remaining(self, started):
+        return self.deadline - (time.monotonic() - started)
+
+    def next_delay(self, attempt, started, status_code=None, headers=None):
+        """
+        Seconds to sleep before attempt number attempt + 1, or None when
+        the call should give up. status_code is None for connection
+        errors.
+        """
+        if status_code is not None and status_code not in self.statuses:
+            return None
+        if attempt >= self.max_attempts:
+            return None
+        delay = random.uniform(
+            0, min(self.backoff_cap, self.backoff * 2 ** attempt))
+        if headers is not None:
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        if delay >= self.remaining(started):
+            return None
+        return delay
@@ -0,0 +1,308 @@
+"""
+Incremental occupancy and utilisation rollups.
+
+A Rollup turns interval records, check-ins or bookings, into the number
+of seconds present per key (business, resource, ...) and time bucket,
+held in one numpy array. Records are added in batches as they arrive,
+from a full load, DeltaSync.changes or webhook events; every record's
+contribution is remembered by id, so a changed record replaces its old
+contribution and a deleted one is taken out. Range queries slice the
+array and never look at the records again.
+
+numpy is required (pip install nexudus[export]).
+"""
+
+from datetime import datetime, timezone
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+BUCKET = 3600
+KEY_CAPACITY = 16
+BUCKET_CAPACITY = 24 * 7
+
+
+def to_seconds(value):
+    """
+    Epoch seconds of a datetime (naive taken as UTC) or an API date string.
+    """
+    if isinstance(value, str):
+        from .dates import parse_datetime
+        value = parse_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def epoch_seconds(values):
+    """
+    float64 epoch seconds of API date strings, NaN where missing.
+    """
+    from .export import timestamp_array
+    stamps = timestamp_array(values)
+    seconds = stamps.astype('int64').astype(numpy.float64) / 1000.0
+    seconds[numpy.isnat(stamps)] = numpy.nan
+    return seconds
+
+
+class Rollup(object):
+    """
+    Seconds of presence per key and bucket of bucket seconds.
+    key is the record field to group by (e.g. 'BusinessId') or a
+    function of the record; start_field and end_field bound each
+    interval. A record without an end, a check-in still open, counts up
+    to the now of each query. Buckets are aligned to the epoch, so
+    queries cover whole buckets: from the one holding start to the one
+    before the one holding end.
+    """
+
+    def __init__(self,
+                 key,
+                 bucket=BUCKET,
+                 start_field='FromTime',
+                 end_field='ToTime'):
+        if numpy is None:
+            raise ImportError("numpy is required for rollups, install it "
+                              "with 'pip install nexudus[export]'.")
+        self.key = key
+        self.bucket = float(bucket)
+        self.start_field = start_field
+        self.end_field = end_field
+        self.rows = {}
+        self.keys = []
+        # Absolute bucket number of column 0.
+        self.first = None
+        self.data = numpy.zeros((KEY_CAPACITY, 0))
+        # id -> (row, start, end) of closed intervals, (row, start) of
+        # open ones.
+        self.closed = {}
+        self.open = {}
+
+    def __len__(self):
+        return len(self.closed) + len(self.open)
+
+    def _key(self, record):
+        if callable(self.key):
+            return self.key(record)
+        return record.get(self.key)
+
+    def _row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            if row >= self.data.shape[0]:
+                grown = numpy.zeros((self.data.shape[0] * 2,
+                                     self.data.shape[1]))
+                grown[:self.data.shape[0]] = self.data
+                self.data = grown
+        return row
+
+    def _cover(self, low, high):
+        """
+        Widen the array to absolute buckets low..high, with headroom.
+        """
+        if self.first is None:
+            self.first = low
+        width = self.data.shape[1]
+        last = self.first + width - 1
+        if low >= self.first and high <= last:
+            return
+        grow = max(width, BUCKET_CAPACITY)
+        first = min(self.first, low - grow) if low < self.first else (
+            self.first)
+        last = max(last, high + grow) if high > last else last
+        grown = numpy.zeros((self.data.shape[0], last - first + 1))
+        offset = self.first - first
+        grown[:, offset:offset + width] = self.data
+        self.data = grown
+        self.first = first
+
+    def _spread(self, rows, starts, ends):
+        """
+        (rows, absolute buckets, seconds) of intervals split at bucket
+        edges.
+        """
+        size = self.bucket
+        low = numpy.floor(starts / size).astype(numpy.int64)
+        high = numpy.ceil(ends / size).astype(numpy.int64) - 1
+        high = numpy.maximum(high, low)
+        counts = high - low + 1
+        total = int(counts.sum())
+        index = numpy.repeat(numpy.arange(len(rows)), counts)
+        # Position of each piece within its interval.
+        step = numpy.arange(total) - numpy.repeat(
+            numpy.cumsum(counts) - counts, counts)
+        buckets = low[index] + step
+        edges = buckets * size
+        seconds = (numpy.minimum(ends[index], edges + size)
+                   - numpy.maximum(starts[index], edges))
+        return rows[index], buckets, seconds
+
+    def _apply(self, rows, starts, ends, sign):
+        if not len(rows):
+            return
+        rows, buckets, seconds = self._spread(
+            numpy.asarray(rows, dtype=numpy.int64),
+            numpy.asarray(starts, dtype=numpy.float64),
+            numpy.asarray(ends, dtype=numpy.float64))
+        self._cover(int(buckets.min()), int(buckets.max()))
+        numpy.add.at(self.data, (rows, buckets - self.first),
+                     sign * seconds)
+
+    def add(self, records):
+        """
+        Add or replace records by Id, given as an iterable or a single
+        record; of a batch holding one Id twice the last copy counts.
+        Returns how many were taken; records without a key or a valid
+        interval are skipped.
+        """
+        if isinstance(records, dict):
+            records = [records]
+        latest = {}
+        for record in records:
+            if record.get('Id') is not None:
+                latest[record['Id']] = record
+        records = list(latest.values())
+        if not records:
+            return 0
+        starts = epoch_seconds([record.get(self.start_field)
+                                for record in records])
+        ends = epoch_seconds([record.get(self.end_field)
+                              for record in records])
+        self.remove(record['Id'] for record in records)
+        added = ([], [], [])
+        taken = 0
+        for record, start, end in zip(records, starts.tolist(),
+                                      ends.tolist()):
+            key = self._key(record)
+            if key is None or start != start:
+                continue
+            taken += 1
+            row = self._row(key)
+            if end != end:
+                self.open[record['Id']] = (row, start)
+            elif end > start:
+                self.closed[record['Id']] = (row, start, end)
+                added[0].append(row)
+                added[1].append(start)
+                added[2].append(end)
+        self._apply(added[0], added[1], added[2], 1.0)
+        return taken
+
+    def remove(self, ids):
+        """
+        Take the contributions of the records with these ids out.
+        """
+        removed = ([], [], [])
+        for entity_id in ids:
+            self.open.pop(entity_id, None)
+            closed = self.closed.pop(entity_id, None)
+            if closed is not None:
+                for values, value in zip(removed, closed):
+                    values.append(value)
+        self._apply(removed[0], removed[1], removed[2], -1.0)
+
+    def on_event(self, event):
+        """
+        Webhook handler (see webhooks.WebhookReceiver); pushed records
+        must carry the key and interval fields.
+        """
+        if event.kind == 'delete':
+            self.remove([event.entity_id])
+        else:
+            self.add([event.record])
+
+    def _range(self, start, end):
+        size = self.bucket
+        low = int(to_seconds(start) // size)
+        high = int(-(-to_seconds(end) // size))
+        return low, max(high, low)
+
+    def buckets(self, start, end):
+        """
+        datetime64[s] start of each bucket of the range.
+        """
+        low, high = self._range(start, end)
+        return (numpy.arange(low, high, dtype=numpy.int64)
+                * int(self.bucket)).astype('datetime64[s]')
+
+    def matrix(self, start, end, now=None):
+        """
+        Seconds present per key (rows, in the order of self.keys) and
+        bucket of the range, open intervals counted up to now.
+        """
+        low, high = self._range(start, end)
+        result = numpy.zeros((len(self.keys), high - low))
+        if self.first is not None:
+            data_low = max(low, self.first)
+            data_high = min(high, self.first + self.data.shape[1])
+            if data_low < data_high:
+                result[:, data_low - low:data_high - low] = self.data[
+                    :len(self.keys),
+                    data_low - self.first:data_high - self.first]
+        if self.open:
+            if now is None:
+                now = datetime.now(timezone.utc)
+            now = to_seconds(now)
+            opened = [(row, begin) for row, begin in self.open.values()
+                      if begin < now]
+            if opened:
+                rows, starts = zip(*opened)
+                rows, buckets, seconds = self._spread(
+                    numpy.array(rows, dtype=numpy.int64),
+                    numpy.array(starts), numpy.full(len(rows), now))
+                inside = (buckets >= low) & (buckets < high)
+                numpy.add.at(result, (rows[inside], buckets[inside] - low),
+                             seconds[inside])
+        return result
+
+    def _select(self, matrix, keys):
+        if keys is None:
+            return matrix
+        return matrix[[self.rows[key] for key in keys if key in self.rows]]
+
+    def seconds(self, start, end, keys=None, now=None):
+        """
+        Seconds present per bucket, over keys (all by default).
+        """
+        return self._select(self.matrix(start, end, now), keys).sum(axis=0)
+
+    def occupancy(self, start, end, keys=None, now=None):
+        """
+        Average number present per bucket, e.g. desks in use.
+        """
+        return self.seconds(start, end, keys, now) / self.bucket
+
+    def utilisation(self, start, end, keys=None, now=None):
+        """
+        Share of each bucket the keys were in use, e.g. rooms booked,
+        averaged over keys; 1.0 means all of them all the time.
+        """
+        selected = self._select(self.matrix(start, end, now), keys)
+        if not len(selected):
+            return numpy.zeros(selected.shape[1])
+        return selected.sum(axis=0) / (self.bucket * len(selected))
+
+    def totals(self, start, end, now=None):
+        """
+        Dict of key -> seconds present over the whole range.
+        """
+        return dict(zip(self.keys, self.matrix(start, end, now).sum(
+            axis=1).tolist()))
+
+
+def occupancy_rollup(bucket=BUCKET):
+    """
+    Rollup of check-ins per business.
+    """
+    return Rollup('BusinessId', bucket=bucket)
+
+
+def utilisation_rollup(bucket=BUCKET):
+    """
+    Rollup of bookings per resource.
+    """
+    return Rollup('ResourceId', bucket=bucket)
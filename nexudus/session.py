@@ -0,0 +1,224 @@
+"""
+HTTP session carrying the client-side request policies: rate limiting,
+retries, caching, conditional GETs, request coalescing and metrics.
+
+Kept apart from the resource classes so that importing nexudus does not
+import requests; it is loaded when the first session is built.
+"""
+
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from .cache import ResponseCache
+from .nexudus import POOL_CONNECTIONS, POOL_MAXSIZE
+from .ratelimit import (RATE_LIMIT, RateLimiter, shared_rate_limiter,
+                        url_host)
+from .retry import RetryPolicy
+from .singleflight import share_response
+
+
+class NexudusSession(requests.Session):
+    """
+    Session applying the client-side request policies shared by every
+    resource that uses it.
+    Requests accept an extra retry keyword: True opts a POST into the
+    retry policy, False disables retries for that call.
+    Write listeners are called as listener(method, url, data, response)
+    after every successful write sent through the session.
+    With a SingleFlight, concurrent GETs for the same URL and params share
+    one request; writes are never coalesced. With a Metrics object every
+    attempt is timed and counted.
+    namespace (the username, set by build_session) is part of every
+    cache, validator and single-flight key, so policy objects shared by
+    sessions of different accounts never hand one account's data to
+    another.
+    """
+
+    def __init__(self,
+                 rate_limiter=None,
+                 retry_policy=None,
+                 cache=None,
+                 validators=None,
+                 single_flight=None,
+                 metrics=None,
+                 namespace=None):
+        super(NexudusSession, self).__init__()
+        self.namespace = namespace
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.cache = cache
+        self.validators = validators
+        self.single_flight = single_flight
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track(self)
+        self.write_listeners = []
+
+    def add_write_listener(self, listener):
+        self.write_listeners.append(listener)
+
+    def remove_write_listener(self, listener):
+        self.write_listeners.remove(listener)
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() != 'GET' or kwargs.get('stream'):
+            response = self._request(method, url, *args, **kwargs)
+            if response.ok and method.upper() != 'GET':
+                if self.cache is not None:
+                    self.cache.invalidate(url, kwargs.get('data'),
+                                          namespace=self.namespace)
+                for listener in list(self.write_listeners):
+                    listener(method.upper(), url, kwargs.get('data'),
+                             response)
+            return response
+        params = kwargs.get('params')
+        if self.cache is not None:
+            response = self.cache.get(url, params, self.namespace)
+            if response is not None:
+                return response
+        if self.single_flight is None or 'headers' in kwargs:
+            return self._get(method, url, *args, **kwargs)
+        key = (method.upper(),
+               ResponseCache.key(url, params, self.namespace))
+        response, shared = self.single_flight.do(
+            key, lambda: self._get(method, url, *args, **kwargs))
+        return share_response(response) if shared else response
+
+    def _get(self, method, url, *args, **kwargs):
+        params = kwargs.get('params')
+        if self.validators is not None:
+            kwargs['headers'] = self.validators.conditional_headers(
+                url, params, kwargs.get('headers'), self.namespace)
+            response = self.validators.resolve(
+                url, params, self._request(method, url, *args, **kwargs),
+                self.namespace)
+        else:
+            response = self._request(method, url, *args, **kwargs)
+        if self.cache is not None:
+            self.cache.store(url, params, response, self.namespace)
+        return response
+
+    def _request(self, method, url, *args, **kwargs):
+        retry = kwargs.pop('retry', None)
+        policy = self.retry_policy
+        if policy is None or not policy.allows(method, retry):
+            return self._send(method, url, *args, **kwargs)
+        timeout = kwargs.pop('timeout', None)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            if timeout is None:
+                # Bound each attempt by what is left of the deadline.
+                kwargs['timeout'] = max(policy.remaining(started), 0.001)
+            else:
+                kwargs['timeout'] = timeout
+            if attempt > 1 and self.metrics is not None:
+                self.metrics.record_retry(method.upper(), url)
+            try:
+                response = self._send(method, url, *args, attempt=attempt,
+                                      **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = policy.next_delay(attempt, started)
+                if delay is None:
+                    raise
+            else:
+                delay = policy.next_delay(attempt, started,
+                                          response.status_code,
+                                          response.headers)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+
+    def _send(self, method, url, *args, **kwargs):
+        attempt = kwargs.pop('attempt', 1)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.metrics is None:
+            response = super(NexudusSession, self).request(
+                method, url, *args, **kwargs)
+        else:
+            response = self._measured_send(method, url, attempt, *args,
+                                           **kwargs)
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(response.status_code, response.headers)
+        return response
+
+    def _measured_send(self, method, url, attempt, *args, **kwargs):
+        method = method.upper()
+        started = self.metrics.start(method, url, kwargs)
+        try:
+            response = super(NexudusSession, self).request(
+                method, url, *args, **kwargs)
+        except Exception as error:
+            self.metrics.record(method, url, started, attempt=attempt,
+                                error=type(error).__name__)
+            raise
+        if kwargs.get('stream'):
+            self.metrics.record(method, url, started,
+                                status=response.status_code,
+                                first_byte=response.elapsed.total_seconds(),
+                                attempt=attempt)
+        else:
+            self.metrics.record_response(method, url, started, response,
+                                         attempt=attempt)
+        return response
+
+
+def build_session(username,
+                  password,
+                  pool_connections=POOL_CONNECTIONS,
+                  pool_maxsize=POOL_MAXSIZE,
+                  pool_block=False,
+                  keep_alive=True,
+                  rate_limit=RATE_LIMIT,
+                  retry_policy=None,
+                  cache=None,
+                  validators=None,
+                  single_flight=None,
+                  metrics=None,
+                  domain_url=None):
+    """
+    Build an authenticated session backed by a single tuned connection pool.
+    pool_maxsize is the number of connections kept open per host, and
+    pool_block makes callers wait for a free connection instead of opening
+    throwaway ones when the pool is exhausted.
+    rate_limit is the starting requests/second of the adaptive limiter
+    shared by all sessions of these credentials against the host of
+    domain_url (the Nexudus API by default), a RateLimiter to use
+    instead, or None to disable rate limiting.
+    retry_policy defaults to RetryPolicy(), which retries idempotent calls;
+    None means that default, RetryPolicy(max_attempts=1) disables retries.
+    cache is an optional ResponseCache for GET responses and validators
+    an optional ValidatorStore turning repeated GETs into conditional ones.
+    single_flight is an optional SingleFlight coalescing concurrent
+    identical GETs into one request, and metrics an optional Metrics
+    collecting per-endpoint latency, bytes, retries and pool reuse.
+    """
+    rate_limiter = None
+    if isinstance(rate_limit, RateLimiter):
+        rate_limiter = rate_limit
+    elif rate_limit is not None:
+        rate_limiter = shared_rate_limiter(username, rate=rate_limit,
+                                           host=url_host(domain_url))
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    session = NexudusSession(rate_limiter=rate_limiter,
+                             retry_policy=retry_policy,
+                             cache=cache,
+                             validators=validators,
+                             single_flight=single_flight,
+                             metrics=metrics,
+                             namespace=username)
+    session.auth = HTTPBasicAuth(username, password)
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+    return session
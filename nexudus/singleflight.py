@@ -0,0 +1,71 @@
+"""
+Request coalescing: concurrent identical reads share one in-flight call.
+"""
+
+import threading
+
+from .cache import freeze_response, thaw_response
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs at most one call per key at a time. Callers arriving while a call
+    for their key is in flight wait for it and get its result (or its
+    exception) instead of starting their own. Nothing is kept once the
+    call finishes, so this is not a cache: the next caller after that
+    starts a fresh call. shared counts the callers that were spared a
+    call.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key, function):
+        """
+        Return (result, shared) where shared tells whether the result came
+        from another caller's call.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def share_response(response):
+    """
+    Independent copy of a response for a coalesced caller.
+    """
+    copy = thaw_response(freeze_response(response))
+    copy.from_cache = getattr(response, 'from_cache', False)
+    if hasattr(response, 'not_modified'):
+        copy.not_modified = response.not_modified
+    return copy
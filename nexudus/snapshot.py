@@ -0,0 +1,307 @@
+"""
+Sharded, resumable snapshot of a whole tenant.
+
+Every entity is split into shards, ranges of ids read with from_/to_
+<Entity>_Id filters, and the shards run across a process pool. All
+processes draw from one SharedRateLimiter, so throughput grows with the
+number of workers until the tenant's rate limit is reached, and a 429
+slows every worker down at once. Each shard is written as gzipped
+newline-delimited JSON, and manifest.json records the shard plan and
+the shards finished so far; running the snapshot again into the same
+directory only reads the shards still missing.
+
+    NEXUDUS_PASSWORD=... python -m nexudus.snapshot --out backup username
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .endpoints import ENDPOINTS
+from .nexudus import PAGE_SIZE, Client, filter_prefix
+from .ratelimit import RATE_LIMIT, SharedRateLimiter
+
+WORKERS = 4
+SHARD_SIZE = 20000
+COMPRESS_LEVEL = 6
+MANIFEST = 'manifest.json'
+VERSION = 1
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+ENTITIES = tuple(endpoint.entity for endpoint in ENDPOINTS)
+PLURALS = dict((endpoint.entity, endpoint.plural) for endpoint in ENDPOINTS)
+
+
+def utc_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def write_json(path, data):
+    """
+    Replace the JSON file at path atomically.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         prefix='.manifest-')
+    try:
+        with os.fdopen(handle, 'w') as json_file:
+            json.dump(data, json_file, indent=1, sort_keys=True)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def plan_shards(resource, shard_size=SHARD_SIZE):
+    """
+    Shards of resource's entity, as dicts with an index and an id range.
+    The highest id and the record count split the ids into ranges of
+    about shard_size records each; the last range is open-ended, so
+    records created while the snapshot runs still land in a shard.
+    """
+    body = resource.fetch_page({'orderBy': 'Id', 'dir': 'Descending',
+                                'size': 1}, 1)
+    records = body.get('Records') or []
+    if not records:
+        return [{'index': 0, 'from_id': None, 'to_id': None}]
+    max_id = int(records[0]['Id'])
+    total = body.get('TotalItems') or max_id
+    count = min(max(1, int(math.ceil(total / float(shard_size)))), max_id)
+    width = int(math.ceil(max_id / float(count)))
+    shards = []
+    for index in range(count):
+        shards.append({'index': index,
+                       'from_id': index * width + 1 if index else None,
+                       'to_id': (index + 1) * width
+                       if index < count - 1 else None})
+    return shards
+
+
+def shard_path(entity, shard):
+    return os.path.join(entity, '%s-%05d.ndjson.gz' % (entity,
+                                                       shard['index']))
+
+
+_client = None
+
+
+def _init_worker(username, password, rate_limiter, client_options):
+    global _client
+    _client = Client(username, password, rate_limit=rate_limiter,
+                     **client_options)
+
+
+def _read_shard(directory, entity, shard, page_size):
+    """
+    Write one shard's records; runs in a pool process.
+    """
+    started = time.monotonic()
+    resource = getattr(_client, PLURALS[entity])
+    list_method = getattr(resource, resource.LIST_METHOD)
+    field = '%s_Id' % filter_prefix(list_method)
+    filters = {}
+    if shard['from_id'] is not None:
+        filters['from_' + field] = shard['from_id']
+    if shard['to_id'] is not None:
+        filters['to_' + field] = shard['to_id']
+    path = os.path.join(directory, shard['path'])
+    temp_path = path + '.part'
+    count = 0
+    with gzip.open(temp_path, 'wt', encoding='utf-8',
+                   compresslevel=COMPRESS_LEVEL) as shard_file:
+        for record in resource.iter_records(list_method, filters,
+                                            page_size=page_size):
+            shard_file.write(json.dumps(record, separators=(',', ':')))
+            shard_file.write('\n')
+            count += 1
+    os.replace(temp_path, path)
+    return {'records': count,
+            'bytes': os.path.getsize(path),
+            'seconds': round(time.monotonic() - started, 3)}
+
+
+class Snapshot(object):
+    """
+    Snapshot of the given entities (all by default, e.g. ['booking',
+    'coworker']) into directory.
+    workers processes read shards of about shard_size records each,
+    page_size records per call, sharing a rate budget that starts at
+    rate_limit requests/second and adapts like RateLimiter; None
+    disables it. client_options go to each process's Client and must be
+    picklable.
+    """
+
+    def __init__(self,
+                 username,
+                 password,
+                 directory,
+                 entities=None,
+                 workers=WORKERS,
+                 shard_size=SHARD_SIZE,
+                 page_size=PAGE_SIZE,
+                 rate_limit=RATE_LIMIT,
+                 **client_options):
+        unknown = set(entities or ()) - set(ENTITIES)
+        if unknown:
+            raise ValueError("Unknown entities: %s" % ', '.join(
+                sorted(unknown)))
+        self.username = username
+        self.password = password
+        self.directory = directory
+        self.entities = list(entities or ENTITIES)
+        self.workers = workers
+        self.shard_size = shard_size
+        self.page_size = page_size
+        self.client_options = client_options
+        self.rate_limiter = None
+        if rate_limit is not None:
+            self.rate_limiter = SharedRateLimiter(rate=rate_limit)
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.manifest = None
+
+    def plan(self):
+        """
+        Load the manifest of an earlier run, planning the entities it
+        does not cover yet, and save it. Shard boundaries never change
+        once planned, so finished shards stay valid.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            self.manifest = {'version': VERSION, 'started': utc_now(),
+                             'finished': None, 'entities': {}}
+        planned = self.manifest['entities']
+        missing = [entity for entity in self.entities
+                   if entity not in planned]
+        if missing:
+            client = Client(self.username, self.password,
+                            rate_limit=self.rate_limiter,
+                            **self.client_options)
+            try:
+                for entity in missing:
+                    shards = plan_shards(getattr(client, PLURALS[entity]),
+                                         self.shard_size)
+                    for shard in shards:
+                        shard.update(path=shard_path(entity, shard),
+                                     status=PENDING)
+                    planned[entity] = {'shards': shards}
+            finally:
+                client.close()
+        for entity in self.entities:
+            os.makedirs(os.path.join(self.directory, entity), exist_ok=True)
+        self.save()
+        return self.manifest
+
+    def pending(self):
+        """
+        (entity, shard) pairs not written yet.
+        """
+        return [(entity, shard) for entity in self.entities
+                for shard in self.manifest['entities'][entity]['shards']
+                if shard['status'] != DONE]
+
+    def run(self, progress=None):
+        """
+        Read every pending shard and return the manifest. A failed shard
+        is recorded with its error and left for the next run;
+        manifest['finished'] is only set once all shards are done.
+        progress(entity, shard) is called as each shard completes.
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        self.plan()
+        pending = self.pending()
+        if pending:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.username, self.password, self.rate_limiter,
+                          self.client_options))
+            try:
+                futures = dict(
+                    (executor.submit(_read_shard, self.directory, entity,
+                                     shard, self.page_size),
+                     (entity, shard))
+                    for entity, shard in pending)
+                for future in as_completed(futures):
+                    entity, shard = futures[future]
+                    try:
+                        shard.update(future.result(), status=DONE,
+                                     error=None)
+                    except Exception as error:
+                        shard.update(status=FAILED, error=repr(error))
+                    self.save()
+                    if progress is not None:
+                        progress(entity, shard)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        if not self.pending():
+            self.manifest['finished'] = self.manifest['finished'] or (
+                utc_now())
+            self.save()
+        return self.manifest
+
+    def save(self):
+        write_json(self.manifest_path, self.manifest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Snapshot a Nexudus tenant into gzipped NDJSON shards.')
+    parser.add_argument('username')
+    parser.add_argument('--password',
+                        default=os.environ.get('NEXUDUS_PASSWORD'),
+                        help='defaults to $NEXUDUS_PASSWORD')
+    parser.add_argument('--out', required=True,
+                        help='snapshot directory; rerun to resume')
+    parser.add_argument('--entity', action='append', choices=ENTITIES,
+                        help='entity to include, repeatable; default all')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT,
+                        help='starting requests/second for all workers')
+    parser.add_argument('--domain-url', default=None)
+    args = parser.parse_args(argv)
+    if not args.password:
+        parser.error('--password or NEXUDUS_PASSWORD is required')
+
+    def progress(entity, shard):
+        if shard['status'] == DONE:
+            print('%s: %s, %d records in %.1fs' % (
+                entity, shard['path'], shard['records'], shard['seconds']))
+        else:
+            print('%s: %s failed: %s' % (entity, shard['path'],
+                                         shard['error']))
+
+    snapshot = Snapshot(args.username, args.password, args.out,
+                        entities=args.entity,
+                        workers=args.workers,
+                        shard_size=args.shard_size,
+                        page_size=args.page_size,
+                        rate_limit=args.rate,
+                        domain_url=args.domain_url)
+    started = time.monotonic()
+    manifest = snapshot.run(progress=progress)
+    for entity in snapshot.entities:
+        shards = manifest['entities'][entity]['shards']
+        print('%s: %d records in %d shards' % (
+            entity, sum(shard.get('records') or 0 for shard in shards),
+            len(shards)))
+    print('%.1fs' % (time.monotonic() - started))
+    return 0 if manifest['finished'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Incremental delta sync of list endpoints with on-disk checkpoints.
+"""
+
+import json
+import os
+import tempfile
+
+from .dates import parse_datetime
+from .nexudus import PAGE_SIZE, filter_prefix, has_next_page, parse_filters
+
+WATERMARK_FIELD = 'UpdatedOn'
+
+
+class Checkpoint(object):
+    """
+    High-water marks per entity, persisted as a JSON file.
+    Each entry keeps the last watermark value and the ids already synced
+    at exactly that value, so records sharing a timestamp are neither lost
+    nor fetched twice. The file is replaced atomically on save; with path
+    None the checkpoint only lives in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.entries = json.load(checkpoint_file)
+
+    def get(self, name):
+        entry = self.entries.get(name) or {}
+        return entry.get('watermark'), set(entry.get('ids') or ())
+
+    def update(self, name, watermark, ids):
+        self.entries[name] = {'watermark': watermark, 'ids': sorted(ids)}
+
+    def save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(dir=directory,
+                                             prefix='.checkpoint-')
+        try:
+            with os.fdopen(handle, 'w') as checkpoint_file:
+                json.dump(self.entries, checkpoint_file)
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+
+def is_later(value, watermark):
+    if watermark is None:
+        return True
+    parsed = parse_datetime(value)
+    parsed_watermark = parse_datetime(watermark)
+    if parsed is None or parsed_watermark is None:
+        return value > watermark
+    return parsed > parsed_watermark
+
+
+class DeltaSync(object):
+    """
+    Fetches only the records created or changed since the previous run.
+    Each entity is read in ascending order of its UpdatedOn field,
+    filtered with from_<Entity>_UpdatedOn at the stored watermark. The
+    checkpoint advances only for records the consumer has taken, and is
+    saved every save_every records and when the iteration ends, so a run
+    killed midway resumes where it stopped. Deleted records never show up
+    in a delta; reconcile those separately.
+    """
+
+    def __init__(self,
+                 checkpoint,
+                 page_size=PAGE_SIZE,
+                 save_every=PAGE_SIZE,
+                 field=WATERMARK_FIELD):
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        self.page_size = page_size
+        self.save_every = save_every
+        self.field = field
+
+    def changes(self, resource, name=None, **filters):
+        """
+        Yield the new or changed records of resource, oldest first.
+        Extra filters (e.g. Booking_Resource) narrow the synced set; name
+        keys the checkpoint entry and defaults to resource.ENTITY.
+        """
+        name = name or resource.ENTITY
+        list_method = getattr(resource, resource.LIST_METHOD)
+        watermark_filter = 'from_%s_%s' % (filter_prefix(list_method),
+                                           self.field)
+        params = parse_filters(list_method, filters)
+        params.update(orderBy=self.field, dir='Ascending',
+                      size=self.page_size)
+        watermark, seen = self.checkpoint.get(name)
+        unsaved = 0
+        page = 1
+        try:
+            while True:
+                if watermark is not None:
+                    params[watermark_filter] = watermark
+                body = resource.fetch_page(params, page)
+                records = body.get('Records') or []
+                advanced = False
+                for record in records:
+                    value = record.get(self.field)
+                    if value == watermark and record.get('Id') in seen:
+                        continue
+                    yield record
+                    # The consumer asked for more, so record is done.
+                    if (value is not None and value != watermark
+                            and is_later(value, watermark)):
+                        watermark = value
+                        seen = set()
+                        advanced = True
+                    seen.add(record.get('Id'))
+                    unsaved += 1
+                    if unsaved >= self.save_every:
+                        self._save(name, watermark, seen)
+                        unsaved = 0
+                if not records or not has_next_page(body, page):
+                    break
+                # Restart from the first page of the moved window.
+                page = 1 if advanced else page + 1
+        finally:
+            if unsaved:
+                self._save(name, watermark, seen)
+
+    def _save(self, name, watermark, seen):
+        self.checkpoint.update(name, watermark, seen)
+        self.checkpoint.save()
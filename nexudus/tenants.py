@@ -0,0 +1,303 @@
+"""
+Serving many Nexudus accounts from one process.
+
+TenantManager keeps one Client, and so one connection pool and one rate
+limiter, per credential pair. Clients are created on first use and the
+least recently used ones are closed beyond max_clients. Work submitted
+through the manager runs on a FairScheduler, which shares a fixed set of
+worker threads between tenants round-robin, interactive calls first, so
+one tenant's large export cannot hold up everybody else's short calls.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from .nexudus import Client
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITIES = (INTERACTIVE, BULK)
+
+WORKERS = 8
+MAX_CLIENTS = 64
+
+# Client options holding per-account data, built anew for every tenant.
+TENANT_OPTIONS = ('cache', 'validators', 'single_flight')
+
+
+class _Task(object):
+    __slots__ = ('future', 'function', 'args', 'kwargs')
+
+    def __init__(self, future, function, args, kwargs):
+        self.future = future
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+
+class FairScheduler(object):
+    """
+    Worker pool serving per-tenant queues.
+    Each tenant has one FIFO queue per priority. A free worker takes the
+    next task of the first tenant in round-robin order with INTERACTIVE
+    work, and only then BULK work; the tenant served moves to the back of
+    the line. At most tenant_limit tasks of one tenant run at once
+    (default half the workers), so a tenant with a deep backlog always
+    leaves workers for the others. Tasks should be reasonably short, e.g.
+    one page or one batch rather than a whole export.
+    """
+
+    def __init__(self, workers=WORKERS, tenant_limit=None):
+        self.workers = workers
+        self.tenant_limit = tenant_limit or max(1, workers // 2)
+        self.condition = threading.Condition()
+        # tenant -> deque of tasks, in round-robin order, per priority.
+        self.queues = tuple(OrderedDict() for _ in PRIORITIES)
+        self.running = {}
+        self.threads = []
+        self.closed = False
+
+    def submit(self, tenant, function, *args, priority=INTERACTIVE,
+               **kwargs):
+        """
+        Queue function(*args, **kwargs) for tenant and return a Future.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError("Unknown priority %r." % (priority,))
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Scheduler is shut down.")
+            queues = self.queues[priority]
+            queue = queues.get(tenant)
+            if queue is None:
+                queue = queues[tenant] = deque()
+            queue.append(_Task(future, function, args, kwargs))
+            if len(self.threads) < self.workers:
+                self._start_worker()
+            self.condition.notify()
+        return future
+
+    def pending(self, tenant=None):
+        """
+        Number of queued tasks, of one tenant or overall.
+        """
+        with self.condition:
+            if tenant is not None:
+                return sum(len(queues.get(tenant, ()))
+                           for queues in self.queues)
+            return sum(len(queue) for queues in self.queues
+                       for queue in queues.values())
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop accepting tasks. Queued tasks still run unless
+        cancel_pending, in which case their futures are cancelled.
+        """
+        with self.condition:
+            self.closed = True
+            if cancel_pending:
+                for queues in self.queues:
+                    for queue in queues.values():
+                        for task in queue:
+                            task.future.cancel()
+                    queues.clear()
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work,
+                                  name='nexudus-tenant-%d' % len(
+                                      self.threads))
+        thread.daemon = True
+        self.threads.append(thread)
+        thread.start()
+
+    def _next(self):
+        """
+        (tenant, task) to run next, or None when nothing may run now.
+        """
+        for queues in self.queues:
+            for tenant in list(queues):
+                if self.running.get(tenant, 0) >= self.tenant_limit:
+                    continue
+                queue = queues[tenant]
+                task = queue.popleft()
+                if queue:
+                    queues.move_to_end(tenant)
+                else:
+                    del queues[tenant]
+                return tenant, task
+        return None
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while True:
+                    item = self._next()
+                    if item is not None:
+                        break
+                    if self.closed and not any(self.queues):
+                        return
+                    self.condition.wait()
+                tenant, task = item
+                self.running[tenant] = self.running.get(tenant, 0) + 1
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        result = task.function(*task.args, **task.kwargs)
+                    except BaseException as error:
+                        task.future.set_exception(error)
+                    else:
+                        task.future.set_result(result)
+            finally:
+                with self.condition:
+                    self.running[tenant] -= 1
+                    if not self.running[tenant]:
+                        del self.running[tenant]
+                    # A slot of this tenant freed up.
+                    self.condition.notify()
+
+
+class TenantManager(object):
+    """
+    One pooled Client per credential pair, created lazily.
+    client_options are passed to every Client (e.g. pool_maxsize,
+    rate_limit, metrics). cache, validators and single_flight hold
+    account data and are given as factories instead, e.g.
+    cache=ResponseCache or cache=lambda: ResponseCache(maxsize=256), so
+    each tenant gets its own and no response crosses tenants. Rate
+    limiters are kept per username, so each tenant is paced on its own,
+    and a tenant whose client was evicted resumes at the rate it had
+    learned.
+    Clients with queued or running tasks are never evicted, so the
+    number of open clients can briefly exceed max_clients.
+    """
+
+    def __init__(self,
+                 max_clients=MAX_CLIENTS,
+                 workers=WORKERS,
+                 tenant_limit=None,
+                 client_factory=Client,
+                 **client_options):
+        for name in TENANT_OPTIONS:
+            option = client_options.get(name)
+            if option is not None and not callable(option):
+                raise TypeError(
+                    "%s must be a factory such as %s, so that tenants do "
+                    "not share it." % (name, type(option).__name__))
+        self.max_clients = max_clients
+        self.client_factory = client_factory
+        self.client_options = client_options
+        self.scheduler = FairScheduler(workers=workers,
+                                       tenant_limit=tenant_limit)
+        self.lock = threading.Lock()
+        self.clients = OrderedDict()
+        self.active = {}
+
+    def __len__(self):
+        return len(self.clients)
+
+    def __contains__(self, credentials):
+        return tuple(credentials) in self.clients
+
+    def client(self, username, password):
+        """
+        The Client of these credentials, creating it on first use.
+        """
+        key = (username, password)
+        evicted = []
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                options = dict(self.client_options)
+                for name in TENANT_OPTIONS:
+                    if options.get(name) is not None:
+                        options[name] = options[name]()
+                client = self.clients[key] = self.client_factory(
+                    username, password, **options)
+                evicted = self._evict(keep=key)
+            else:
+                self.clients.move_to_end(key)
+        for old in evicted:
+            old.close()
+        return client
+
+    def submit(self, username, password, function, *args,
+               priority=INTERACTIVE, **kwargs):
+        """
+        Run function(client, *args, **kwargs) on the scheduler as the
+        tenant username and return a Future. Use priority=BULK for
+        exports and other long-running work.
+        """
+        key = (username, password)
+        with self.lock:
+            self.active[key] = self.active.get(key, 0) + 1
+        try:
+            client = self.client(username, password)
+            future = self.scheduler.submit(username, function, client,
+                                           *args, priority=priority,
+                                           **kwargs)
+        except BaseException:
+            self._release(key)
+            raise
+        future.add_done_callback(lambda _: self._release(key))
+        return future
+
+    def evict(self, username, password):
+        """
+        Close and forget the client of these credentials, if idle.
+        Returns whether it was evicted.
+        """
+        key = (username, password)
+        with self.lock:
+            if self.active.get(key) or key not in self.clients:
+                return False
+            client = self.clients.pop(key)
+        client.close()
+        return True
+
+    def close(self, wait=True):
+        self.scheduler.shutdown(wait=wait)
+        with self.lock:
+            clients = list(self.clients.values())
+            self.clients.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _release(self, key):
+        evicted = []
+        with self.lock:
+            self.active[key] -= 1
+            if not self.active[key]:
+                del self.active[key]
+                evicted = self._evict()
+        for client in evicted:
+            client.close()
+
+    def _evict(self, keep=None):
+        """
+        Pop least recently used idle clients beyond max_clients, sparing
+        keep; the caller closes them outside the lock.
+        """
+        evicted = []
+        excess = len(self.clients) - self.max_clients
+        if excess <= 0:
+            return evicted
+        for key in list(self.clients):
+            if excess <= 0:
+                break
+            if key == keep or self.active.get(key):
+                continue
+            evicted.append(self.clients.pop(key))
+            excess -= 1
+        return evicted
@@ -0,0 +1,307 @@
+"""
+Receiver for Nexudus webhooks, so local state follows changes as they
+are pushed instead of by polling.
+
+A WebhookReceiver verifies a notification, parses it into one
+ChangeEvent per changed record and calls the handlers registered for
+that entity and kind. ResponseCache.on_event and Replica.on_event are
+ready-made handlers; with them in place polling is only needed for
+occasional reconciliation. The receiver is a WSGI application, so it can
+be mounted in an existing web app or served on its own with
+WebhookServer. send_event posts notifications the same way, as a
+stand-in for Nexudus in tests and with the mock server.
+"""
+
+import hashlib
+import hmac
+import json
+import re
+import threading
+from collections import namedtuple
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from .endpoints import ENDPOINTS
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+TOKEN_PARAM = 'token'
+ACTION_PARAM = 'action'
+MAX_BODY = 10 * 1024 * 1024
+
+ACTION = re.compile(
+    r'^(?P<name>[A-Za-z]+?)(?P<kind>Create|Update|Delete)d?$', re.IGNORECASE)
+RECORD_KEYS = ('Records', 'Data', 'Value', 'Entities')
+
+# Action name prefixes, lowercased, to entity: both the class name and
+# the filter prefix, e.g. 'checkin' and 'coworkerpriceplanhistory'.
+ENTITIES = {}
+for _endpoint in ENDPOINTS:
+    ENTITIES[_endpoint.name.lower()] = _endpoint.entity
+    ENTITIES[_endpoint.prefix.lower()] = _endpoint.entity
+del _endpoint
+
+ChangeEvent = namedtuple('ChangeEvent', [
+    'entity', 'kind', 'entity_id', 'record', 'action'])
+
+
+class WebhookError(Exception):
+    def __init__(self, status, message):
+        super(WebhookError, self).__init__(message)
+        self.status = status
+
+
+def parse_action(action):
+    """
+    (entity, kind) of an action name such as 'BookingUpdate', kind being
+    'create', 'update' or 'delete'. entity is None for entities outside
+    the endpoint registry.
+    """
+    match = ACTION.match(action or '')
+    if match is None:
+        raise WebhookError(400, "Unknown webhook action %r." % (action,))
+    return (ENTITIES.get(match.group('name').lower()),
+            match.group('kind').lower())
+
+
+def parse_events(body, action=None):
+    """
+    ChangeEvents of a notification body: a JSON record, a list of
+    records, or an object with an Action and the records under Records,
+    Data, Value or Entities. A bare id stands for a deleted record.
+    """
+    try:
+        data = json.loads(body.decode('utf-8') if isinstance(body, bytes)
+                          else body)
+    except ValueError:
+        raise WebhookError(400, "Webhook body is not JSON.")
+    if isinstance(data, dict):
+        action = data.get('Action') or action
+        for key in RECORD_KEYS:
+            if key in data:
+                data = data[key]
+                break
+    if not isinstance(data, list):
+        data = [data]
+    entity, kind = parse_action(action)
+    events = []
+    for record in data:
+        if not isinstance(record, dict):
+            record = {'Id': record}
+        events.append(ChangeEvent(entity, kind, record.get('Id'), record,
+                                  action))
+    return events
+
+
+def sign(body, secret):
+    """
+    Hex HMAC-SHA256 of body under secret.
+    """
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+
+class WebhookReceiver(object):
+    """
+    Verifies, parses and dispatches webhook notifications.
+    With token set, requests must carry it as the token query parameter
+    of the webhook URL; with secret set, signature_header must hold the
+    hex HMAC-SHA256 of the body (optionally prefixed 'sha256='). One of
+    the two is required, since events change caches and replicas; pass
+    allow_unauthenticated=True to accept anything reaching the receiver,
+    e.g. behind a proxy that authenticates.
+    The action comes from the body, the action query parameter or the
+    last segment of the URL path, whichever is present, so one receiver
+    can serve every webhook configured in Nexudus.
+    Handlers are called as handler(event) in registration order; an
+    exception makes the request fail with a 500 so the sender retries.
+    """
+
+    def __init__(self,
+                 token=None,
+                 secret=None,
+                 signature_header=SIGNATURE_HEADER,
+                 max_body=MAX_BODY,
+                 allow_unauthenticated=False):
+        if token is None and secret is None and not allow_unauthenticated:
+            raise ValueError("A webhook token or secret is required, or "
+                             "allow_unauthenticated=True.")
+        self.token = token
+        self.secret = secret
+        self.signature_header = signature_header
+        self.max_body = max_body
+        self.handlers = []
+        self.received = 0
+
+    def add_handler(self, handler, entity=None, kind=None):
+        """
+        Call handler for the events of entity (e.g. 'booking') and kind
+        ('create', 'update' or 'delete'); None matches any.
+        """
+        self.handlers.append((handler, entity, kind))
+
+    def remove_handler(self, handler):
+        self.handlers = [entry for entry in self.handlers
+                         if entry[0] != handler]
+
+    def on(self, entity=None, kind=None):
+        """
+        Decorator form of add_handler.
+        """
+        def register(handler):
+            self.add_handler(handler, entity, kind)
+            return handler
+        return register
+
+    def verify(self, body, query=None, headers=None):
+        query = query or {}
+        headers = dict((name.lower(), value)
+                       for name, value in (headers or {}).items())
+        if self.token is not None:
+            token = query.get(TOKEN_PARAM) or ''
+            if not hmac.compare_digest(token.encode('utf-8'),
+                                       self.token.encode('utf-8')):
+                raise WebhookError(401, "Bad webhook token.")
+        if self.secret is not None:
+            signature = headers.get(self.signature_header.lower()) or ''
+            if signature.startswith('sha256='):
+                signature = signature[7:]
+            if not hmac.compare_digest(signature.encode('utf-8'),
+                                       sign(body, self.secret).encode(
+                                           'utf-8')):
+                raise WebhookError(401, "Bad webhook signature.")
+
+    def handle(self, body, query=None, headers=None, action=None):
+        """
+        Verify and dispatch one notification; returns its events.
+        query maps parameter names to single values.
+        """
+        query = query or {}
+        self.verify(body, query, headers)
+        events = parse_events(body, query.get(ACTION_PARAM) or action)
+        self.dispatch(events)
+        self.received += len(events)
+        return events
+
+    def dispatch(self, events):
+        for event in events:
+            for handler, entity, kind in list(self.handlers):
+                if ((entity is None or entity == event.entity)
+                        and (kind is None or kind == event.kind)):
+                    handler(event)
+
+    def __call__(self, environ, start_response):
+        """
+        WSGI entry point.
+        """
+        status, body = 200, {}
+        try:
+            if environ.get('REQUEST_METHOD') != 'POST':
+                raise WebhookError(405, "Webhooks are POSTed.")
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length > self.max_body:
+                raise WebhookError(413, "Webhook body too large.")
+            payload = environ['wsgi.input'].read(length)
+            query = dict((name, values[-1]) for name, values in parse_qs(
+                environ.get('QUERY_STRING', '')).items())
+            headers = dict((name[5:].replace('_', '-'), value)
+                           for name, value in environ.items()
+                           if name.startswith('HTTP_'))
+            path = environ.get('PATH_INFO', '').rstrip('/')
+            events = self.handle(payload, query, headers,
+                                 action=path.rsplit('/', 1)[-1] or None)
+            body = {'Received': len(events)}
+        except WebhookError as error:
+            status, body = error.status, {'Message': str(error)}
+        except Exception as error:
+            status, body = 500, {'Message': repr(error)}
+        payload = json.dumps(body).encode('utf-8')
+        start_response('%d %s' % (status, HTTPStatus(status).phrase),
+                       [('Content-Type', 'application/json'),
+                        ('Content-Length', str(len(payload)))])
+        return [payload]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WebhookServer(object):
+    """
+    Standalone threaded HTTP server for a WebhookReceiver. url is the
+    address to configure as the webhook URL.
+    """
+
+    def __init__(self, receiver, host='127.0.0.1', port=0):
+        self.receiver = receiver
+        self.httpd = _ThreadingWSGIServer((host, port), _QuietHandler)
+        self.httpd.set_app(receiver)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name='nexudus-webhooks')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def send_event(url,
+               action,
+               records,
+               token=None,
+               secret=None,
+               signature_header=SIGNATURE_HEADER,
+               timeout=10):
+    """
+    POST a notification the way a WebhookReceiver expects it: records as
+    a JSON list, the action and token as query parameters and, with a
+    secret, the body's signature. With action None the receiver takes it
+    from the URL path. Returns the HTTP status.
+    """
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+    body = json.dumps(list(records)).encode('utf-8')
+    query = {}
+    if action is not None:
+        query[ACTION_PARAM] = action
+    if token is not None:
+        query[TOKEN_PARAM] = token
+    headers = {'Content-Type': 'application/json'}
+    if secret is not None:
+        headers[signature_header] = 'sha256=' + sign(body, secret)
+    request = Request('%s%s%s' % (url, '&' if '?' in url else '?',
+                                  urlencode(query)),
+                      data=body, headers=headers, method='POST')
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return response.status
+    except HTTPError as error:
+        return error.code
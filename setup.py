@@ -8,4 +8,9 @@ setup(name='nexudus',
       author_email='manishgupta.ait@gmail.com',
       license='GNU GPL',
       packages=['nexudus'],
-      zip_safe=False)
\ No newline at end of file
+      python_requires='>=3.9',
+      install_requires=['requests'],
+      extras_require={'async': ['aiohttp'],
+                      'export': ['numpy', 'pyarrow'],
+                      'fast': ['orjson']},
+      zip_safe=False)
@@ -0,0 +1,32 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from nexudus.aio import AsyncClient, AsyncResponse
+from nexudus.mockserver import MockServer
+
+
+def test_http_errors_can_be_printed():
+    async def fetch_missing(url):
+        async with AsyncClient('async', 'secret', rate_limit=None,
+                               domain_url=url) as client:
+            response = await client.bookings.get_booking_by_id(999)
+            response.raise_for_status()
+
+    with MockServer(sizes={'booking': 5}) as server:
+        with pytest.raises(aiohttp.ClientResponseError) as raised:
+            asyncio.run(fetch_missing(server.url))
+    error = raised.value
+    assert error.status == 404
+    assert error.request_info.method == 'GET'
+    assert '404' in str(error) and '/spaces/bookings/999' in str(error)
+    repr(error)
+
+
+def test_errors_of_detached_responses_can_be_printed():
+    response = AsyncResponse('http://localhost/api/x', 500, {}, b'',
+                             'Internal Server Error')
+    with pytest.raises(aiohttp.ClientResponseError) as raised:
+        response.raise_for_status()
+    assert 'http://localhost/api/x' in str(raised.value)
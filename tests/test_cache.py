@@ -0,0 +1,49 @@
+import pytest
+
+from nexudus.cache import MemoryBackend, ResponseCache
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+
+
+@pytest.fixture
+def client():
+    with MockServer(sizes={'booking': 10, 'coworker': 10,
+                           'resource': 10}) as server:
+        client = Client('cache', 'secret', rate_limit=None,
+                        cache=ResponseCache(), domain_url=server.url)
+        yield client
+        client.close()
+
+
+def cached(call):
+    call()
+    return bool(getattr(call(), 'from_cache', False))
+
+
+def test_only_reference_data_is_cached_by_default(client):
+    assert cached(lambda: client.coworkers.get_coworker_by_id(1))
+    assert cached(lambda: client.resources.get_resources())
+    coworkers = client.coworkers
+    assert not cached(lambda: getattr(coworkers, coworkers.LIST_METHOD)())
+    assert not cached(lambda: client.bookings.get_booking_by_id(1))
+    assert not cached(lambda: client.bookings.get_bookings())
+
+
+def test_list_ttls_opt_lists_in():
+    with MockServer(sizes={'booking': 10}) as server:
+        client = Client('cache', 'secret', rate_limit=None,
+                        cache=ResponseCache(list_ttls={'booking': 60}),
+                        domain_url=server.url)
+        assert cached(lambda: client.bookings.get_bookings())
+        client.close()
+
+
+def test_memory_backend_is_bounded_by_bytes():
+    backend = MemoryBackend(maxsize=100, max_bytes=10)
+    for key in 'abc':
+        backend.set(key, (200, {}, b'1234', '', None), 60)
+    assert backend.get('a') is None
+    assert backend.get('b') is not None and backend.get('c') is not None
+    assert backend.size == 8
+    backend.delete('b')
+    assert backend.size == 4
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from nexudus.decoding import Decoder, RecordStream
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+
+RECORDS = [
+    {'Id': 1, 'Notes': 'say "hi" to {everyone}', 'Tags': ['a]', '}b']},
+    {'Id': 2, 'Nested': {'Inner': {'Deep': [1, {'x': '}'}]}}},
+    {'Id': 3, 'Notes': 'back\\slash \\"} and café ☃'},
+    {'Id': 4, 'Empty': {}, 'Null': None},
+]
+PAGE = {'CurrentPage': 1, 'Records': RECORDS, 'TotalPages': 1,
+        'HasNextPage': False}
+
+
+def chunked(data, size):
+    return [data[index:index + size] for index in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+def test_records_split_across_chunks(size):
+    data = json.dumps(PAGE).encode('utf-8')
+    stream = RecordStream(chunked(data, size))
+    assert list(stream) == RECORDS
+    assert stream.meta == dict(PAGE, Records=[])
+
+
+def test_unescaped_unicode_split_inside_a_character():
+    data = json.dumps(PAGE, ensure_ascii=False).encode('utf-8')
+    assert list(RecordStream(chunked(data, 5))) == RECORDS
+
+
+def test_empty_records():
+    data = b'{"Records": [ ], "TotalItems": 0}'
+    stream = RecordStream(chunked(data, 4))
+    assert list(stream) == []
+    assert stream.meta == {'Records': [], 'TotalItems': 0}
+
+
+def test_payload_without_records():
+    stream = RecordStream([b'{"Message": ', b'"Not found"}'])
+    assert list(stream) == []
+    assert stream.meta == {'Message': 'Not found'}
+
+
+def test_truncated_records_raise():
+    with pytest.raises(ValueError):
+        list(RecordStream([b'{"Records": [{"Id": 1}, {"Id"']))
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_iteration_with_either_decoder(incremental):
+    with MockServer(sizes={'booking': 250}) as server:
+        client = Client('decode', 'secret', rate_limit=None,
+                        decoder=Decoder(backend='json',
+                                        incremental=incremental,
+                                        chunk_size=100),
+                        domain_url=server.url)
+        records = list(client.bookings.iter_bookings(page_size=60))
+        client.close()
+    assert [record['Id'] for record in records] == list(range(1, 251))
@@ -0,0 +1,30 @@
+import inspect
+import subprocess
+import sys
+
+from nexudus.nexudus import Booking, Coworker
+
+
+def test_generated_methods_have_signatures():
+    parameters = inspect.signature(Booking.get_bookings).parameters
+    assert list(parameters)[:3] == ['self', 'Booking_Id', 'Booking_Resource']
+    assert parameters['Booking_FromTime'].default is None
+
+    iterate = inspect.signature(Booking.iter_bookings).parameters
+    assert iterate['page_size'].default == 100
+    assert iterate['Booking_FromTime'].kind is inspect.Parameter.KEYWORD_ONLY
+    assert iterate['filters'].kind is inspect.Parameter.VAR_KEYWORD
+
+    create = inspect.signature(Coworker.create_coworker).parameters
+    assert create['FullName'].default is inspect.Parameter.empty
+    assert create['AddedTeams'].default == ()
+    assert list(inspect.signature(Booking.update_booking).parameters) == [
+        'self', 'Id', 'ResourceId', 'FromTime', 'ToTime']
+    assert list(inspect.signature(Booking.delete_booking).parameters) == [
+        'self', 'Booking_Id']
+
+
+def test_import_does_not_load_inspect():
+    code = 'import sys, nexudus.nexudus; print("inspect" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.strip() == b'False'
@@ -0,0 +1,13 @@
+import requests
+
+from nexudus.mockserver import MockServer
+
+
+def test_bad_page_or_size_is_a_bad_request():
+    with MockServer(sizes={'booking': 5}) as server:
+        url = server.url + '/spaces/bookings'
+        assert requests.get(url, params={'page': 'x'}).status_code == 400
+        assert requests.get(url, params={'size': '1.5'}).status_code == 400
+        body = requests.get(url, params={'page': 1, 'size': 2}).json()
+        assert body['TotalItems'] == 5
+        assert len(body['Records']) == 2
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+
+from nexudus.models import BookingRecord
+from nexudus.replica import reference
+
+PAYLOAD = {'Id': 7, 'ResourceId': 5, 'FromTime': '2030-01-01T10:00:00Z',
+           'Unknown': 'kept'}
+
+
+def test_fields_by_payload_key_and_attribute_name():
+    record = BookingRecord.from_dict(PAYLOAD)
+    assert record.get('ResourceId') == record.get('Resource') == 5
+    assert record['ResourceId'] == record['Resource'] == 5
+    assert record.get('Unknown') == record['Unknown'] == 'kept'
+    assert record.get('Coworker') is None
+    assert record.get('CoworkerId', 0) == 0
+    with pytest.raises(KeyError):
+        record['CoworkerId']
+    assert reference(record, 'Resource') == 5
+
+
+def test_aliases_round_trip():
+    record = BookingRecord.from_dict({'Id': 7, 'Resource': 5})
+    assert record.get('ResourceId') == 5
+    assert record.to_dict() == {'Id': 7, 'Resource': 5}
+
+
+def test_raw_values_survive_decoding():
+    record = BookingRecord.from_dict(PAYLOAD)
+    copy = BookingRecord.from_dict(PAYLOAD)
+    assert isinstance(record.FromTime, datetime)
+    assert record == copy
+    assert record.to_dict() == PAYLOAD
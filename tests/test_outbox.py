@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+from nexudus.outbox import Outbox
+
+
+@pytest.fixture
+def mock():
+    with MockServer(sizes={'access_token': 0, 'booking': 5}) as server:
+        yield server
+
+
+@pytest.fixture
+def client(mock):
+    client = Client('outbox', 'secret', rate_limit=None,
+                    domain_url=mock.url)
+    yield client
+    client.close()
+
+
+def crash_after_send(outbox):
+    """
+    Send every due row, then stop as if the process died before the rows
+    were marked done.
+    """
+    for row in outbox._claim():
+        seq, entity, action, _, payload, attempts, _ = row
+        assert outbox._send(entity, action, json.loads(payload),
+                            attempts + 1) == (False, None)
+    outbox.db.close()
+
+
+def test_replayed_create_is_not_sent_twice(tmp_path, mock, client):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path, [client.access_tokens])
+    outbox.create(client.access_tokens, BusinessId=1, AccessCode='A-1',
+                  MinutesIncluded=60, MinutesLeft=60)
+    crash_after_send(outbox)
+    tokens = mock.collections['access_token'].records
+    [token] = tokens.values()
+    # A swipe lowers the counter before the replay.
+    assert client.access_tokens.update_access_token(
+        Id=token['Id'], BusinessId=1, AccessCode='A-1', MinutesIncluded=60,
+        MinutesLeft=45).ok
+
+    outbox = Outbox(path, [client.access_tokens])
+    assert outbox.flush(timeout=10)
+    assert len(tokens) == 1
+    assert outbox.failed() == []
+    outbox.close()
+
+
+def test_replayed_delete_counts_as_done(tmp_path, mock, client):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path, [client.bookings])
+    outbox.delete(client.bookings, 2)
+    crash_after_send(outbox)
+    assert 2 not in mock.collections['booking'].records
+
+    outbox = Outbox(path, [client.bookings])
+    assert outbox.flush(timeout=10)
+    assert outbox.failed() == []
+    assert outbox.pending() == 0
+    outbox.close()
+
+
+def test_writes_of_one_id_keep_their_order(tmp_path, client):
+    sent = []
+    client.session.add_write_listener(
+        lambda method, url, data, response: sent.append(data['ToTime']))
+    booking = client.bookings.get_booking_by_id(3).json()
+    times = ['2030-01-01T%02d:00:00Z' % hour for hour in range(10, 22)]
+    with Outbox(str(tmp_path / 'outbox.db'), [client.bookings],
+                workers=4) as outbox:
+        for to_time in times:
+            outbox.update(client.bookings, Id=3,
+                          ResourceId=booking['ResourceId'],
+                          FromTime=booking['FromTime'], ToTime=to_time)
+        assert outbox.flush(timeout=10)
+    assert sent == times
+    assert client.bookings.get_booking_by_id(3).json()['ToTime'] == times[-1]
+
+
+def test_dedupe_fields_must_be_filters(tmp_path, client):
+    with pytest.raises(ValueError):
+        Outbox(str(tmp_path / 'outbox.db'), [client.checkins],
+               dedupe={'checkin': ('Bogus',)})
+
+
+def test_errors_in_the_call_are_not_retried(tmp_path, client):
+    outbox = Outbox(str(tmp_path / 'outbox.db'), [client.bookings])
+    outbox.create(client.bookings, ResourceId=1,
+                  FromTime='2030-01-01T10:00:00Z',
+                  ToTime='2030-01-01T11:00:00Z')
+    client.bookings.create_booking = None
+    assert outbox.flush(timeout=10)
+    [row] = outbox.failed()
+    assert row['attempts'] == 1
+    outbox.close()
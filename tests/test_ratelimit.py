@@ -0,0 +1,33 @@
+from nexudus.aio import AsyncSession
+from nexudus.ratelimit import SharedRateLimiter, shared_rate_limiter
+from nexudus.session import build_session
+
+
+def test_sessions_take_a_rate_limiter_instance():
+    limiter = SharedRateLimiter(rate=5)
+    assert build_session('user', 'secret',
+                         rate_limit=limiter).rate_limiter is limiter
+    assert AsyncSession('user', 'secret',
+                        rate_limit=limiter).rate_limiter is limiter
+
+
+def test_shared_limiters_are_per_user_and_host():
+    limiter = shared_rate_limiter('host-user', rate=5)
+    assert shared_rate_limiter('host-user', rate=5) is limiter
+    assert shared_rate_limiter('host-user', rate=5,
+                               host='localhost:8000') is not limiter
+    assert shared_rate_limiter('other-user', rate=5) is not limiter
+    local = build_session('host-user', 'secret', rate_limit=5,
+                          domain_url='http://localhost:8000/api')
+    assert local.rate_limiter is shared_rate_limiter(
+        'host-user', rate=5, host='localhost:8000')
+
+
+def test_a_new_starting_rate_is_applied():
+    limiter = shared_rate_limiter('rate-user', rate=5)
+    limiter.observe(429, {})
+    assert limiter.rate == 2.5
+    assert shared_rate_limiter('rate-user', rate=20) is limiter
+    assert limiter.rate == 20
+    shared_rate_limiter('rate-user', rate=20)
+    assert limiter.rate == 20
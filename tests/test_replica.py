@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta
+
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+from nexudus.replica import IntervalIndex, Replica
+
+EPOCH = datetime(2030, 1, 1)
+
+
+def test_overlapping_matches_a_full_scan():
+    rng = random.Random(7)
+    index = IntervalIndex()
+    intervals = {}
+    for key in range(2000):
+        start = EPOCH + timedelta(minutes=rng.randrange(60 * 24 * 90))
+        if key % 100:
+            length = timedelta(minutes=rng.randrange(15, 240))
+        else:
+            length = timedelta(days=rng.randrange(2, 60))
+        index.add(key, start, start + length)
+        intervals[key] = (start, start + length)
+    for key in range(0, 2000, 7):
+        index.remove(key)
+        del intervals[key]
+    for _ in range(200):
+        start = EPOCH + timedelta(minutes=rng.randrange(60 * 24 * 90))
+        end = start + timedelta(minutes=rng.randrange(1, 600))
+        found = index.overlapping(start, end)
+        assert sorted(key for _, _, key in found) == sorted(
+            key for key, (low, high) in intervals.items()
+            if low < end and high > start)
+        assert [entry[0] for entry in found] == sorted(
+            entry[0] for entry in found)
+    assert len(index) == len(intervals)
+
+
+def test_long_intervals_do_not_widen_the_window():
+    index = IntervalIndex()
+    index.add('month', EPOCH, EPOCH + timedelta(days=30))
+    index.add('hour', EPOCH, EPOCH + timedelta(hours=1))
+    assert index.longest == timedelta(hours=1)
+    assert [key for _, _, key in index.overlapping(
+        EPOCH + timedelta(days=10), EPOCH + timedelta(days=11))] == ['month']
+    assert index.remove('month')
+    assert 'month' not in index
+    assert index.overlapping(EPOCH + timedelta(days=10),
+                             EPOCH + timedelta(days=11)) == []
+
+
+def test_own_updates_keep_the_other_fields():
+    with MockServer(sizes={'booking': 10}) as server:
+        client = Client('replica', 'secret', rate_limit=None,
+                        domain_url=server.url)
+        replica = Replica(client.bookings)
+        replica.load()
+        before = dict(replica.records[3])
+        assert client.bookings.update_booking(
+            Id=3, ResourceId=before['ResourceId'],
+            FromTime=before['FromTime'],
+            ToTime='2030-01-01T10:00:00Z').ok
+        after = replica.records[3]
+        assert after['ToTime'] == '2030-01-01T10:00:00Z'
+        assert dict(after, ToTime=before['ToTime']) == before
+        found = [record for record in replica.conflicts(
+            before['ResourceId'], before['FromTime'],
+            '2030-01-01T10:00:00Z') if record['Id'] == 3]
+        assert found == [after]
+        replica.close()
+        client.close()
@@ -0,0 +1,76 @@
+import time
+from contextlib import ExitStack
+
+import pytest
+
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+from nexudus.retry import RetryPolicy
+
+BOOKING = {'ResourceId': 1, 'FromTime': '2030-01-01T10:00:00Z',
+           'ToTime': '2030-01-01T11:00:00Z'}
+
+
+@pytest.fixture
+def failing():
+    """
+    Start mock servers answering every call with an error status.
+    """
+    with ExitStack() as stack:
+        yield lambda status=503: stack.enter_context(MockServer(
+            sizes={'booking': 5}, error_rate=1.0, error_status=status))
+
+
+def client_for(server, policy):
+    return Client('retry', 'secret', rate_limit=None, retry_policy=policy,
+                  domain_url=server.url)
+
+
+def test_retries_stop_at_the_deadline(failing):
+    server = failing()
+    client = client_for(server, RetryPolicy(max_attempts=1000, backoff=0.02,
+                                            backoff_cap=0.02, deadline=0.5))
+    started = time.monotonic()
+    response = client.bookings.get_booking_by_id(1)
+    elapsed = time.monotonic() - started
+    assert response.status_code == 503
+    assert 1 < server.request_count < 1000
+    assert elapsed < 1.0
+
+
+def test_retry_after_is_waited_for(failing):
+    server = failing(429)
+    client = client_for(server, RetryPolicy(max_attempts=2, backoff=0.001,
+                                            deadline=5))
+    started = time.monotonic()
+    assert client.bookings.get_booking_by_id(1).status_code == 429
+    assert time.monotonic() - started >= 1.0
+    assert server.request_count == 2
+
+
+def test_retry_after_past_the_deadline_gives_up(failing):
+    server = failing(429)
+    client = client_for(server, RetryPolicy(max_attempts=5, backoff=0.001,
+                                            deadline=0.5))
+    assert client.bookings.get_booking_by_id(1).status_code == 429
+    assert server.request_count == 1
+
+
+def test_post_is_retried_only_when_opted_in(failing):
+    policy = dict(max_attempts=3, backoff=0.001, deadline=5)
+    server = failing()
+    client = client_for(server, RetryPolicy(**policy))
+    assert client.bookings.create_booking(**BOOKING).status_code == 503
+    assert server.request_count == 1
+
+    server = failing()
+    client = client_for(server, RetryPolicy(retry_post=True, **policy))
+    assert client.bookings.create_booking(**BOOKING).status_code == 503
+    assert server.request_count == 3
+
+
+def test_one_attempt_disables_retries(failing):
+    server = failing()
+    client = client_for(server, RetryPolicy(max_attempts=1))
+    assert client.bookings.get_booking_by_id(1).status_code == 503
+    assert server.request_count == 1
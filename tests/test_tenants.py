@@ -0,0 +1,29 @@
+import pytest
+
+from nexudus.cache import ResponseCache
+from nexudus.mockserver import MockServer
+from nexudus.tenants import TenantManager
+
+
+@pytest.fixture
+def server():
+    with MockServer(sizes={'coworker': 10}) as server:
+        yield server
+
+
+def test_tenants_never_share_a_cache_entry(server):
+    with TenantManager(cache=ResponseCache, rate_limit=None,
+                       domain_url=server.url) as manager:
+        a = manager.client('tenant-a', 'secret')
+        b = manager.client('tenant-b', 'secret')
+        assert a.session.cache is not b.session.cache
+        first = a.coworkers.get_coworker_by_id(1)
+        assert not getattr(first, 'from_cache', False)
+        assert a.coworkers.get_coworker_by_id(1).from_cache
+        other = b.coworkers.get_coworker_by_id(1)
+        assert not getattr(other, 'from_cache', False)
+
+
+def test_shared_policy_objects_are_rejected():
+    with pytest.raises(TypeError):
+        TenantManager(cache=ResponseCache())
@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from nexudus.cache import ResponseCache
+from nexudus.mockserver import MockServer
+from nexudus.nexudus import Client
+from nexudus.replica import Replica
+from nexudus.webhooks import (WebhookError, WebhookReceiver, WebhookServer,
+                              parse_action, send_event)
+
+TOKEN = 'url-token'
+SECRET = 'signing-secret'
+
+
+@pytest.fixture
+def received():
+    events = []
+    receiver = WebhookReceiver(token=TOKEN, secret=SECRET)
+    receiver.add_handler(events.append)
+    with WebhookServer(receiver) as server:
+        yield server, events
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for webhook.")
+        time.sleep(0.01)
+
+
+def test_good_token_and_signature_are_accepted(received):
+    server, events = received
+    assert send_event(server.url, 'BookingCreate', [{'Id': 1}],
+                      token=TOKEN, secret=SECRET) == 200
+    assert [(event.entity, event.kind, event.entity_id)
+            for event in events] == [('booking', 'create', 1)]
+
+
+def test_bad_token_is_rejected(received):
+    server, events = received
+    assert send_event(server.url, 'BookingCreate', [{'Id': 1}],
+                      token='wrong', secret=SECRET) == 401
+    assert send_event(server.url, 'BookingCreate', [{'Id': 1}],
+                      secret=SECRET) == 401
+    assert not events
+
+
+def test_bad_signature_is_rejected(received):
+    server, events = received
+    assert send_event(server.url, 'BookingCreate', [{'Id': 1}],
+                      token=TOKEN, secret='wrong') == 401
+    assert send_event(server.url, 'BookingCreate', [{'Id': 1}],
+                      token=TOKEN) == 401
+    assert not events
+
+
+def test_unknown_action_is_a_bad_request(received):
+    server, events = received
+    assert send_event(server.url, 'Frobnicate', [{'Id': 1}],
+                      token=TOKEN, secret=SECRET) == 400
+    assert not events
+
+
+def test_action_from_the_url_path(received):
+    server, events = received
+    assert send_event(server.url + 'CheckinDeleted', None, [7],
+                      token=TOKEN, secret=SECRET) == 200
+    assert [(event.entity, event.kind, event.entity_id)
+            for event in events] == [('checkin', 'delete', 7)]
+
+
+def test_parse_action():
+    assert parse_action('BookingUpdated') == ('booking', 'update')
+    assert parse_action('CoworkerPricePlanHistoryDelete') == (
+        'price_plan_history', 'delete')
+    assert parse_action('ResourceTimeSlotCreate') == (
+        'resource_time_slot', 'create')
+    assert parse_action('InvoiceCreate') == (None, 'create')
+    with pytest.raises(WebhookError):
+        parse_action('Booking')
+
+
+def test_receiver_requires_authentication():
+    with pytest.raises(ValueError):
+        WebhookReceiver()
+    WebhookReceiver(allow_unauthenticated=True)
+
+
+def test_events_update_cache_and_replica():
+    receiver = WebhookReceiver(token=TOKEN, secret=SECRET)
+    with WebhookServer(receiver) as hooks, MockServer(
+            sizes={'booking': 20}, webhook_url=hooks.url,
+            webhook_token=TOKEN, webhook_secret=SECRET) as mock:
+        cache = ResponseCache(ttls={'booking': 60})
+        reader = Client('reader', 'secret', cache=cache, rate_limit=None,
+                        domain_url=mock.url)
+        writer = Client('writer', 'secret', rate_limit=None,
+                        domain_url=mock.url)
+        replica = Replica(reader.bookings)
+        replica.load()
+        receiver.add_handler(cache.on_event)
+        receiver.add_handler(replica.on_event, entity='booking')
+
+        booking = reader.bookings.get_booking_by_id(3).json()
+        assert reader.bookings.get_booking_by_id(3).from_cache
+        response = writer.bookings.update_booking(
+            Id=3, ResourceId=booking['ResourceId'],
+            FromTime=booking['FromTime'], ToTime='2030-01-01T10:00:00Z')
+        assert response.ok
+        wait_for(lambda: replica.records[3].get('ToTime')
+                 == '2030-01-01T10:00:00Z')
+        fresh = reader.bookings.get_booking_by_id(3)
+        assert not getattr(fresh, 'from_cache', False)
+        assert fresh.json()['ToTime'] == '2030-01-01T10:00:00Z'
+
+        assert writer.bookings.delete_booking(3).ok
+        wait_for(lambda: 3 not in replica.records)